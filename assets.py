@@ -0,0 +1,96 @@
+import importlib
+import os
+import threading
+import pygame
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROLL_SOUND = "sounds/dice_roll.wav"
+# Volume each sound is set to when it's loaded
+VOLUMES = {ROLL_SOUND: 0.3}
+# Modules the game screen needs but the menu doesn't, imported while the menu is up
+GAME_MODULES = ["game", "bot"]
+
+
+class Assets:
+    """
+    Fonts, sounds and die sprites, each loaded once and shared
+
+    Anything asked for is loaded on the spot if it isn't ready yet, so the
+    menu can come up with just its font while warm() loads the rest of
+    what a game needs on a background thread.
+    """
+    def __init__(self, base_dir=BASE_DIR):
+        """
+        Initialize the asset manager
+        Args:
+            base_dir (str): directory asset paths are relative to
+        """
+        self.base_dir = base_dir
+        self.fonts = {}  # (name, size) -> pygame font
+        self.sounds = {}  # path -> pygame sound, None if it couldn't be loaded
+        self.lock = threading.Lock()
+        self.thread = None
+        self.warm_time = None  # Seconds the background warm up took, once it's done
+
+    def font(self, name, size):
+        """
+        Shared font
+        Args:
+            name (str): font file relative to the asset directory, None for pygame's default
+            size (int): point size
+        Returns:
+            pygame.font.Font
+        """
+        key = (name, size)
+        with self.lock:
+            font = self.fonts.get(key)
+            if font is None:
+                path = os.path.join(self.base_dir, name) if name else None
+                font = self.fonts[key] = pygame.font.Font(path, size)
+        return font
+
+    def sound(self, path):
+        """
+        Shared sound, at its volume from VOLUMES
+        Args:
+            path (str): sound file relative to the asset directory
+        Returns:
+            pygame.mixer.Sound, None if it couldn't be loaded
+        """
+        with self.lock:
+            if path not in self.sounds:
+                try:
+                    sound = pygame.mixer.Sound(os.path.join(self.base_dir, path))
+                    sound.set_volume(VOLUMES.get(path, 1.0))
+                except (pygame.error, FileNotFoundError):
+                    print(f"Warning: Could not load sound file {path}")
+                    sound = None
+                self.sounds[path] = sound
+            return self.sounds[path]
+
+    def warm(self):
+        """Start loading everything a game needs on a background thread"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.load_all, name="assets", daemon=True)
+            self.thread.start()
+
+    def wait(self):
+        """Block until warm() has finished"""
+        if self.thread is not None:
+            self.thread.join()
+
+    def load_all(self):
+        """Load every asset a game uses, skipping any that are already loaded"""
+        start = pygame.time.get_ticks()
+        for module in GAME_MODULES:
+            importlib.import_module(module)  # Builds the rules and bot tables
+        self.sound(ROLL_SOUND)
+        self.font(None, 36)
+        self.font(None, 24)
+        from dice import Die
+        Die.prebake()
+        self.warm_time = (pygame.time.get_ticks() - start) / 1000
+
+
+# Shared by every view so each asset is only loaded once per run
+assets = Assets()
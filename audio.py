@@ -0,0 +1,96 @@
+import pygame
+
+
+class Audio:
+    """
+    Fixed pool of mixer voices for game sounds
+
+    Sounds play on a few reserved channels instead of whatever channel the
+    mixer finds. The same sound triggered again within a few milliseconds,
+    like six dice starting to roll at once, plays only once, and sounds
+    fade out instead of being cut off.
+    """
+    def __init__(self, voices=4, dedupe_ms=30, fade_ms=250):
+        """
+        Initialize the voice pool
+        Args:
+            voices (int): channels reserved for game sounds
+            dedupe_ms (int): repeat triggers of a sound this close together are dropped
+            fade_ms (int): default fade out length
+        """
+        self.voices = voices
+        self.dedupe_ms = dedupe_ms
+        self.fade_ms = fade_ms
+        self.channels = None  # Reserved on first use, once the mixer is up
+        self.playing = []  # (sound, start ticks, fading) per voice, None when idle
+
+    def ready(self):
+        """Check if there is a mixer to play on, reserving the voices the first time"""
+        if self.channels is None:
+            if not pygame.mixer.get_init():
+                return False
+            if pygame.mixer.get_num_channels() < self.voices:
+                pygame.mixer.set_num_channels(self.voices)
+            pygame.mixer.set_reserved(self.voices)  # Nothing else plays on the pool's voices
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.voices)]
+            self.playing = [None] * self.voices
+        return True
+
+    def play(self, sound):
+        """
+        Play a sound on a free voice, stealing the oldest if none are free
+        Args:
+            sound: pygame.mixer.Sound to play
+        Returns:
+            bool: True if it started, False if it was a repeat or there's no mixer
+        """
+        if sound is None or not self.ready():
+            return False
+        now = pygame.time.get_ticks()
+        oldest = None
+        free = None
+        for i, channel in enumerate(self.channels):
+            voice = self.playing[i]
+            if voice is not None and not channel.get_busy():
+                voice = self.playing[i] = None  # Finished since we last looked
+            if voice is None:
+                if free is None:
+                    free = i
+                continue
+            playing, start, fading = voice
+            if playing is sound and not fading and now - start < self.dedupe_ms:
+                return False  # Already started this instant
+            if oldest is None or start < self.playing[oldest][1]:
+                oldest = i
+
+        i = free if free is not None else oldest
+        self.channels[i].play(sound)
+        self.playing[i] = (sound, now, False)
+        return True
+
+    def fade_out(self, sound=None, ms=None):
+        """
+        Fade out every voice playing a sound
+        Args:
+            sound: pygame.mixer.Sound to fade, every voice if None
+            ms (int): fade length, the pool's default if not given
+        """
+        if self.channels is None:
+            return
+        for i, voice in enumerate(self.playing):
+            if voice is None or voice[2] or (sound is not None and voice[0] is not sound):
+                continue
+            self.channels[i].fadeout(self.fade_ms if ms is None else ms)
+            self.playing[i] = (voice[0], voice[1], True)
+
+    def stop(self):
+        """Silence every voice straight away"""
+        if self.channels is None:
+            return
+        for channel in self.channels:
+            channel.stop()
+        self.playing = [None] * self.voices
+
+
+# Shared by every view so all game sounds go through one pool
+audio = Audio()
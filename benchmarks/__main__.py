@@ -0,0 +1,43 @@
+import argparse
+import fnmatch
+import sys
+from benchmarks import bench_rules, bench_render, bench_ratings  # Registers the benchmarks
+from benchmarks.harness import BASELINE_FILE, BENCHMARKS, load_baseline, run, save_baseline
+
+
+def main():
+    """Run the benchmarks, failing if any got slower than the saved baseline"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark scoring, rules, simulation and rendering")
+    parser.add_argument("patterns", nargs="*", help="only run benchmarks matching these globs, e.g. 'render.*'")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fraction slower than the baseline that still passes")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed repeat")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repeats, the fastest counts")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    selected = [bench for bench in BENCHMARKS
+                if not args.patterns or any(fnmatch.fnmatch(bench.name, p) for p in args.patterns)]
+    if args.list:
+        for bench in selected:
+            print(bench.name)
+        return 0
+
+    baseline = {} if args.save else load_baseline(args.baseline)
+    results, regressions = run(selected, baseline, args.tolerance, args.min_time, args.repeat)
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}, run with --save to create one")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed or missed their target: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
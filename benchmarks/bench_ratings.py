@@ -0,0 +1,25 @@
+import numpy as np
+import ratings
+from benchmarks.harness import benchmark
+
+
+@benchmark("ratings.update")
+def update():
+    # One game at a time, as the history writer rates them
+    seats, scores = ratings.random_games(np.random.default_rng(1), 2000, 12)
+    games = [([p for p in row if p >= 0], [s for p, s in zip(row, row_scores) if p >= 0])
+             for row, row_scores in zip(seats.tolist(), scores.tolist())]
+
+    def run():
+        rated = ratings.Ratings()
+        for names, final_scores in games:
+            rated.update(names, final_scores)
+    return run, len(games)
+
+
+@benchmark("ratings.recompute")
+def recompute():
+    # A tournament sized history, wide enough for the waves to be rated as arrays
+    players = 2000
+    seats, scores = ratings.random_games(np.random.default_rng(1), 50000, players)
+    return lambda: ratings.recompute(seats, scores, players), len(seats)
@@ -0,0 +1,155 @@
+import math
+import os
+import random
+import pygame
+import engine
+from dice import DiceTray, Die
+from game import Game
+from menu import Menu
+from benchmarks.harness import FRAME, OPS, benchmark
+
+# Rendering is measured without a real window or sound card so results repeat
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+_screen = None
+
+
+def get_screen():
+    """The dummy display, opened on first use"""
+    global _screen
+    if _screen is None:
+        pygame.init()
+        try:
+            pygame.mixer.init()
+        except pygame.error:
+            pass  # Game.update stops sounds, which only needs the mixer if there is one
+        _screen = pygame.display.set_mode((800, 600))
+    return _screen
+
+
+def make_game(seed=1, speed=1.0):
+    """A three player game with a fixed seed"""
+    return Game(get_screen(), 3, speed, seed=seed)
+
+
+@benchmark("render.die_draw", OPS)
+def die_draw():
+    screen = get_screen()
+    die = Die(100, 250)
+    die.value = 5
+    # A full tumble's worth of poses, so the sprite cache sees its real mix of hits
+    poses = [(1.0 + 0.2 * abs(math.sin(f * 0.1)), f * 6, f // 4 % 6 + 1) for f in range(180)]
+
+    def run():
+        for scale, rotation, value in poses:
+            die.scale = scale
+            die.rotation = rotation
+            die.value = value
+            die.draw(screen)
+    return run, len(poses)
+
+
+def rolling_tray(count):
+    """A tray of dice all a third of the way into a roll"""
+    tray = DiceTray(count)
+    tray.arrange(20, 20, 12, 64)
+    tray.roll(range(count), [1 + i % 6 for i in range(count)])
+    tray.roll_length[:] = float("inf")  # Keep tumbling however long the benchmark runs
+    tray.update(0.5)
+    return tray
+
+
+@benchmark("dice.tray_update", FRAME)
+def tray_update():
+    # One frame of animation for the six dice of a game
+    tray = rolling_tray(6)
+    return lambda: tray.update(1 / 60), 1
+
+
+@benchmark("dice.big_table", FRAME)
+def big_table():
+    # A frame of a table with a hundred rolling dice: one animation step and one batched blit
+    screen = get_screen()
+    tray = rolling_tray(100)
+
+    def run():
+        tray.update(1 / 60)
+        tray.draw(screen)
+    return run, 1
+
+
+@benchmark("render.game_draw_idle", FRAME)
+def game_draw_idle():
+    game = make_game()
+    game.roll_dice()
+    while game.is_animating():
+        game.update(1 / 60)
+    game.draw(game.screen)
+    # Nothing changes, so this is the cost of working out there is nothing to paint
+    return lambda: game.draw(game.screen), 1
+
+
+@benchmark("render.game_draw_full", FRAME)
+def game_draw_full():
+    game = make_game()
+    game.roll_dice()
+    while game.is_animating():
+        game.update(1 / 60)
+
+    def run():
+        game.renderer.invalidate()
+        game.draw(game.screen)
+    return run, 1
+
+
+@benchmark("render.menu_draw_idle", FRAME)
+def menu_draw_idle():
+    menu = Menu(get_screen())
+    menu.draw(menu.screen)
+    return lambda: menu.draw(menu.screen), 1
+
+
+@benchmark("render.menu_draw_full", FRAME)
+def menu_draw_full():
+    menu = Menu(get_screen())
+
+    def run():
+        menu.renderer.invalidate()
+        menu.draw(menu.screen)
+    return run, 1
+
+
+@benchmark("game.frame", FRAME)
+def game_frame():
+    # Whole frames of a game being played: updates, animation, rules and painting
+    state = {"game": make_game()}
+    pick = random.Random(1)
+
+    def play():
+        game = state["game"]
+        if game.game_over:
+            state["game"] = game = make_game(pick.randrange(2 ** 31))
+        if not game.is_animating():
+            if game.must_roll:
+                banked = game.scores[game.current_player]
+                if ((game.turn_score >= 300 or banked + game.turn_score == engine.WIN_SCORE) and
+                        game.engine.can_end_turn()):
+                    game.end_turn()
+                else:
+                    game.roll_dice()
+            elif game.can_keep:
+                # Keep every scoring die
+                mask = engine.scoring_mask(game.engine.dice)
+                for i, die in enumerate(game.dice):
+                    die.kept = bool(mask >> i & 1)
+                game.keep_dice()
+        game.update(1 / 60)
+        game.draw(game.screen)
+
+    frames = 60
+
+    def run():
+        for _ in range(frames):
+            play()
+    return run, frames
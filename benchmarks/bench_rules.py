@@ -0,0 +1,124 @@
+import random
+import numpy as np
+import engine
+import scoring
+import simulate
+from benchmarks.harness import benchmark
+from ruleset import CLASSIC, RuleSet
+
+# Variants should run as fast as the classic rules
+SEVEN_DICE = RuleSet("Seven Dice", target=12000, dice=7)
+SHORT = RuleSet("Short Game", target=5000, entry=500)
+
+# Face values of every distinct roll of 1 to 6 dice
+ROLLS = [[face for face in scoring.FACES for _ in range(counts[face])]
+         for counts in map(scoring.unpack, scoring.ROLLS)]
+
+
+@benchmark("rules.calculate_score")
+def calculate_score():
+    calculate = engine.calculate_score
+
+    def run():
+        for values in ROLLS:
+            calculate(values)
+    return run, len(ROLLS)
+
+
+@benchmark("rules.has_scoring_dice")
+def has_scoring_dice():
+    has_scoring = engine.has_scoring_dice
+
+    def run():
+        for values in ROLLS:
+            has_scoring(values)
+    return run, len(ROLLS)
+
+
+@benchmark("rules.is_valid_selection")
+def is_valid_selection():
+    # Every non-empty selection out of every roll
+    selections = [(values, mask) for values in ROLLS for mask in range(1, 1 << len(values))]
+    is_valid = engine.is_valid_selection
+
+    def run():
+        for values, mask in selections:
+            is_valid(values, mask)
+    return run, len(selections)
+
+
+@benchmark("rules.bust_check")
+def bust_check():
+    # The check Engine.roll makes on every roll: could keeping everything overshoot?
+    cases = [(values, banked, turn) for values in ROLLS
+             for banked, turn in [(0, 0), (8000, 1500), (9500, 250), (9900, 0)]]
+    potential = engine.potential_score
+    win = engine.WIN_SCORE
+
+    def run():
+        for values, banked, turn in cases:
+            banked + turn + potential(values) > win
+    return run, len(cases)
+
+
+def play_game(rng, players=3, stop_at=300, ruleset=CLASSIC):
+    """
+    Play one game on the engine, keeping every scoring die and banking at stop_at
+    Returns:
+        int: turns played
+    """
+    game = engine.Engine(players, rng, ruleset=ruleset)
+    turns = 0
+    while not game.game_over:
+        if game.roll() != engine.ROLLED or game.keep(game.scoring_mask()) == engine.BUST:
+            turns += 1  # Farkled or busted
+            continue
+        banked = game.scores[game.current_player]
+        if ((game.turn_score >= stop_at or banked + game.turn_score == ruleset.target) and
+                game.can_end_turn()):
+            game.end_turn()
+            turns += 1
+    return turns
+
+
+@benchmark("engine.game")
+def engine_game():
+    rng = random.Random(1)
+    return lambda: play_game(rng), 1
+
+
+@benchmark("engine.turns", floor=100000)
+def engine_turns():
+    # The engine has to keep up with simulations and servers running whole turns at volume
+    seeds = range(20)
+    turns = sum(play_game(random.Random(seed)) for seed in seeds)
+    return lambda: [play_game(random.Random(seed)) for seed in seeds], turns
+
+
+@benchmark("engine.game.seven_dice")
+def engine_game_seven_dice():
+    rng = random.Random(1)
+    SEVEN_DICE.compile()
+    return lambda: play_game(rng, ruleset=SEVEN_DICE), 1
+
+
+@benchmark("engine.game.short")
+def engine_game_short():
+    rng = random.Random(1)
+    return lambda: play_game(rng, ruleset=SHORT), 1
+
+
+@benchmark("simulate.games")
+def simulate_games():
+    strategies = [simulate.ThresholdStrategy(300)] * 3
+    rng = np.random.default_rng(1)
+    games = 2000
+    return lambda: simulate.simulate_games(games, strategies, rng), games
+
+
+@benchmark("simulate.games.seven_dice")
+def simulate_games_seven_dice():
+    strategies = [simulate.ThresholdStrategy(300, ruleset=SEVEN_DICE)] * 3
+    rng = np.random.default_rng(1)
+    games = 2000
+    return lambda: simulate.simulate_games(games, strategies, rng, ruleset=SEVEN_DICE), games
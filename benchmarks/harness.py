@@ -0,0 +1,123 @@
+import json
+import os
+import time
+
+# How each benchmark reports its speed
+OPS = "ops"  # Operations per second
+FRAME = "frame"  # Time per frame
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Every registered benchmark, in the order they were defined
+BENCHMARKS = []
+
+
+class Benchmark:
+    """
+    One repeatable measurement
+
+    setup builds whatever the benchmark needs and returns (run, ops): a
+    function doing the work and how many operations one call of it does.
+    Setup isn't timed. A benchmark with a floor fails below that many
+    operations per second, whatever the baseline says.
+    """
+    def __init__(self, name, setup, kind=OPS, floor=None):
+        self.name = name
+        self.setup = setup
+        self.kind = kind
+        self.floor = floor
+
+    def measure(self, min_time=0.2, repeat=5):
+        """
+        Time the benchmark
+        Args:
+            min_time (float): seconds each timed repeat should take at least
+            repeat (int): timed repeats, the fastest one counts
+        Returns:
+            float: operations per second of the fastest repeat
+        """
+        run, ops = self.setup()
+        # Find how many calls fill min_time, so timer resolution doesn't matter
+        loops = 1
+        while True:
+            elapsed = self.time_loops(run, loops)
+            if elapsed >= min_time:
+                break
+            loops *= 2 if elapsed < min_time / 10 else max(2, int(min_time / elapsed) + 1)
+        best = elapsed
+        for _ in range(repeat - 1):
+            best = min(best, self.time_loops(run, loops))
+        return loops * ops / best
+
+    def time_loops(self, run, loops):
+        """Seconds taken by loops calls of run"""
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        return time.perf_counter() - start
+
+
+def benchmark(name, kind=OPS, floor=None):
+    """Register the decorated setup function as a benchmark"""
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup, kind, floor))
+        return setup
+    return register
+
+
+def format_speed(kind, ops_per_sec):
+    """Human readable speed of a benchmark"""
+    if kind == FRAME:
+        return f"{1000 / ops_per_sec:>14.3f} ms/frame ({ops_per_sec:,.0f} fps)"
+    return f"{ops_per_sec:>14,.0f} ops/sec ({1e6 / ops_per_sec:.3f} us/op)"
+
+
+def load_baseline(path=BASELINE_FILE):
+    """Saved ops/sec per benchmark name, empty if nothing was saved"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    """Save ops/sec per benchmark name, keeping benchmarks that weren't run"""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def run(benchmarks, baseline=None, tolerance=0.2, min_time=0.2, repeat=5, report=print):
+    """
+    Measure benchmarks and compare them with a baseline
+    Args:
+        benchmarks (list): Benchmark objects to run
+        baseline (dict): ops/sec per name to compare with, if any
+        tolerance (float): fraction slower than the baseline that still passes
+        min_time (float): seconds per timed repeat
+        repeat (int): timed repeats per benchmark
+        report: function given one line of output per benchmark
+    Returns:
+        tuple: (ops/sec per name, names of benchmarks that regressed or fell below their floor)
+    """
+    baseline = baseline or {}
+    results = {}
+    regressions = []
+    for bench in benchmarks:
+        ops_per_sec = bench.measure(min_time, repeat)
+        results[bench.name] = ops_per_sec
+        line = f"{bench.name:<28}{format_speed(bench.kind, ops_per_sec)}"
+        if bench.name in baseline:
+            ratio = ops_per_sec / baseline[bench.name]
+            status = "ok"
+            if ratio < 1 - tolerance:
+                status = "REGRESSION"
+                regressions.append(bench.name)
+            line += f"  {ratio:6.2f}x baseline {status}"
+        if bench.floor is not None and ops_per_sec < bench.floor:
+            line += f"  BELOW {bench.floor:,} TARGET"
+            if bench.name not in regressions:
+                regressions.append(bench.name)
+        report(line)
+    return results, regressions
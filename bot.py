@@ -0,0 +1,206 @@
+import time
+import scoring
+from engine import roll_masks
+from ruleset import CLASSIC
+from solver import roll_probability
+
+# Scoring rules -> (outcomes, survival), shared by every bot playing by them
+_OUTCOMES = {}
+
+
+def _build_outcomes(ruleset):
+    """
+    Roll outcomes for each number of dice, grouped by what they allow
+
+    Rolls are enumerated as multisets weighted by their multinomial
+    probability instead of all 6^n orderings. Only the best score for each
+    number of dice kept matters to the search, and only keeps that aren't
+    beaten by one scoring more with fewer dice, so rolls offering the same
+    choices are merged into one outcome. Keeping every die is never beaten,
+    since it's the only keep that gets the dice back.
+    Args:
+        ruleset (RuleSet): compiled rules to score by
+    Returns:
+        dict: dice count -> list of (probability, best score, options),
+            options being (score, dice used) pairs. Farkles are left out.
+    """
+    outcomes = {}
+    for dice in range(1, ruleset.dice + 1):
+        grouped = {}
+        for key in ruleset.rolls:
+            if scoring.dice_count(key) != dice or not ruleset.score[key]:
+                continue
+            best = {}
+            for keep in ruleset.legal_keeps[key]:
+                used = scoring.dice_count(keep)
+                best[used] = max(best.get(used, 0), ruleset.score[keep])
+            options = []
+            for used in sorted(best):
+                if not options or best[used] > options[-1][0] or used == dice:
+                    options.append((best[used], used))
+            options = tuple(options)
+            grouped[options] = grouped.get(options, 0.0) + roll_probability(key)
+        outcomes[dice] = [(p, options[-1][0], options) for options, p in grouped.items()]
+    return outcomes
+
+
+def outcomes(ruleset):
+    """
+    Roll outcomes and the chance each number of dice scores anything, built once per set of scoring rules
+    Returns:
+        tuple: (outcomes as from _build_outcomes, dice count -> chance of not farkling)
+    """
+    built = _OUTCOMES.get(ruleset.tables_key)
+    if built is None:
+        by_dice = _build_outcomes(ruleset.compile())
+        # Chance each number of dice scores anything, for estimating states past the search depth
+        survival = {dice: sum(p for p, _, _ in by_dice[dice]) for dice in by_dice}
+        built = _OUTCOMES[ruleset.tables_key] = (by_dice, survival)
+    return built
+
+
+OUTCOMES, SURVIVAL = outcomes(CLASSIC)
+
+
+class OutOfTime(Exception):
+    """Raised inside the search when the move's time budget runs out"""
+
+
+class ExpectimaxBot:
+    """
+    Computer player searching roll outcomes with depth-limited expectimax
+
+    Each decision searches deeper and deeper until the time budget runs
+    out and plays the answer of the deepest search that finished. Values
+    are the expected score banked this turn. They are kept in a
+    transposition table keyed by (dice left, turn score, banked score), so
+    later moves and games reuse what earlier ones worked out.
+    """
+    def __init__(self, budget=0.008, max_depth=8, ruleset=None):
+        """
+        Initialize the bot
+        Args:
+            budget (float): seconds each decision may take
+            max_depth (int): most rolls to look ahead
+            ruleset (RuleSet): rules of the games it plays, the classic rules if not given
+        """
+        self.budget = budget
+        self.max_depth = max_depth
+        self.ruleset = (ruleset or CLASSIC).compile()
+        self.outcomes, self.survival = outcomes(self.ruleset)
+        # Read on every node of the search, so kept as plain attributes
+        self.target = self.ruleset.target
+        self.entry = self.ruleset.entry
+        self.dice = self.ruleset.dice
+        self.table = {}  # (dice, turn score, banked) -> (depth searched, value)
+        self.deadline = 0.0
+        self.depth_reached = 0  # Depth of the last decision, for tuning the budget
+
+    def roll_value(self, dice, turn_score, banked, depth):
+        """Expected score banked by rolling the dice left (0 for a full set) and playing on"""
+        key = (dice, turn_score, banked)
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            return entry[1]
+        if time.perf_counter() > self.deadline:
+            raise OutOfTime()
+
+        total = banked + turn_score
+        if dice == 0:
+            if total > self.target:
+                return 0.0  # Every die comes back, but rolling them busts
+            dice = self.dice
+        value = 0.0
+        for probability, best, options in self.outcomes[dice]:
+            if total + best > self.target:
+                continue  # Keeping everything would go over, so the roll busts
+            value += probability * max(
+                self.choice_value(dice - used, turn_score + score, banked, depth - 1)
+                for score, used in options)
+
+        self.table[key] = (depth, value)
+        return value
+
+    def choice_value(self, dice, turn_score, banked, depth):
+        """Value after keeping, the better of banking and rolling on"""
+        stop = turn_score if banked >= self.entry or turn_score >= self.entry else -1.0
+        if banked + turn_score == self.target:
+            return stop  # Rolling on can only bust
+        if depth <= 0:
+            # Beyond the search, guess that rolling on keeps the turn if the next roll scores
+            return max(stop, turn_score * self.survival[dice or self.dice])
+        return max(stop, self.roll_value(dice, turn_score, banked, depth))
+
+    def search(self, evaluate):
+        """
+        Run evaluate(depth) one depth deeper at a time until the budget runs out
+        Returns:
+            the result of the deepest search that finished
+        """
+        self.deadline = time.perf_counter() + self.budget
+        result = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                result = evaluate(depth)
+            except OutOfTime:
+                break
+            self.depth_reached = depth
+        if result is None:
+            # Not even one roll ahead fitted, so finish that without a deadline
+            self.deadline = float("inf")
+            result = evaluate(1)
+        return result
+
+    def choose_keep(self, values, turn_score, banked):
+        """
+        Pick the dice to keep out of a roll
+        Args:
+            values (list): face values of the rolled dice
+            turn_score (int): turn score before keeping
+            banked (int): player's banked score
+        Returns:
+            int: bitmask of the dice to keep, bit i keeps values[i]
+        """
+        # Keeps only differ to the search by what they score and how many dice they use
+        options = {}
+        for mask, score in roll_masks(values, self.ruleset)[0].items():
+            options.setdefault((score, bin(mask).count("1")), mask)
+
+        def evaluate(depth):
+            return max(options, key=lambda option: self.choice_value(
+                len(values) - option[1], turn_score + option[0], banked, depth - 1))
+
+        return options[self.search(evaluate)]
+
+    def should_stop(self, dice, turn_score, banked):
+        """Check if banking now beats rolling the dice left (0 for a full set)"""
+        if banked < self.entry and turn_score < self.entry:
+            return False
+        if banked + turn_score == self.target:
+            return True
+        return turn_score >= self.search(lambda depth: self.roll_value(dice, turn_score, banked, depth))
+
+    def should_take_previous(self, offer, offer_dice, banked):
+        """Check if starting with the previous player's score and dice beats a fresh turn"""
+        def evaluate(depth):
+            return (self.roll_value(offer_dice, offer, banked, depth) >
+                    self.roll_value(self.dice, 0, banked, depth))
+        return self.search(evaluate)
+
+    def act(self, game):
+        """
+        Decide the next action for the current player of an engine
+        Args:
+            game: engine.Engine, or anything with the same state
+        Returns:
+            tuple: ("take_previous",), ("roll",), ("end_turn",) or ("keep", mask)
+        """
+        banked = game.scores[game.current_player]
+        if game.can_keep:
+            return ("keep", self.choose_keep(game.dice, game.turn_score, banked))
+        if game.can_take_previous() and self.should_take_previous(
+                game.previous_turn_score, game.previous_dice_count, banked):
+            return ("take_previous",)
+        if game.can_end_turn() and self.should_stop(len(game.dice), game.turn_score, banked):
+            return ("end_turn",)
+        return ("roll",)
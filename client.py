@@ -0,0 +1,156 @@
+import copy
+import json
+import socket
+import engine
+from ruleset import CLASSIC
+from server import DEFAULT_HOST, DEFAULT_PORT
+
+
+def parse_address(address):
+    """Split "host[:port]" into (host, port), using the default port if none is given"""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return port or DEFAULT_HOST, DEFAULT_PORT
+    return host, int(port)
+
+
+class RemoteEngine:
+    """
+    Stand-in for engine.Engine that plays on a table hosted by server.py
+
+    Exposes the same state and actions the GUI uses, so Game can show a
+    remote table exactly like a local one. Every action is one request
+    and reply over a blocking socket, and checks that need no server, like
+    whether a selection is valid, are answered locally.
+    """
+    def __init__(self, player_count, host=DEFAULT_HOST, port=DEFAULT_PORT, seed=None, timeout=5.0):
+        """
+        Connect and create a table with every seat played from here
+        Args:
+            player_count (int): number of players
+            host (str): server address
+            port (int): server port
+            seed (int): seed for the table's rolls, chosen by the server if not given
+            timeout (float): seconds to wait for a reply
+        """
+        self.player_count = player_count
+        self.ruleset = CLASSIC.compile()  # Tables host classic games only
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Replies are tiny, send them now
+        self.stream = self.socket.makefile("rwb")
+        self.pending = None
+        self.resolved = None  # State to show once a pending farkle or bust is resolved
+        self.next_id = 0
+        self.dice = [1] * self.ruleset.dice
+        self.kept = []
+        reply = self.request("create", players=player_count, seed=seed)
+        self.table = reply["table"]
+        self.apply_state(reply["state"])
+
+    def request(self, op, **fields):
+        """
+        Send a request and wait for its reply
+        Returns:
+            dict: the reply, None if the server refused the action
+        """
+        self.next_id += 1
+        message = dict(fields, op=op, id=self.next_id)
+        if op != "create":
+            message["table"] = self.table
+        self.stream.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+        self.stream.flush()
+        while True:
+            line = self.stream.readline()
+            if not line:
+                raise ConnectionError("Server closed the connection")
+            reply = json.loads(line)
+            if reply.get("id") == self.next_id:
+                break  # Anything else is an update about another seat's move
+        if not reply["ok"]:
+            if op in ("create", "join", "state"):
+                raise ConnectionError(reply["error"])
+            return None
+        return reply
+
+    def apply_state(self, state):
+        """Copy the table's state from a reply"""
+        self.scores = state["scores"]
+        self.current_player = state["current_player"]
+        self.turn_score = state["turn_score"]
+        self.dice = state["dice"]
+        self.kept = state["kept"]
+        self.must_roll = state["must_roll"]
+        self.has_rolled = state["has_rolled"]
+        self.can_keep = state["can_keep"]
+        self.previous_turn_score = state["previous_turn_score"]
+        self.previous_dice_count = state["previous_dice_count"]
+        self.game_over = state["game_over"]
+        self.winner = state["winner"]
+        self.end_turn_allowed = state["can_end_turn"]
+        self.take_previous_allowed = state["can_take_previous"]
+
+    def snapshot(self):
+        """Copy of the table's state for a bot to think about, see Engine.snapshot"""
+        return copy.copy(self)  # apply_state replaces every field rather than changing it
+
+    def selected(self, mask):
+        """Face values of the active dice selected by mask"""
+        return [value for i, value in enumerate(self.dice) if mask >> i & 1]
+
+    def is_valid_selection(self, mask):
+        """Check if the active dice selected by mask may be kept"""
+        return engine.is_valid_selection(self.dice, mask)
+
+    def can_select(self, mask):
+        """Check if the active dice selected by mask could be part of a keep"""
+        return engine.can_select(self.dice, mask)
+
+    def can_end_turn(self):
+        return self.end_turn_allowed
+
+    def can_take_previous(self):
+        return self.take_previous_allowed
+
+    def roll(self, resolve=True):
+        """Roll the active dice on the server, see Engine.roll"""
+        reply = self.request("roll")
+        if reply is None:
+            return None
+        self.apply_state(reply["state"])
+        if "resolved" not in reply:
+            return reply["result"]
+        # The server has already resolved it, hold the result back until asked
+        self.pending = reply["result"]
+        self.resolved = reply["resolved"]
+        return self.resolve() if resolve else self.pending
+
+    def resolve(self):
+        """Show the state after a farkle or bust, see Engine.resolve"""
+        result = self.pending
+        if result is None:
+            return engine.ROLLED
+        self.apply_state(self.resolved)
+        self.pending = None
+        self.resolved = None
+        return result
+
+    def keep(self, mask):
+        return self.act("keep", mask=mask)
+
+    def end_turn(self):
+        return self.act("end_turn")
+
+    def take_previous(self):
+        return self.act("take_previous")
+
+    def act(self, op, **fields):
+        """Send an action and take on the table's new state"""
+        reply = self.request(op, **fields)
+        if reply is None:
+            return None
+        self.apply_state(reply["state"])
+        return reply["result"]
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
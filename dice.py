@@ -1,92 +1,367 @@
 import pygame
-import random
 import math
+import threading
+import array
+import numpy as np
+from collections import OrderedDict
+from assets import ROLL_SOUND, assets
+from audio import audio
+from profiler import profiler
+
+# Seconds every roll tumbles for, before each die's random extra time
+BASE_ROLL_TIME = 1.5
+FACE_RATE = 15  # Faces shown per second while tumbling
+WAVE_SPEEDS = np.array([6.0, 4.8])  # Angular speeds of the size pulse and the bounce
+TUMBLE_FACES = 997  # Length of the random face sequence tumbling dice read from
+
+
+def _column(name, flag=False):
+    """Property reading and writing one die's entry in a tray column"""
+    cells = name + "_cells"
+    if flag:
+        def get(self):
+            return bool(getattr(self.tray, cells)[self.index])
+
+        def set(self, value):
+            getattr(self.tray, cells)[self.index] = bool(value)
+    else:
+        def get(self):
+            return getattr(self.tray, cells)[self.index]
+
+        def set(self, value):
+            getattr(self.tray, cells)[self.index] = value
+    return property(get, set)
+
+
+class DiceTray:
+    """
+    State of many dice held in columns, one NumPy array per attribute
+
+    Rolling dice are animated in one vectorised step instead of one
+    update() call and its own sin() calls per die, and the Die objects are
+    views made once with the tray and reused for as long as it lives, so
+    play allocates no dice however many turns go by. A tray can hold the
+    six dice of a game or a big table of hundreds.
+    """
+    # Only picks the faces shown while tumbling, where dice land is decided by the engine
+    rng = np.random.default_rng()
+    # Faces a tumbling die shows, each roll starts somewhere random in it
+    tumble_faces = rng.integers(1, 7, TUMBLE_FACES).astype(np.int8)
+
+    def __init__(self, capacity=6):
+        """
+        Initialize the tray with every die at rest
+        Args:
+            capacity (int): number of dice
+        """
+        self.capacity = capacity
+        self.add_column("x", "i", 0)  # Screen position of the resting die
+        self.add_column("y", "i", 0)
+        self.add_column("value", "b", 1)  # Face showing
+        self.add_column("kept", "?", False)  # Whether the die has been kept for scoring
+        self.add_column("rolling", "?", False)
+        self.add_column("roll_time", "d", 0.0)  # Seconds the current roll has been tumbling
+        self.add_column("roll_length", "d", BASE_ROLL_TIME)  # Seconds the current roll tumbles for
+        self.add_column("face_changes", "i", 0)  # Tumbling faces shown so far this roll
+        self.add_column("final_value", "b", 0)  # Face to land on, 0 for any
+        self.add_column("tumble_start", "i", 0)  # Where the current roll reads tumble_faces from
+        # 3D effect
+        self.add_column("scale", "d", 1.0)
+        self.add_column("rotation", "d", 0.0)
+        self.add_column("bounce_height", "d", 0.0)
+        self.rolling_count = 0  # Dice rolling right now, so a still tray costs nothing to update
+        self.dice = [Die(0, 0, self, i) for i in range(capacity)]
+
+        # Shared with everything else that plays the roll sound
+        if Die.roll_sound is None:
+            Die.roll_sound = assets.sound(ROLL_SOUND)
+
+    def add_column(self, name, typecode, fill):
+        """
+        Add an attribute every die has
+        Args:
+            name (str): the column is self.<name> as a NumPy array
+            typecode (str): array module type code, "?" for true/false
+            fill: starting value of every die
+        """
+        # One buffer seen two ways: an array for fast single reads, NumPy for whole-column maths
+        cells = array.array("b" if typecode == "?" else typecode, [fill] * self.capacity)
+        setattr(self, name + "_cells", cells)
+        setattr(self, name, np.frombuffer(cells, dtype=bool if typecode == "?" else cells.typecode))
+
+    def place(self, start, values, x, y, spacing, kept=False):
+        """
+        Put a run of dice at rest in a row
+        Args:
+            start (int): index of the first die to use
+            values (list): face of each die
+            x (int): X position of the first die
+            y (int): Y position of the row
+            spacing (int): distance between dice
+            kept (bool): whether they are kept dice
+        Returns:
+            list: the Die views placed, in order
+        """
+        placed = slice(start, start + len(values))
+        self.x[placed] = x + spacing * np.arange(len(values))
+        self.y[placed] = y
+        self.value[placed] = values
+        self.kept[placed] = kept
+        self.rolling[placed] = False
+        self.rolling_count = int(self.rolling.sum())
+        self.final_value[placed] = 0
+        self.scale[placed] = 1.0
+        self.rotation[placed] = 0.0
+        self.bounce_height[placed] = 0.0
+        return self.dice[placed]
+
+    def arrange(self, x, y, columns, spacing):
+        """Lay every die out in a grid, for a big table"""
+        index = np.arange(self.capacity)
+        self.x[:] = x + index % columns * spacing
+        self.y[:] = y + index // columns * spacing
+
+    def roll(self, indices, values=None):
+        """
+        Start the rolling animation of the dice that aren't kept
+        Args:
+            indices (list): dice to roll
+            values (list): face each lands on once its animation ends, random if None
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        free = ~self.kept[indices]
+        indices = indices[free]
+        if not indices.size:
+            return
+        self.final_value[indices] = 0 if values is None else np.asarray(values)[free]
+        self.rolling[indices] = True
+        self.roll_time[indices] = 0.0
+        self.face_changes[indices] = 0
+        self.roll_length[indices] = BASE_ROLL_TIME + self.rng.integers(0, 121, indices.size) / 60  # 0-2 extra seconds
+        self.tumble_start[indices] = self.rng.integers(0, TUMBLE_FACES, indices.size)
+        self.rolling_count = int(self.rolling.sum())
+        audio.play(Die.roll_sound)  # Every die starting at once is heard as one roll
+
+    def update(self, dt, indices=None):
+        """
+        Advance the animation of every rolling die at once
+        Args:
+            dt (float): seconds of animation to play, already scaled by game
+                speed. Infinite finishes the roll straight away.
+            indices (list): only advance these dice, all of them if None
+        Returns:
+            bool: True if any of them are still rolling
+        """
+        if not self.rolling_count:
+            return False
+        if indices is None:
+            rolling = np.flatnonzero(self.rolling)
+        else:
+            indices = np.asarray(indices, dtype=np.intp)
+            rolling = indices[self.rolling[indices]]
+        if not rolling.size:
+            return False
+
+        t = self.roll_time[rolling] + dt
+        self.roll_time[rolling] = t
+        done = t >= self.roll_length[rolling]
+        moving = rolling
+        if done.any():
+            # Show the face each roll was decided to land on, anywhere if nothing decided it
+            landed = rolling[done]
+            final = self.final_value[landed]
+            self.value[landed] = np.where(final > 0, final, self.rng.integers(1, 7, landed.size))
+            self.rolling[landed] = False
+            self.rolling_count -= landed.size
+            self.final_value[landed] = 0
+            self.scale[landed] = 1.0
+            self.bounce_height[landed] = 0.0
+            self.rotation[landed] = 0.0
+            moving = rolling[~done]
+            if not moving.size:
+                return False
+            t = t[~done]
+
+        # Poses follow the time since the roll started, so slow frames skip ahead
+        waves = np.abs(np.sin(np.multiply.outer(WAVE_SPEEDS, t)))
+        self.scale[moving] = 1.0 + 0.2 * waves[0]
+        self.bounce_height[moving] = 20 * waves[1]
+        self.rotation[moving] = t * 360  # One turn a second
+        # Show a new face 15 times a second, once however many were skipped
+        changes = (t * FACE_RATE).astype(np.int32)
+        changed = changes != self.face_changes[moving]
+        if changed.any():
+            flipped = moving[changed]
+            self.face_changes[flipped] = changes[changed]
+            self.value[flipped] = self.tumble_faces[(self.tumble_start[flipped] + changes[changed]) % TUMBLE_FACES]
+        return True
+
+    def any_rolling(self):
+        return self.rolling_count > 0
+
+    def draw(self, surface):
+        """Draw every die in one batched blit, for a big table"""
+        surface.blits([die.blit_args() for die in self.dice], doreturn=False)
+
 
 class Die:
-    # Class-level variables
+    """
+    One die, as a view onto its entry in a DiceTray
+
+    Reading or setting an attribute goes straight to the tray's columns.
+    A die made on its own gets a tray of one.
+    """
+    __slots__ = ("tray", "index")
     roll_sound = None
-    speed_multiplier = 1.0  # Default speed multiplier
-    
-    def __init__(self, x, y):
+    size = 60
+    base_roll_time = BASE_ROLL_TIME
+    face_rate = FACE_RATE
+    # Rendered faces shared by all dice, least recently used first
+    sprite_cache = OrderedDict()
+    sprite_lock = threading.Lock()  # The cache is filled from the asset thread too
+    sprite_cache_size = 1024
+    rotation_step = 15  # Degrees between cached rotations
+    scale_step = 0.05  # Scale difference between cached sizes
+    transparent = (255, 0, 255)  # Colour key for the corners around a face
+
+    x = _column("x")
+    y = _column("y")
+    value = _column("value")  # Current face value of the die
+    kept = _column("kept", flag=True)
+    roll_time = _column("roll_time")
+    face_changes = _column("face_changes")
+    scale = _column("scale")
+    rotation = _column("rotation")
+    bounce_height = _column("bounce_height")
+
+    def __init__(self, x, y, tray=None, index=0):
         """
         Initialize a single die
         Args:
             x (int): X position on screen
             y (int): Y position on screen
+            tray (DiceTray): tray holding the die's state, a new one of its own if None
+            index (int): the die's entry in the tray
         """
-        self.size = 60
+        self.tray = tray if tray is not None else DiceTray(1)
+        self.index = index
         self.x = x
         self.y = y
-        self.value = 1  # Current face value of the die
-        self.kept = False  # Whether the die has been kept for scoring
-        self.rolling = False  # Whether the die is currently rolling
-        self.roll_frames = 0  # Animation frame counter
-        self.max_roll_frames = 90  # Base frames (will be adjusted by speed)
-        # Add random extra frames between 0-120 (0-2 additional seconds)
-        self.extra_frames = 0
-        # 3D effect attributes
-        self.scale = 1.0
-        self.rotation = 0
-        self.bounce_height = 0
-        
-        # Initialize sound if not already loaded
-        if Die.roll_sound is None:
-            try:
-                Die.roll_sound = pygame.mixer.Sound('sounds/dice_roll.wav')
-                Die.roll_sound.set_volume(0.3)
-            except:
-                print("Warning: Could not load dice roll sound")
-
-    def roll(self):
-        """Start the rolling animation if the die isn't kept"""
-        if not self.kept:
-            self.rolling = True
-            self.roll_frames = 0
-            self.extra_frames = random.randint(0, 120)  # 0-2 additional seconds
-            if Die.roll_sound:
-                Die.roll_sound.play()
-
-    def update(self):
-        """Update the die's animation state and value"""
-        if self.rolling:
-            if Die.speed_multiplier == float('inf'):
-                # Instant mode - skip animation
-                self.rolling = False
-                self.value = random.randint(1, 6)
-                self.scale = 1.0
-                self.bounce_height = 0
-                self.rotation = 0
-            else:
-                # Normal update with speed adjustment
-                self.roll_frames += 1 * Die.speed_multiplier
-                total_frames = self.max_roll_frames + self.extra_frames
-                if self.roll_frames < total_frames:
-                    # Animations
-                    self.scale = 1.0 + 0.2 * abs(math.sin(self.roll_frames * 0.1))  # Adjusted frequency
-                    self.bounce_height = 20 * abs(math.sin(self.roll_frames * 0.08))  # Adjusted frequency
-                    self.rotation = self.roll_frames * 6  # Adjusted rotation speed
-                    if self.roll_frames % 4 == 0:  # Change value more frequently
-                        self.value = random.randint(1, 6)
-                else:
-                    self.rolling = False
-                    self.scale = 1.0
-                    self.bounce_height = 0
-                    self.rotation = 0
-        
+
+    @property
+    def rolling(self):
+        return bool(self.tray.rolling_cells[self.index])
+
+    @rolling.setter
+    def rolling(self, value):
+        self.tray.rolling_cells[self.index] = bool(value)
+        self.tray.rolling_count = int(self.tray.rolling.sum())
+
+    @property
+    def extra_roll_time(self):
+        """Seconds the current roll tumbles for past the base time"""
+        return self.tray.roll_length_cells[self.index] - BASE_ROLL_TIME
+
+    @property
+    def final_value(self):
+        """Value to land on when the roll finishes, None for any"""
+        return self.tray.final_value_cells[self.index] or None
+
+    def roll(self, value=None):
+        """
+        Start the rolling animation if the die isn't kept
+        Args:
+            value (int): face to land on once the animation ends, random if None
+        """
+        self.tray.roll([self.index], None if value is None else [value])
+
+    def update(self, dt):
+        """
+        Advance the die's animation, see DiceTray.update
+        Args:
+            dt (float): seconds of animation to play, already scaled by game speed
+        """
+        self.tray.update(dt, [self.index])
+
     def draw(self, screen):
-        """Draw the die with 3D effects"""
-        # Calculate transformed size and position
-        scaled_size = int(self.size * self.scale)
-        x_offset = (scaled_size - self.size) // 2
-        y_offset = (scaled_size - self.size) // 2
-        
-        # Apply bounce offset
-        draw_y = self.y - self.bounce_height
+        """Draw the die with 3D effects as a single blit of a cached face"""
+        with profiler.span("die.draw"):
+            screen.blit(*self.blit_args())
+
+    def blit_args(self):
+        """Cached face for the die's current look and where it goes"""
+        sprite = self.get_sprite()
+        center_x = self.x + self.size // 2
+        center_y = self.y - self.bounce_height + self.size // 2  # Apply bounce offset
+        return sprite, (int(center_x) - sprite.get_width() // 2, int(center_y) - sprite.get_height() // 2)
+
+    def get_sprite(self):
+        """
+        Rendered face for the die's current look, from the shared cache
+        Returns:
+            pygame.Surface: face centered in a colour keyed square
+        """
+        rotation = round(self.rotation / Die.rotation_step) * Die.rotation_step % 360
+        scale = round(self.scale / Die.scale_step) * Die.scale_step
+        dots_visible = not self.rolling or self.roll_time > self.base_roll_time / 2
+        # Faces without dots look the same whatever the value
+        value = self.value if dots_visible else 0
+        key = (self.size, value, self.kept, rotation, round(scale, 3), dots_visible)
+
+        with Die.sprite_lock:
+            sprite = Die.sprite_cache.get(key)
+            if sprite is not None:
+                Die.sprite_cache.move_to_end(key)  # Most recently used goes last
+                return sprite
+
+        sprite = self.render_sprite(rotation, scale, dots_visible)
+        with Die.sprite_lock:
+            Die.sprite_cache[key] = sprite
+            if len(Die.sprite_cache) > Die.sprite_cache_size:
+                Die.sprite_cache.popitem(last=False)  # Evict the least recently used face
+        return sprite
+
+    @classmethod
+    def prebake(cls):
+        """Render every resting face and the dotless tumbling faces into the sprite cache"""
+        die = cls(0, 0)
+        for kept in (False, True):
+            die.kept = kept
+            for value in range(1, 7):
+                die.value = value
+                die.get_sprite()
+
+        # The first half of a roll only shows blank faces at each rotation and size
+        die.kept = False
+        die.rolling = True
+        for rotation in range(0, 360, cls.rotation_step):
+            for step in range(round(0.2 / cls.scale_step) + 1):
+                die.rotation = rotation
+                die.scale = 1.0 + step * cls.scale_step
+                die.get_sprite()
+
+    def render_sprite(self, rotation, scale, dots_visible):
+        """
+        Render the die face onto its own transparent surface
+        Args:
+            rotation (float): rotation in degrees
+            scale (float): size multiplier
+            dots_visible (bool): whether to draw the dots
+        Returns:
+            pygame.Surface: face centered in a colour keyed square
+        """
+        # Calculate transformed size, a rotated square never reaches past its half diagonal
+        scaled_size = int(self.size * scale)
+        half = int(self.size * scale * 0.71) + 1
+        # Colour keyed rather than per-pixel alpha, which blits much faster
+        sprite = pygame.Surface((half * 2, half * 2))
+        sprite.fill(Die.transparent)
+        sprite.set_colorkey(Die.transparent, pygame.RLEACCEL)
         
         # Draw die background with perspective skew
         color = (200, 200, 200) if not self.kept else (150, 150, 150)
-        center_x = self.x + self.size // 2
-        center_y = draw_y + self.size // 2
+        center_x = half
+        center_y = half
         
         points = [
             (center_x - scaled_size//2, center_y - scaled_size//2),
@@ -96,7 +371,7 @@ class Die:
         ]
         
         # Rotate points around center
-        angle_rad = math.radians(self.rotation)
+        angle_rad = math.radians(rotation)
         rotated_points = []
         for px, py in points:
             dx = px - center_x
@@ -105,12 +380,12 @@ class Die:
             rotated_y = center_y + (dx * math.sin(angle_rad) + dy * math.cos(angle_rad))
             rotated_points.append((int(rotated_x), int(rotated_y)))
         
-        pygame.draw.polygon(screen, color, rotated_points)
+        pygame.draw.polygon(sprite, color, rotated_points)
         
         # Draw dots with transformation
-        if not self.rolling or self.roll_frames > self.max_roll_frames // 2:
+        if dots_visible:
             dot_color = (0, 0, 0)
-            dot_radius = int(5 * self.scale)
+            dot_radius = int(5 * scale)
             positions = self.get_dot_positions()
             
             for pos in positions[self.value - 1]:
@@ -119,10 +394,31 @@ class Die:
                 dy = pos[1] - self.size//2
                 
                 # Apply rotation and scale transformations
-                rotated_x = center_x + (dx * math.cos(angle_rad) - dy * math.sin(angle_rad)) * self.scale
-                rotated_y = center_y + (dx * math.sin(angle_rad) + dy * math.cos(angle_rad)) * self.scale
+                rotated_x = center_x + (dx * math.cos(angle_rad) - dy * math.sin(angle_rad)) * scale
+                rotated_y = center_y + (dx * math.sin(angle_rad) + dy * math.cos(angle_rad)) * scale
                 
-                pygame.draw.circle(screen, dot_color, (int(rotated_x), int(rotated_y)), dot_radius)
+                pygame.draw.circle(sprite, dot_color, (int(rotated_x), int(rotated_y)), dot_radius)
+        return sprite
+
+    def get_rect(self):
+        """
+        Area the die paints, including any rotation, scaling and bounce
+        Returns:
+            pygame.Rect: bounding box of the drawn die
+        """
+        tray, i = self.tray, self.index  # Straight from the columns, this runs for every die every frame
+        # A rotated square never reaches past its half diagonal, plus a little for rounding
+        half = int(self.size * tray.scale_cells[i] * 0.71) + 3
+        center_x = tray.x_cells[i] + self.size // 2
+        center_y = int(tray.y_cells[i] - tray.bounce_height_cells[i]) + self.size // 2
+        return pygame.Rect(center_x - half, center_y - half, half * 2, half * 2)
+
+    def get_signature(self):
+        """Everything that changes how the die looks"""
+        tray, i = self.tray, self.index  # Straight from the columns, this runs for every die every frame
+        dots_visible = not tray.rolling_cells[i] or tray.roll_time_cells[i] > self.base_roll_time / 2
+        return (tray.value_cells[i], tray.kept_cells[i], tray.x_cells[i], tray.y_cells[i], tray.scale_cells[i],
+                tray.rotation_cells[i], tray.bounce_height_cells[i], dots_visible)
 
     def _get_rotated_rect(self, x, y, width, height, angle):
         """Helper method to get rotated rectangle points"""
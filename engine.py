@@ -0,0 +1,568 @@
+import copy
+import itertools
+import random
+from scoring import FACE_KEY, FACES, pack
+from ruleset import CLASSIC, MAX_DICE, ORDERED_DICE
+
+# Classic rules, for code that only ever plays them. Engines follow their own RuleSet.
+CLASSIC.compile()
+DICE_COUNT = CLASSIC.dice  # Dice in a full set
+WIN_SCORE = CLASSIC.target  # Score that must be hit exactly to win
+ENTRY_SCORE = CLASSIC.entry  # Score needed before points can be banked
+
+# Results returned by Engine actions
+ROLLED = "rolled"
+KEPT = "kept"
+FARKLE = "farkle"
+BUST = "bust"
+ENDED = "ended"
+WON = "won"
+TOOK_PREVIOUS = "took_previous"
+
+# Each RuleSet's masks map a tuple of face values -> (legal keep masks, keepable dice mask), filled as rolls come up
+ROLL_MASK_CACHE = 4096  # Orderings remembered per rule set before starting over, 46656 exist for six dice
+
+# Every ordering of dice has an index, its faces read as base 6 digits with
+# the first die lowest, so a roll is one random number and one lookup. A keep
+# mask is split into the first LOW_DICE dice and the rest, and each half is
+# looked up in a small table of what every mask of those dice keeps and leaves.
+LOW_DICE = 3
+LOW_MASK = (1 << LOW_DICE) - 1
+ORDERINGS = tuple(6 ** dice for dice in range(MAX_DICE + 1))  # Orderings of each number of dice
+FACE_SETS = 1 << 7  # Face bitmasks have bit v set for face v
+_HALVES = {}  # Dice in a half -> (values, key, keeps, dice) per ordering index, see _half_table
+_ROLLS = [None] * (ORDERED_DICE + 1)  # Dice count -> entries per ordering index, see roll_table
+
+
+def _half_table(size):
+    """
+    What every mask keeps out of every ordering of a few dice
+    Args:
+        size (int): dice in the half, up to MAX_DICE - LOW_DICE
+    Returns:
+        list: per ordering index, (values, key, keeps, dice). keeps has a
+            (key, faces, kept, rest) per mask: key packs the kept dice, faces
+            has bit v set for each kept v, kept and rest are the face values
+            kept and left in order. dice has, per face bitmask, the mask of
+            the dice showing one of those faces.
+    """
+    table = _HALVES.get(size)
+    if table is None:
+        table = []
+        for digits in itertools.product(FACES, repeat=size):
+            values = digits[::-1]  # The last die varies slowest, so it's the highest digit
+            keeps = []
+            for mask in range(1 << size):
+                kept = tuple(value for i, value in enumerate(values) if mask >> i & 1)
+                rest = tuple(value for i, value in enumerate(values) if not mask >> i & 1)
+                faces = 0
+                for value in kept:
+                    faces |= 1 << value
+                keeps.append((pack(kept), faces, kept, rest))
+            showing = [0] * 7  # Mask of the dice showing each face
+            for i, value in enumerate(values):
+                showing[value] |= 1 << i
+            # Each face set's dice are those of the set without its lowest face, plus that face's
+            dice = [0] * FACE_SETS
+            for faces in range(1, FACE_SETS):
+                lowest = faces & -faces
+                dice[faces] = dice[faces ^ lowest] | showing[lowest.bit_length() - 1]
+            table.append((values, pack(values), tuple(keeps), tuple(dice)))
+        _HALVES[size] = table  # Only once it's whole, a roll on another thread may be looking
+    return table
+
+
+def _join(low, high):
+    """
+    Entry for a roll made of two halves
+    Returns:
+        tuple: (values, key, low keeps, high keeps, low dice, high dice),
+            the keeps and dice of each half as from _half_table
+    """
+    return low[0] + high[0], low[1] + high[1], low[2], high[2], low[3], high[3]
+
+
+def roll_table(dice):
+    """
+    Every ordering of a number of dice by its index
+    Args:
+        dice (int): number of dice, up to ORDERED_DICE
+    Returns:
+        list: entries as from _join
+    """
+    table = _ROLLS[dice]
+    if table is None:
+        low = _half_table(min(dice, LOW_DICE))
+        table = _ROLLS[dice] = [_join(low_half, high_half)
+                                for high_half in _half_table(max(dice - LOW_DICE, 0)) for low_half in low]
+    return table
+
+
+def ordering(values):
+    """
+    Look a roll up by its faces
+    Args:
+        values (list): face values of the dice, up to MAX_DICE of them
+    Returns:
+        tuple: entry as from _join
+    """
+    if len(values) > MAX_DICE:
+        raise ValueError(f"At most {MAX_DICE} dice can be rolled, got {len(values)}")
+    index = 0
+    for value in reversed(values):
+        if not 1 <= value <= 6:
+            raise ValueError(f"Dice faces run from 1 to 6, got {value}")
+        index = index * 6 + value - 1
+    return _ordering(len(values), index)
+
+
+def _ordering(dice, index):
+    """Entry for an ordering index, joined from its halves for more than ORDERED_DICE dice"""
+    if dice <= ORDERED_DICE:
+        return _ROLLS[dice][index]
+    return _join(_HALVES[LOW_DICE][index % ORDERINGS[LOW_DICE]],
+                 _half_table(dice - LOW_DICE)[index // ORDERINGS[LOW_DICE]])
+
+
+def prepare_rolls(dice):
+    """Build every table rolls of up to this many dice are looked up in, see RuleSet.compile"""
+    for count in range(dice + 1):
+        if count <= ORDERED_DICE:
+            roll_table(count)
+        else:
+            _half_table(count - LOW_DICE)
+
+
+prepare_rolls(ORDERED_DICE)  # Built now, so no roll of the classic dice waits for a table
+
+
+def calculate_score(values, ruleset=CLASSIC):
+    """
+    Calculate the score of a group of kept dice
+    Args:
+        values (list): face values of the kept dice
+        ruleset (RuleSet): compiled rules to play by
+    Returns:
+        int: score for the dice, 0 if nothing scores
+    """
+    return ruleset.score[pack(values)]
+
+
+def has_scoring_dice(values, ruleset=CLASSIC):
+    """
+    Check if there are any possible scoring combinations in a roll
+    Args:
+        values (list): face values of the rolled dice
+        ruleset (RuleSet): compiled rules to play by
+    Returns:
+        bool: True if anything in the roll scores
+    """
+    return ruleset.score[pack(values)] > 0
+
+
+def scoring_mask(values, ruleset=CLASSIC):
+    """
+    Find every die in a roll that could be kept on its own
+    Args:
+        values (list): face values of the rolled dice
+        ruleset (RuleSet): compiled rules to play by
+    Returns:
+        int: bitmask of individually keepable dice, bit i is values[i]
+    """
+    faces = ruleset.keepable[pack(values)]
+    mask = 0
+    for i, value in enumerate(values):
+        if faces >> value & 1:
+            mask |= 1 << i
+    return mask
+
+
+def roll_masks(values, ruleset=CLASSIC):
+    """
+    Every legal keep out of a roll as a bitmask over its dice
+
+    Worked out once per distinct ordering of faces, so checking a selection
+    is a dict lookup however often the player clicks. A keep is legal if
+    every die in it is keepable and the dice score together, which a
+    die-by-die check can't tell: two of a three-pair roll pass on their own
+    but score nothing.
+    Args:
+        values (list): face values of the rolled dice
+        ruleset (RuleSet): compiled rules to play by
+    Returns:
+        tuple: (keeps, keepable) - dict of each legal keep mask to its score,
+            and the mask of every die that may be kept. Any non-empty part of
+            keepable can still grow into a legal keep.
+    """
+    values = tuple(values)
+    cache = ruleset.masks
+    masks = cache.get(values)
+    if masks is None:
+        if len(cache) >= ROLL_MASK_CACHE:
+            cache.clear()
+        keepable = scoring_mask(values, ruleset)
+        score = ruleset.score
+        keeps = {}
+        # Each selection's key is a smaller selection's plus its highest die
+        keys = [0] * (1 << len(values))
+        for mask in range(1, 1 << len(values)):
+            top = mask.bit_length() - 1
+            key = keys[mask] = keys[mask ^ (1 << top)] + FACE_KEY[values[top]]
+            if not mask & ~keepable and score[key]:
+                keeps[mask] = score[key]
+        masks = cache[values] = (keeps, keepable)
+    return masks
+
+
+def selection_score(values, mask, ruleset=CLASSIC):
+    """
+    Score of keeping the selected dice, counted straight from the roll
+    Args:
+        values (list): face values of all rolled dice
+        mask (int): bitmask of selected dice, bit i selects values[i]
+        ruleset (RuleSet): compiled rules to play by
+    Returns:
+        int: score of the keep, None if it isn't a legal keep
+    """
+    if mask <= 0 or mask >> len(values):
+        return None  # Nothing selected, or bits for dice that weren't rolled
+    faces = ruleset.keepable[pack(values)]
+    key = 0
+    for i, value in enumerate(values):
+        if mask >> i & 1:
+            if not faces >> value & 1:
+                return None
+            key += FACE_KEY[value]
+    return ruleset.score[key] or None
+
+
+def is_valid_selection(values, mask, ruleset=CLASSIC):
+    """
+    Check if the selected dice form a valid scoring combination
+    Args:
+        values (list): face values of all rolled dice
+        mask (int): bitmask of selected dice, bit i selects values[i]
+        ruleset (RuleSet): compiled rules to play by
+    Returns:
+        bool: True if the selection may be kept
+    """
+    return mask in roll_masks(values, ruleset)[0]
+
+
+def can_select(values, mask, ruleset=CLASSIC):
+    """
+    Check if the selected dice could be part of a keep, while the player is still picking
+
+    Every selected die has to be keepable on its own: a 1 or a 5, part of a
+    set of three or more, or part of a straight or three pairs.
+    Args:
+        values (list): face values of all rolled dice
+        mask (int): bitmask of selected dice, bit i selects values[i]
+        ruleset (RuleSet): compiled rules to play by
+    Returns:
+        bool: True if the selection is non-empty and every die in it is keepable
+    """
+    return mask != 0 and not mask & ~roll_masks(values, ruleset)[1]
+
+
+def potential_score(values, ruleset=CLASSIC):
+    """
+    Score of every die in a roll that could be kept on its own
+
+    Dice that can't be kept on their own never add to a score, so this is
+    the score of the whole roll.
+    Args:
+        values (list): face values of the rolled dice
+        ruleset (RuleSet): compiled rules to play by
+    Returns:
+        int: score if all individually keepable dice were kept
+    """
+    return ruleset.score[pack(values)]
+
+
+class Engine:
+    """
+    Headless rules engine for a game of dice
+
+    Holds only the rules-relevant state of a game and exposes the player
+    actions roll, keep, end_turn and take_previous. Nothing here touches
+    pygame, so it can be driven by the GUI, simulations or bots alike.
+    """
+    __slots__ = (
+        "player_count", "scores", "current_player", "turn_score",
+        "dice", "kept", "must_roll", "has_rolled", "can_keep", "pending",
+        "previous_turn_score", "previous_dice_count", "previous_kept",
+        "game_over", "winner", "rng", "log", "masks", "masks_for", "ruleset", "rolled",
+    )
+
+    def __init__(self, player_count, rng=None, log=None, ruleset=None):
+        """
+        Initialize the engine
+        Args:
+            player_count (int): number of players
+            rng: random.Random used for rolls, a fresh one if not given
+            log: replay.EventLog every accepted action is appended to, if given
+            ruleset (RuleSet): rules to play by, compiled here if they aren't yet, classic if not given
+        """
+        self.ruleset = (ruleset if ruleset is not None else CLASSIC).compile()
+        self.player_count = player_count
+        self.scores = [0] * player_count
+        self.current_player = 0
+        self.turn_score = 0  # Score accumulated this turn
+        # Dice are tuples, replaced rather than changed, so they can be shared with the tables
+        self.dice = (1,) * self.ruleset.dice  # Face values of the active dice
+        self.kept = ()  # Face values of the dice kept this turn, in slot order
+        self.must_roll = True  # True when player must roll (start of turn or after keeping dice)
+        self.has_rolled = False  # Track if player has rolled at least once this turn
+        self.can_keep = False  # True while the player has to choose dice to keep
+        self.pending = None  # FARKLE or BUST waiting for resolve()
+        self.previous_turn_score = 0  # Score the previous player ended with
+        self.previous_dice_count = 0  # Active dice the previous player had left
+        self.previous_kept = ()  # Dice the previous player had kept
+        self.game_over = False
+        self.winner = None
+        self.rng = rng if rng is not None else random.Random()
+        self.log = log
+        self.masks = None  # roll_masks() of the active dice, once something asked for them
+        self.masks_for = None  # The dice masks belongs to, every change replaces them
+        self.rolled = None  # ordering() of the active dice, once they've been rolled
+
+    def is_valid_selection(self, mask):
+        """Check if the active dice selected by mask may be kept"""
+        return mask in self.keep_masks()[0]
+
+    def can_select(self, mask):
+        """Check if the active dice selected by mask could be part of a keep"""
+        return mask != 0 and not mask & ~self.keep_masks()[1]
+
+    def snapshot(self):
+        """
+        Copy of the engine for a bot to think about on another thread
+
+        The copy has its own scores and no log, and dice are tuples that are
+        replaced rather than changed, so nothing played on here reaches it.
+        """
+        game = copy.copy(self)
+        game.scores = list(self.scores)
+        game.log = None
+        return game
+
+    def keep_masks(self):
+        """
+        Legal keeps of the active dice, see roll_masks
+
+        Worked out the first time they're asked for after a roll, so the
+        GUI's clicks and hints are lookups, while headless play that never
+        asks only counts up the one selection it keeps.
+        """
+        if self.masks_for is not self.dice:
+            self.masks = roll_masks(self.dice, self.ruleset)
+            self.masks_for = self.dice
+        return self.masks
+
+    def ordering(self):
+        """ordering() of the active dice, looked up again only if they were set from outside, e.g. by state.State"""
+        rolled = self.rolled
+        if rolled is None or rolled[0] is not self.dice:
+            rolled = self.rolled = ordering(self.dice)
+        return rolled
+
+    def scoring_mask(self):
+        """Mask of every active die that could be kept on its own, as the scoring_mask function finds"""
+        rolled = self.rolled
+        if rolled is None or rolled[0] is not self.dice:
+            rolled = self.ordering()
+        faces = self.ruleset.keepable[rolled[1]]
+        return rolled[4][faces] | rolled[5][faces] << LOW_DICE
+
+    def can_end_turn(self):
+        """Check if the current player may end their turn and bank"""
+        entry = self.ruleset.entry
+        return (self.must_roll and self.has_rolled and bool(self.kept) and
+                (self.scores[self.current_player] >= entry or self.turn_score >= entry))
+
+    def can_take_previous(self):
+        """Check if the current player may start with the previous player's score"""
+        banked = self.scores[self.current_player]
+        return (self.must_roll and not self.has_rolled and not self.game_over and
+                banked >= self.ruleset.entry and
+                self.previous_turn_score > 0 and
+                banked + self.previous_turn_score < self.ruleset.target)
+
+    def roll(self, resolve=True, values=None):
+        """
+        Roll the active dice
+        Args:
+            resolve (bool): apply a farkle or bust straight away. The GUI passes
+                False so the rolled dice stay on screen until resolve() is called.
+            values (list): faces to land on instead of rolling, used by replays
+        Returns:
+            str: ROLLED, FARKLE or BUST, None if rolling isn't allowed
+        """
+        if not self.must_roll or self.pending or self.game_over:
+            return None
+        rules = self.ruleset
+
+        if not self.dice:  # If no dice left
+            if len(self.kept) != rules.dice:
+                return None
+            # Check if rolling all dice would force a bust
+            if self.scores[self.current_player] + self.turn_score > rules.target:
+                self.pending = BUST
+                if self.log is not None:
+                    self.log.roll([])
+                return self.resolve() if resolve else BUST
+            # Return all dice to active area, keeping the turn score
+            self.dice = self.kept
+            self.kept = ()
+
+        dice = len(self.dice)
+        if values is not None:
+            if len(values) != dice:
+                raise ValueError(f"Expected {dice} dice, got {len(values)}")
+            rolled = ordering(values)
+        elif dice <= ORDERED_DICE:
+            rolled = _ROLLS[dice][int(self.rng.random() * ORDERINGS[dice])]
+        else:
+            rolled = _ordering(dice, self.rng.randrange(ORDERINGS[dice]))
+        self.rolled = rolled
+        self.dice = rolled[0]
+        if self.log is not None:
+            self.log.roll(self.dice)
+        self.must_roll = False
+        self.has_rolled = True
+
+        potential = rules.score[rolled[1]]
+        if potential == 0:
+            self.pending = FARKLE
+        elif self.scores[self.current_player] + self.turn_score + potential > rules.target:
+            self.pending = BUST
+        else:
+            self.can_keep = True
+            return ROLLED
+        return self.resolve() if resolve else self.pending
+
+    def resolve(self):
+        """
+        Apply a pending farkle or bust, ending the turn with no score
+        Returns:
+            str: the resolved result, ROLLED if nothing was pending
+        """
+        result = self.pending
+        if result is None:
+            return ROLLED
+        self.pending = None
+        self.turn_score = 0
+        self._finish_turn()
+        return result
+
+    def keep(self, mask):
+        """
+        Keep the active dice selected by mask
+        Args:
+            mask (int): bitmask of active dice to keep, bit i keeps dice[i]
+        Returns:
+            str: KEPT or BUST, None if the selection can't be kept
+        """
+        if not self.can_keep or mask <= 0 or mask >> len(self.dice):
+            return None
+        rolled = self.rolled
+        if rolled is None or rolled[0] is not self.dice:
+            rolled = self.ordering()
+        # What the mask keeps out of each half of the dice
+        key, faces, kept, rest = rolled[2][mask & LOW_MASK]
+        high_key, high_faces, high_kept, high_rest = rolled[3][mask >> LOW_DICE]
+        # Every kept die has to be keepable and together they have to score
+        rules = self.ruleset
+        if (faces | high_faces) & ~rules.keepable[rolled[1]]:
+            return None
+        potential = rules.score[key + high_key]
+        if not potential:
+            return None
+        if self.log is not None:
+            self.log.keep(mask)
+
+        # Check for bust
+        if self.scores[self.current_player] + self.turn_score + potential > rules.target:
+            self.can_keep = False
+            self.turn_score = 0
+            self._finish_turn()
+            return BUST
+
+        # Add score and move kept dice to kept area
+        self.turn_score += potential
+        self.kept += kept + high_kept
+        self.dice = rest + high_rest
+        self.must_roll = True
+        self.can_keep = False
+        return KEPT
+
+    def end_turn(self):
+        """
+        End the current player's turn, banking the turn score
+        Returns:
+            str: ENDED or WON, None if ending the turn isn't allowed
+        """
+        if not self.can_end_turn():
+            return None
+        if self.log is not None:
+            self.log.end_turn()
+        return self._finish_turn()
+
+    def take_previous(self):
+        """
+        Start the turn with the previous player's score and dice
+        Returns:
+            str: TOOK_PREVIOUS, None if the offer can't be taken
+        """
+        if not self.can_take_previous():
+            return None
+        if self.log is not None:
+            self.log.take_previous()
+
+        # Take previous score and the dice exactly as they were left
+        self.turn_score = self.previous_turn_score
+        self.kept = self.previous_kept
+        self.dice = (1,) * (0 if len(self.kept) == self.ruleset.dice else self.previous_dice_count)
+
+        # Clear the previous score so next player starts fresh
+        self.previous_turn_score = 0
+        self.previous_dice_count = 0
+        self.previous_kept = ()
+
+        self.must_roll = True
+        self.has_rolled = False
+        self.can_keep = False
+        return TOOK_PREVIOUS
+
+    def _finish_turn(self):
+        """Bank the turn score and pass play to the next player"""
+        # Store info for next player before resetting
+        self.previous_turn_score = self.turn_score
+        self.previous_dice_count = len(self.dice)
+        self.previous_kept = self.kept
+
+        # Update score if over the entry score or already over it
+        rules = self.ruleset
+        player = self.current_player
+        if self.scores[player] >= rules.entry or self.turn_score >= rules.entry:
+            self.scores[player] += self.turn_score
+            # Check for winner
+            if self.scores[player] >= rules.target:
+                self.game_over = True
+                self.winner = player
+                self.must_roll = False
+                self.can_keep = False
+                return WON
+
+        # Reset all dice
+        self.dice = (1,) * rules.dice
+        self.kept = ()
+
+        # Next player
+        self.current_player = (player + 1) % self.player_count
+        self.turn_score = 0
+        self.must_roll = True
+        self.has_rolled = False
+        self.can_keep = False
+        return ENDED
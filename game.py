@@ -1,9 +1,19 @@
 import pygame
-from dice import Die
 import random
+from dice import Die, DiceTray
+import engine
+from engine import Engine
+from render import DirtyRenderer, render_text
+from profiler import profiler
+from assets import assets
+from audio import audio
+from jobs import worker
+import odds
+from replay import new_seed
 
 class Game:
-    def __init__(self, screen, player_count, speed_multiplier=1.0, roll_sound=None, player_names=None):
+    def __init__(self, screen, player_count, speed_multiplier=1.0, roll_sound=None, player_names=None,
+                 seed=None, log=None, rules=None, bots=None, history=None, ruleset=None):
         """
         Initialize the game state
         Args:
@@ -12,49 +22,105 @@ class Game:
             speed_multiplier (float): speed multiplier for the game
             roll_sound: pygame mixer sound object for dice rolling sound
             player_names: list of player names
+            seed (int): seed deciding every roll, a random one if not given
+            log: replay.EventLog to record the game in
+            rules: engine to play on instead of a local one, e.g. client.RemoteEngine
+            bots: computer player for each seat, e.g. bot.ExpectimaxBot, None for people
+            history: history.HistoryStore to record the game in, if any
+            ruleset (RuleSet): rules of a local game, the classic rules if not given
         """
-        Die.speed_multiplier = speed_multiplier  # Set the class-level speed multiplier
         self.speed_multiplier = speed_multiplier
         self.screen = screen
         self.player_count = player_count
-        self.scores = [0] * player_count 
+        self.seed = seed if seed is not None else new_seed()
         # Use provided names or defaults
         self.player_names = player_names if player_names else ["Owen", "Olivia", "Zoe", "Mike", "Jenn", "Eleanor"][:player_count]  # Take only needed names
-        self.current_player = 0
-        self.current_score = 0  # Score accumulated this turn
-        self.turn_score = 0     # Total score for the turn
-        self.dice = [Die(100 + i * 80, 250) for i in range(6)]  # Back to Y=250
+        if rules is not None:
+            self.engine = rules  # Rules run wherever the given engine runs them
+        else:
+            recorder = None
+            if history is not None:
+                from history import GameRecorder
+                recorder = log = GameRecorder(history, self.player_names, [bot is not None for bot in bots or []], log)
+            if log is not None:
+                log.start_game(player_count, self.seed)
+            # All rules state lives in the engine
+            self.engine = Engine(player_count, random.Random(self.seed), log, ruleset)
+            if recorder is not None:
+                recorder.attach(self.engine)
+        self.ruleset = self.engine.ruleset
+        self.tray = DiceTray(self.ruleset.dice)  # Every die on the table, reused for the whole game
+        self.dice = self.tray.place(0, [1] * self.ruleset.dice, 100, 250, 80)  # Back to Y=250
         self.kept_dice = []  # Dice that have been scored this turn
         self.kept_dice_y = 150  # Back to Y=150
-        self.font = pygame.font.Font(None, 36)
+        self.font = assets.font(None, 36)
+        self.odds_font = assets.font(None, 24)
+        self.odds_key = None  # Position the odds text was worked out for
+        self.odds_text = ""
+        self.renderer = DirtyRenderer(screen, self.make_background())
         self.roll_button = pygame.Rect(300, 400, 100, 50)
         self.keep_button = pygame.Rect(450, 400, 100, 50)
         self.end_turn_button = pygame.Rect(600, 400, 120, 50)  # Made wider (100->120)
         self.rolling = False
-        self.must_roll = True  # True when player must roll (start of turn or after keeping dice)
-        self.has_rolled = False  # Track if player has rolled at least once this turn
-        self.available_dice_count = 6  # Track available dice for next player option
         self.can_take_previous_score = False  # Whether current player can take previous player's score
-        self.can_keep = False  # New flag to control keep button visibility
         self.no_score_timer = 0  # Add timer for no-score animation
         self.no_score_delay = 2.0 / speed_multiplier  # Adjust delay based on speed
         self.show_no_score = False  # Flag to show no-score indication
-        self.kept_slots = [False] * 6  # Track which slots are used for kept dice
+        self.kept_slots = [False] * self.ruleset.dice  # Track which slots are used for kept dice
         self.kept_dice_x = 100  # Starting X position for kept dice
         self.kept_dice_spacing = 80  # Space between kept dice slots
-        self.previous_turn_score = 0  # Add this to track previous player's score
-        self.previous_dice_count = 0  # Add this to track previous player's remaining dice
         self.take_score_button = pygame.Rect(300, 150, 300, 40)  # Made wider (250->300)
         self.show_bust = False
         self.bust_timer = 0
         self.bust_delay = 2.0 / speed_multiplier
-        self.game_over = False
-        self.winner = None
         self.menu_button = pygame.Rect(350, 300, 200, 50)
+        self.bots = bots if bots else [None] * player_count
+        self.bot_delay = 0.6  # Pause before each bot move so people can follow it, sped up like the dice
+        self.bot_timer = self.bot_delay
+        self.bot_job = None  # Bot move being worked out in the background
+        self.hint_bot = next((bot for bot in self.bots if bot is not None), None)  # Made on first hint otherwise
+        self.hint_job = None  # Best keep being worked out for a person
         self.roll_sound = roll_sound
-        self.roll_sound_playing = False  # Add new flag
+        self.roll_sound_playing = False  # Whether the roll sound still has to be faded out
         self.is_rolling = False  # Add this line
 
+    # Rules state is read straight from the engine
+    @property
+    def scores(self):
+        return self.engine.scores
+
+    @property
+    def current_player(self):
+        return self.engine.current_player
+
+    @property
+    def turn_score(self):
+        return self.engine.turn_score
+
+    @property
+    def must_roll(self):
+        return self.engine.must_roll
+
+    @property
+    def has_rolled(self):
+        return self.engine.has_rolled
+
+    @property
+    def can_keep(self):
+        return self.engine.can_keep
+
+    @property
+    def previous_turn_score(self):
+        return self.engine.previous_turn_score
+
+    @property
+    def game_over(self):
+        return self.engine.game_over
+
+    @property
+    def winner(self):
+        return self.engine.winner
+
     def update(self, dt):
         """Update game state"""
         # Adjust dt based on speed multiplier
@@ -63,549 +129,394 @@ class Game:
         else:
             dt = float('inf')
 
-        # Update dice animations and check rolling state
-        any_rolling = False
-        for die in self.dice:
-            die.update()
-            if die.rolling:
-                any_rolling = True
+        with profiler.span("update.dice"):
+            # Update dice animations and check rolling state, all in one step
+            any_rolling = self.tray.update(dt)
         
-        # Mute all sound if dice aren't rolling
-        if not any_rolling:
-            pygame.mixer.stop()
-            self.roll_sound_playing = False
+            # Fade the roll sound out once, when the last die settles
+            if self.roll_sound_playing and not any_rolling:
+                audio.fade_out(Die.roll_sound)
+                self.roll_sound_playing = False
+
+        with profiler.span("update.rules"):
+            # Check for no-score situation only after dice finish rolling
+            if self.rolling and not any_rolling:
+                self.rolling = False
+                if self.engine.pending == engine.FARKLE:
+                    self.show_no_score = True
+                    self.no_score_timer = self.no_score_delay
+                elif self.engine.pending == engine.BUST:
+                    # Keeping all scoring dice would go over, so the turn busts
+                    self.engine.resolve()
+                    self.show_bust_message()
+                    self.layout_dice()
         
-        # Check for no-score situation only after dice finish rolling
-        if self.rolling and not any_rolling:
-            self.rolling = False
-            if not self.has_scoring_dice():
-                self.show_no_score = True
-                self.no_score_timer = self.no_score_delay
-            else:
-                # Check for potential bust after dice stop rolling
-                if not self.check_potential_bust():
-                    self.can_keep = True  # Enable keep button if no bust
-        
-        self.rolling = any_rolling
-        self.is_rolling = any_rolling
-
-        # Handle no-score timer using real time
-        if self.show_no_score:
-            self.no_score_timer -= dt
-            if self.no_score_timer <= 0:
-                self.show_no_score = False
-                self.turn_score = 0
-                self.end_turn()
+            self.rolling = any_rolling
+            self.is_rolling = any_rolling
 
-        # Handle bust timer using real time
-        if self.show_bust:
-            self.bust_timer -= dt
-            if self.bust_timer <= 0:
-                self.show_bust = False
-
-        # Handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                return True
+            # Handle no-score timer using real time
+            if self.show_no_score:
+                self.no_score_timer -= dt
+                if self.no_score_timer <= 0:
+                    self.show_no_score = False
+                    self.engine.resolve()
+                    self.layout_dice()
+
+            # Handle bust timer using real time
+            if self.show_bust:
+                self.bust_timer -= dt
+                if self.bust_timer <= 0:
+                    self.show_bust = False
+
+        with profiler.span("update.analysis"):
+            # Bots move once everything from the last move has played out
+            bot = self.current_bot()
+            if bot is not None and not (self.rolling or self.show_no_score or self.show_bust):
+                if self.bot_job is None:
+                    self.bot_job = worker.submit(bot.act, self.engine.snapshot())  # Thinks during the pause
+                self.bot_timer -= dt
+                if self.bot_timer <= 0:
+                    ready, action = worker.result(self.bot_job)
+                    if ready:
+                        self.bot_job = None
+                        self.bot_timer = self.bot_delay
+                        self.play_bot_move(action)
+
+            # Select the hinted dice once the hint is in
+            ready, mask = worker.result(self.hint_job)
+            if ready:
+                self.hint_job = None
+                for i, die in enumerate(self.dice):
+                    die.kept = bool(mask >> i & 1)
+
+        with profiler.span("update.events"):
+            # Handle events
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    return True
+
+                if event.type == pygame.KEYDOWN and event.key == profiler.toggle_key:
+                    profiler.toggle()
+
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                    self.request_hint()
             
-            if not self.rolling:  # Only allow interaction when dice aren't rolling
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    mouse_pos = event.pos
+                if not self.rolling:  # Only allow interaction when dice aren't rolling
+                    if event.type == pygame.MOUSEBUTTONDOWN:
+                        mouse_pos = event.pos
                     
-                    # Handle menu button if game is over
-                    if self.game_over and self.menu_button.collidepoint(mouse_pos):
-                        return True  # Signal to return to menu
-
-                    # Handle taking previous score with button instead of key
-                    if (self.take_score_button.collidepoint(mouse_pos) and 
-                        self.must_roll and not self.has_rolled and 
-                        self.scores[self.current_player] >= 1000 and 
-                        self.previous_turn_score > 0 and
-                        self.scores[self.current_player] + self.previous_turn_score < 10000):
-                        # Take previous score and setup dice
-                        self.turn_score = self.previous_turn_score
-                        
-                        # Restore kept dice exactly as they were
-                        self.kept_dice = self.previous_kept_dice[:]
-                        self.kept_slots = self.previous_kept_slots[:]
-                        
-                        # If previous player had all dice kept (6 kept, 0 active)
-                        if len(self.previous_kept_dice) == 6:
-                            self.dice = []  # No active dice to start
-                        else:
-                            # Keep only the number of active dice needed
-                            while len(self.dice) > self.previous_dice_count:
-                                self.dice.pop(random.randint(0, len(self.dice) - 1))
-                            # Position active dice
-                            x_offset = 100
+                        # Handle menu button if game is over
+                        if self.game_over and self.menu_button.collidepoint(mouse_pos):
+                            return True  # Signal to return to menu
+
+                        if self.current_bot() is not None:
+                            continue  # The computer is playing this seat
+
+                        # Handle taking previous score with button instead of key
+                        if (self.take_score_button.collidepoint(mouse_pos) and 
+                            self.engine.can_take_previous()):
+                            # Take previous score and restore the dice as they were
+                            self.engine.take_previous()
+                            self.layout_dice()
+
+                        # Only allow dice selection if we've rolled and haven't kept yet
+                        if self.has_rolled and self.can_keep:
                             for die in self.dice:
-                                die.x = x_offset
-                                die.y = 250
-                                x_offset += 80
-
-                        # Clear the previous score so next player starts fresh
-                        self.previous_turn_score = 0
-                        self.previous_dice_count = 0
-                        self.previous_kept_dice = []
-                        self.previous_kept_slots = [False] * 6
-                        
-                        # Set proper state for continuing turn
-                        self.must_roll = True
-                        self.has_rolled = False
-                        self.can_keep = False
-
-                    # Only allow dice selection if we've rolled and haven't kept yet
-                    if self.has_rolled and self.can_keep:
-                        for die in self.dice:
-                            if die.contains_point(mouse_pos):
-                                die.kept = not die.kept
-                                # If dice were deselected, always allow
-                                # If dice were selected, only allow if they make a valid score
-                                if die.kept and not self.is_valid_selection():
-                                    die.kept = False  # Revert the selection
-
-                    # Handle buttons
-                    if self.roll_button.collidepoint(mouse_pos) and self.must_roll:
-                        self.roll_dice()
-                    elif self.keep_button.collidepoint(mouse_pos) and self.has_rolled and self.can_keep:
-                        if self.is_valid_selection():  # Only keep if selection is valid
-                            self.keep_dice()
-                    elif self.end_turn_button.collidepoint(mouse_pos) and self.has_rolled and self.kept_dice:
-                        self.end_turn()
-
-        # Debug print to check states
-        print(f"Rolling: {self.is_rolling}, Sound Playing: {self.roll_sound_playing}")
+                                if die.contains_point(mouse_pos):
+                                    die.kept = not die.kept
+                                    # If dice were deselected, always allow
+                                    # If dice were selected, only allow if they can still be kept
+                                    if die.kept and not self.engine.can_select(self.selection_mask()):
+                                        die.kept = False  # Revert the selection
+
+                        # Handle buttons
+                        if self.roll_button.collidepoint(mouse_pos) and self.must_roll:
+                            self.roll_dice()
+                        elif self.keep_button.collidepoint(mouse_pos) and self.has_rolled and self.can_keep:
+                            if self.is_valid_selection():  # Only keep if selection is valid
+                                self.keep_dice()
+                        elif self.end_turn_button.collidepoint(mouse_pos) and self.engine.can_end_turn():
+                            self.end_turn()
 
         return False
 
+    def is_animating(self):
+        """Check if anything on screen is moving or counting down"""
+        return (self.rolling or self.show_no_score or self.show_bust or
+                self.current_bot() is not None or self.hint_job is not None or
+                self.tray.any_rolling())
+
     def draw(self, screen):
-        """Draw game state"""
-        screen.fill((50, 100, 50))
-        
-        # Draw active dice with red border if no score
-        for die in self.dice:
-            die.draw(self.screen)
-            if self.show_no_score:
-                # Draw red border around die
-                pygame.draw.rect(self.screen, (255, 0, 0), 
-                               (die.x - 2, die.y - 2, die.size + 4, die.size + 4), 
-                               2)  # 2 pixel width border
+        """
+        Draw game state, repainting only what changed
+        Returns:
+            list: rects that changed, for pygame.display.update
+        """
+        renderer = self.renderer
+        white = (255, 255, 255)
 
-        # Draw kept dice
-        for die in self.kept_dice:
-            die.draw(self.screen)
+        # Draw active dice with red border if no score, or if kept when busting
+        for i, die in enumerate(self.dice):
+            border = self.show_no_score or (self.show_bust and die.kept)
+            self.add_die(("active", i), die, border)
 
-        # Draw section labels
-        active_label = self.font.render("Active Dice", True, (255, 255, 255))
-        kept_label = self.font.render("Kept Dice", True, (255, 255, 255))
-        self.screen.blit(active_label, (100, 220))
-        self.screen.blit(kept_label, (100, 120))
+        # Draw kept dice
+        for i, die in enumerate(self.kept_dice):
+            self.add_die(("kept", i), die, False)
 
         # Draw buttons based on game state
         if self.must_roll:
             # Show Roll button
-            pygame.draw.rect(self.screen, (200, 200, 200), self.roll_button)
-            roll_text = self.font.render("Roll", True, (0, 0, 0))
-            self.screen.blit(roll_text, (320, 415))
+            self.add_button("roll", self.roll_button, "Roll", (320, 415))
             
             # Only show End Turn if:
             # 1. Player has kept some dice AND
-            # 2. Player hasn't rolled yet AND
-            # 3. Player either has 1000+ points or will have 1000+ after this turn
-            if (self.kept_dice and 
-                (self.scores[self.current_player] >= 1000 or 
-                 self.turn_score >= 1000)):
-                pygame.draw.rect(self.screen, (200, 200, 200), self.end_turn_button)
-                end_text = self.font.render("End Turn", True, (0, 0, 0))
-                self.screen.blit(end_text, (610, 415))
+            # 2. Player has rolled this turn AND
+            # 3. Player either has the entry score or will have it after this turn
+            if self.engine.can_end_turn():
+                self.add_button("end_turn", self.end_turn_button, "End Turn", (610, 415))
         
         if self.has_rolled and self.can_keep:  # Only show Keep button during dice selection
-            pygame.draw.rect(self.screen, (200, 200, 200), self.keep_button)
-            keep_text = self.font.render("Keep", True, (0, 0, 0))
-            self.screen.blit(keep_text, (470, 415))
+            self.add_button("keep", self.keep_button, "Keep", (470, 415))
 
         # Draw scores in bottom left
         for i in range(self.player_count):
-            score_text = self.font.render(f"{self.player_names[i]}: {self.scores[i]}", True, (255, 255, 255))
-            self.screen.blit(score_text, (50, self.screen.get_height() - 180 + i * 30))  # Start 180px from bottom
+            renderer.add_text(("score", i), self.font, f"{self.player_names[i]}: {self.scores[i]}", white,
+                              (50, self.screen.get_height() - 180 + i * 30))  # Start 180px from bottom
 
         # Draw current player
-        current_text = self.font.render(f"Current Player: {self.player_names[self.current_player]}", True, (255, 255, 255))
-        self.screen.blit(current_text, (300, 50))
+        renderer.add_text("current", self.font, f"Current Player: {self.player_names[self.current_player]}",
+                          white, (300, 50))
 
         # Add display for current turn score
-        turn_text = self.font.render(f"Turn Score: {self.turn_score}", True, (255, 255, 255))
-        self.screen.blit(turn_text, (300, 100))
+        renderer.add_text("turn", self.font, f"Turn Score: {self.turn_score}", white, (300, 100))
+
+        # Chances the next roll loses the turn
+        if self.must_roll:
+            renderer.add_text("odds", self.odds_font, self.next_roll_odds(), (220, 220, 220), (520, 108))
 
         # Show if player can take previous score
         if self.can_take_previous_score:
-            prev_score_text = self.font.render(f"Can take previous score: {self.turn_score}", 
-                                             True, (255, 255, 0))
-            self.screen.blit(prev_score_text, (300, 150))
+            renderer.add_text("can_take", self.font, f"Can take previous score: {self.turn_score}",
+                              (255, 255, 0), (300, 150))
 
         # Show minimum score warning if needed
-        if self.scores[self.current_player] < 1000:
-            min_score_text = self.font.render("Need 1000 to keep score", True, (255, 100, 100))
-            text_width = min_score_text.get_width()
-            self.screen.blit(min_score_text, (self.screen.get_width() - text_width - 20, 20))
+        if self.scores[self.current_player] < self.ruleset.entry:
+            text = f"Need {self.ruleset.entry} to keep score"
+            text_width = render_text(self.font, text, (255, 100, 100)).get_width()
+            renderer.add_text("min_score", self.font, text, (255, 100, 100),
+                              (self.screen.get_width() - text_width - 20, 20))
 
         # Show "No Score!" text when applicable
         if self.show_no_score:
-            no_score_text = self.font.render("No Score!", True, (255, 0, 0))
-            self.screen.blit(no_score_text, (350, 150)) 
+            renderer.add_text("no_score", self.font, "No Score!", (255, 0, 0), (350, 150))
 
         # Show option to take previous score if eligible
         if (self.must_roll and not self.has_rolled and 
-            self.scores[self.current_player] >= 1000 and 
+            self.scores[self.current_player] >= self.ruleset.entry and 
             self.previous_turn_score > 0):
-            pygame.draw.rect(self.screen, (50, 50, 0), self.take_score_button)  # Dark yellow background
-            take_score_text = self.font.render(
-                f"Take previous score: {self.previous_turn_score}", 
-                True, (255, 255, 0))  # Bright yellow text
-            # Center the text on the button
-            text_rect = take_score_text.get_rect(center=self.take_score_button.center)
-            self.screen.blit(take_score_text, text_rect)
-
-        # Draw red borders around dice when busting
+            text = f"Take previous score: {self.previous_turn_score}"
+            # Long captions spill past the button, so cover both
+            text_rect = render_text(self.font, text, (255, 255, 0)).get_rect(center=self.take_score_button.center)
+            renderer.add("take_score", self.take_score_button.union(text_rect), text,
+                         lambda surface: self.draw_centered_button(
+                             surface, self.take_score_button, (50, 50, 0), text, (255, 255, 0)))
+
+        # Show "BUST!" text
         if self.show_bust:
-            for die in self.dice:
-                if die.kept:
-                    pygame.draw.rect(self.screen, (255, 0, 0), 
-                                   (die.x - 2, die.y - 2, die.size + 4, die.size + 4), 
-                                   2)
-            # Show "BUST!" text
-            bust_text = self.font.render("BUST!", True, (255, 0, 0))
-            self.screen.blit(bust_text, (350, 150))
+            renderer.add_text("bust", self.font, "BUST!", (255, 0, 0), (350, 150))
 
         # Show winner and menu button if game is over
         if self.game_over and self.winner is not None:
-            # Dim background
-            s = pygame.Surface((self.screen.get_width(), self.screen.get_height()))
-            s.set_alpha(128)
-            s.fill((0, 0, 0))
-            self.screen.blit(s, (0, 0))
-
-            # Show winner text
-            winner_text = self.font.render(f"{self.player_names[self.winner]} wins!", True, (255, 255, 0))
-            text_rect = winner_text.get_rect(center=(self.screen.get_width()//2, 200))
-            self.screen.blit(winner_text, text_rect)
-
-            # Draw menu button
-            pygame.draw.rect(self.screen, (200, 200, 200), self.menu_button)
-            menu_text = self.font.render("Back to Menu", True, (0, 0, 0))
-            text_rect = menu_text.get_rect(center=self.menu_button.center)
-            self.screen.blit(menu_text, text_rect)
+            renderer.add("game_over", self.screen.get_rect(), self.winner, self.draw_game_over)
+
+        return renderer.render()
+
+    def next_roll_odds(self):
+        """Farkle and bust chances of the next roll, only worked out again when the position changes"""
+        banked = self.scores[self.current_player]
+        key = (len(self.engine.dice), banked, self.turn_score)
+        if key != self.odds_key:
+            farkle, bust = odds.next_roll_odds(*key, self.ruleset)
+            self.odds_key = key
+            self.odds_text = f"Farkle {farkle:.1%}  Bust {bust:.1%}"
+        return self.odds_text
+
+    def make_background(self):
+        """Pre-render the parts of the game screen that never change"""
+        background = pygame.Surface(self.screen.get_size())
+        background.fill((50, 100, 50))
+
+        # Draw section labels
+        active_label = render_text(self.font, "Active Dice", (255, 255, 255))
+        kept_label = render_text(self.font, "Kept Dice", (255, 255, 255))
+        background.blit(active_label, (100, 220))
+        background.blit(kept_label, (100, 120))
+        return background
+
+    def add_die(self, key, die, border):
+        """Queue a die, with a red border around its resting place if asked"""
+        rect = die.get_rect()
+        border_rect = pygame.Rect(die.x - 2, die.y - 2, die.size + 4, die.size + 4)
+        if border:
+            rect.union_ip(border_rect)
+
+        def draw(surface):
+            die.draw(surface)
+            if border:
+                pygame.draw.rect(surface, (255, 0, 0), border_rect, 2)  # 2 pixel width border
+
+        self.renderer.add(key, rect, (die.get_signature(), border), draw)
+
+    def add_button(self, key, rect, label, label_pos):
+        """Queue a grey button with its caption"""
+        def draw(surface):
+            pygame.draw.rect(surface, (200, 200, 200), rect)
+            surface.blit(render_text(self.font, label, (0, 0, 0)), label_pos)
+
+        self.renderer.add(key, rect, label, draw)
+
+    def draw_centered_button(self, surface, rect, color, label, label_color):
+        """Draw a button with its caption centered on it"""
+        pygame.draw.rect(surface, color, rect)
+        text = render_text(self.font, label, label_color)
+        surface.blit(text, text.get_rect(center=rect.center))
+
+    def draw_game_over(self, surface):
+        """Dim the table and show the winner and the menu button"""
+        # Dim background
+        s = pygame.Surface((surface.get_width(), surface.get_height()))
+        s.set_alpha(128)
+        s.fill((0, 0, 0))
+        surface.blit(s, (0, 0))
+
+        # Show winner text
+        winner_text = render_text(self.font, f"{self.player_names[self.winner]} wins!", (255, 255, 0))
+        text_rect = winner_text.get_rect(center=(surface.get_width()//2, 200))
+        surface.blit(winner_text, text_rect)
+
+        # Draw menu button
+        self.draw_centered_button(surface, self.menu_button, (200, 200, 200), "Back to Menu", (0, 0, 0))
 
     def roll_dice(self):
         """Handle dice rolling"""
-        if not self.dice:  # If no dice left
-            if len(self.kept_dice) == 6:  # All dice have been kept
-                # Check if rolling all dice would force a bust
-                if self.scores[self.current_player] + self.turn_score > 10000:
-                    self.show_bust = True
-                    self.bust_timer = self.bust_delay
-                    self.turn_score = 0
-                    self.end_turn()
-                    return
-                # Return all dice to active area
-                self.dice = self.kept_dice
-                self.kept_dice = []
-                # Reset positions and slots
-                self.kept_slots = [False] * 6  # Reset all slots
-                x_offset = 100
-                for die in self.dice:
-                    die.kept = False
-                    die.x = x_offset
-                    die.y = 250
-                    x_offset += 80
-                # Only reset roll state, keep turn score
-                self.has_rolled = False
-            else:
-                return
+        # The engine decides the roll now, farkles and busts are resolved once the dice land
+        if self.engine.roll(resolve=False) is None:
+            return
+        self.position_changed()
+        if len(self.dice) != len(self.engine.dice):
+            # All six dice were kept, so they come back to the active area
+            self.layout_dice()
 
         # Roll available dice
         for die in self.dice:
-            die.roll()
-        self.must_roll = False
-        self.has_rolled = True
+            die.kept = False
+        self.tray.roll([die.index for die in self.dice], self.engine.dice)
         self.rolling = True
-        self.can_keep = False  # Will be set to True after rolling animation if no bust
+        self.roll_sound_playing = True
 
     def has_scoring_dice(self):
         """Check if there are any possible scoring combinations in current roll"""
-        values = [die.value for die in self.dice]
-        value_counts = {}
-        for value in values:
-            value_counts[value] = value_counts.get(value, 0) + 1
-
-        # Check for three pairs
-        if len(value_counts) == 3 and all(count == 2 for count in value_counts.values()):
-            return True
-
-        # Check for straight
-        if len(values) == 6 and len(set(values)) == 6:
-            return True
-
-        # Check for three or more of a kind
-        if any(count >= 3 for count in value_counts.values()):
-            return True
+        return engine.has_scoring_dice(self.engine.dice, self.ruleset)
 
-        # Check for single 1's and 5's
-        return 1 in values or 5 in values
+    def selection_mask(self):
+        """Bitmask of the active dice currently selected by the player"""
+        mask = 0
+        for i, die in enumerate(self.dice):
+            if die.kept:
+                mask |= 1 << i
+        return mask
 
     def is_valid_selection(self):
         """Check if currently selected dice form a valid scoring combination"""
-        selected = [die for die in self.dice if die.kept]
-        if not selected:
-            return False
-            
-        # Get counts for both selected and all available dice
-        all_values = [die.value for die in self.dice]
-        all_value_counts = {}
-        for value in all_values:
-            all_value_counts[value] = all_value_counts.get(value, 0) + 1
-
-        selected_values = [die.value for die in selected]
-        selected_counts = {}
-        for value in selected_values:
-            selected_counts[value] = selected_counts.get(value, 0) + 1
-
-        # Check for straight possibility (all dice different)
-        if len(all_values) == 6 and len(set(all_values)) == 6:
-            return True
-
-        # Check for three pairs possibility
-        pairs_possible = len([v for v, c in all_value_counts.items() if c >= 2]) >= 3
-        if pairs_possible:
-            return True
-
-        # Check if each selected value belongs to a set of three or more
-        for value, count in selected_counts.items():
-            if all_value_counts[value] >= 3:
-                # This value has three or more available, allow it
-                continue
-            elif value in [1, 5]:
-                # 1's and 5's always allowed
-                continue
-            else:
-                # This value doesn't have three available and isn't 1 or 5
-                return False
-
-        return True
+        return self.engine.is_valid_selection(self.selection_mask())
 
     def keep_dice(self):
         """Handle keeping current dice selection"""
+        mask = self.selection_mask()
         kept = [die for die in self.dice if die.kept]
-        if not kept:
-            return
-
-        potential_score = self.calculate_score(kept)
-        if potential_score == 0:
+        result = self.engine.keep(mask)
+        if result is not None:
+            self.position_changed()
+        if result == engine.BUST:
+            self.show_bust_message()
+            self.layout_dice()
             return
-
-        # Check for bust
-        if self.scores[self.current_player] + self.turn_score + potential_score > 10000:
-            self.show_bust = True
-            self.bust_timer = self.bust_delay
-            self.turn_score = 0
-            self.end_turn()
+        if result is None:
             return
 
-        # Add score and move kept dice to kept area
-        self.turn_score += potential_score
-        
-        # Find available slots and move dice to them
+        # Move kept dice to the next free slots in the kept area
         for die in kept:
-            # Find first empty slot
-            for i in range(6):
-                if not self.kept_slots[i]:
-                    self.kept_slots[i] = True
-                    die.kept = True
-                    die.x = self.kept_dice_x + (i * self.kept_dice_spacing)
-                    die.y = self.kept_dice_y
-                    self.kept_dice.append(die)
-                    self.dice.remove(die)
-                    break
+            slot = len(self.kept_dice)
+            self.kept_slots[slot] = True
+            die.x = self.kept_dice_x + (slot * self.kept_dice_spacing)
+            die.y = self.kept_dice_y
+            self.kept_dice.append(die)
+            self.dice.remove(die)
 
         # Reset selection state of remaining dice
         for die in self.dice:
             die.kept = False
 
-        self.must_roll = True
-        self.can_keep = False
-
     def end_turn(self):
         """Handle end of player's turn"""
-        if self.has_rolled:
-            # Store info for next player before resetting
-            self.previous_turn_score = self.turn_score
-            self.previous_dice_count = len(self.dice)
-            # Store kept dice state
-            self.previous_kept_dice = self.kept_dice[:]  # Make a copy
-            self.previous_kept_slots = self.kept_slots[:]
-
-            # Update score if over 1000 or already over 1000
-            if self.scores[self.current_player] >= 1000 or self.turn_score >= 1000:
-                self.scores[self.current_player] += self.turn_score
-                # Check for winner
-                if self.scores[self.current_player] >= 10000:
-                    self.game_over = True
-                    self.winner = self.current_player
-                    return
-
-            # Reset all dice and positions
-            self.dice = []
-            self.kept_dice = []  # Clear kept dice
-            self.kept_slots = [False] * 6  # Reset slots
-            x_offset = 100
-            for i in range(6):
-                die = Die(x_offset, 250)
-                self.dice.append(die)
-                x_offset += 80
-
-            # Next player
-            self.current_player = (self.current_player + 1) % self.player_count
-            self.turn_score = 0
-            self.must_roll = True
-            self.has_rolled = False
-            self.can_keep = False
+        if self.engine.end_turn() == engine.ENDED:
+            self.layout_dice()
+
+    def current_bot(self):
+        """Bot playing the current seat, None if it's a person's turn or the game is over"""
+        if self.game_over:
+            return None
+        return self.bots[self.current_player]
+
+    def play_bot_move(self, action):
+        """Play a move a bot chose, like a click would"""
+        if action[0] == "keep":
+            for i, die in enumerate(self.dice):
+                die.kept = bool(action[1] >> i & 1)
+            self.keep_dice()
+        elif action[0] == "roll":
+            self.roll_dice()
+        elif action[0] == "end_turn":
+            self.end_turn()
+        elif action[0] == "take_previous":
+            self.engine.take_previous()
+            self.layout_dice()
+
+    def request_hint(self):
+        """Start working out the best dice to keep for a person's roll"""
+        if self.rolling or not (self.has_rolled and self.can_keep) or self.current_bot() is not None:
+            return
+        if self.hint_bot is None:
+            from bot import ExpectimaxBot
+            self.hint_bot = ExpectimaxBot(ruleset=self.ruleset)
+        # Copies, so the worker never reads the engine while a click changes it
+        self.hint_job = worker.submit(self.hint_bot.choose_keep, list(self.engine.dice), self.turn_score,
+                                      self.scores[self.current_player])
+
+    def position_changed(self):
+        """Drop analysis of the position before, it no longer applies"""
+        worker.cancel()
+        self.bot_job = None
+        self.hint_job = None
+
+    def show_bust_message(self):
+        """Start showing the bust indication"""
+        self.show_bust = True
+        self.bust_timer = self.bust_delay
+
+    def layout_dice(self):
+        """Lay the tray's dice out again from the engine's active and kept dice"""
+        self.position_changed()
+        active = len(self.engine.dice)
+        self.dice = self.tray.place(0, self.engine.dice, 100, 250, 80)
+        self.kept_dice = self.tray.place(active, self.engine.kept, self.kept_dice_x, self.kept_dice_y,
+                                         self.kept_dice_spacing, kept=True)
+        self.kept_slots = [slot < len(self.kept_dice) for slot in range(self.ruleset.dice)]
 
     def calculate_score(self, dice_to_check=None):
         """Calculate score based on kept dice"""
         if dice_to_check is None:
             dice_to_check = [die for die in self.dice if die.kept]
-        
-        kept_dice = [die.value for die in dice_to_check]
-        if not kept_dice:
-            return 0
-
-        score = 0
-        value_counts = {}
-        for value in kept_dice:
-            value_counts[value] = value_counts.get(value, 0) + 1
-
-        # Check for three pairs
-        if len(value_counts) == 3 and all(count == 2 for count in value_counts.values()):
-            return 1500
-
-        # Check for straight (1-6)
-        if len(kept_dice) == 6 and len(set(kept_dice)) == 6:
-            return 1500
-
-        # Handle three of a kind and extras
-        for value, count in value_counts.items():
-            if count >= 3:
-                # Special case for three 1's
-                if value == 1:
-                    score += 1000 * (count - 2)  # 1000 for first three, then 1000 each
-                else:
-                    score += (value * 100) * (count - 2)  # value*100 for first three, then value*100 each
-
-        # Add remaining single 1's and 5's
-        for value, count in value_counts.items():
-            remaining = count if count < 3 else 0
-            if value == 1:
-                score += 100 * remaining
-            elif value == 5:
-                score += 50 * remaining
-
-        return score
-
-    def draw_game_state(self):
-        """Draw all game elements on the screen"""
-        # Draw active dice with red border if no score
-        for die in self.dice:
-            die.draw(self.screen)
-            if self.show_no_score:
-                # Draw red border around die
-                pygame.draw.rect(self.screen, (255, 0, 0), 
-                               (die.x - 2, die.y - 2, die.size + 4, die.size + 4), 
-                               2)  # 2 pixel width border
-
-        # Draw kept dice
-        for die in self.kept_dice:
-            die.draw(self.screen)
-
-        # Draw section labels
-        active_label = self.font.render("Active Dice", True, (255, 255, 255))
-        kept_label = self.font.render("Kept Dice", True, (255, 255, 255))
-        self.screen.blit(active_label, (100, 220))
-        self.screen.blit(kept_label, (100, 120))
-
-        # Draw buttons based on game state
-        if self.must_roll:
-            # Show Roll button
-            pygame.draw.rect(self.screen, (200, 200, 200), self.roll_button)
-            roll_text = self.font.render("Roll", True, (0, 0, 0))
-            self.screen.blit(roll_text, (320, 415))
-            
-            # Only show End Turn if:
-            # 1. Player has kept some dice AND
-            # 2. Player hasn't rolled yet AND
-            # 3. Player either has 1000+ points or will have 1000+ after this turn
-            if (self.kept_dice and 
-                (self.scores[self.current_player] >= 1000 or 
-                 self.turn_score >= 1000)):
-                pygame.draw.rect(self.screen, (200, 200, 200), self.end_turn_button)
-                end_text = self.font.render("End Turn", True, (0, 0, 0))
-                self.screen.blit(end_text, (610, 415))
-        
-        if self.has_rolled and self.can_keep:  # Only show Keep button during dice selection
-            pygame.draw.rect(self.screen, (200, 200, 200), self.keep_button)
-            keep_text = self.font.render("Keep", True, (0, 0, 0))
-            self.screen.blit(keep_text, (470, 415))
-
-        # Draw scores
-        for i in range(self.player_count):
-            score_text = self.font.render(f"{self.player_names[i]}: {self.scores[i]}", True, (255, 255, 255))
-            self.screen.blit(score_text, (50, self.screen.get_height() - 180 + i * 30))  # Start 180px from bottom
-
-        # Draw current player
-        current_text = self.font.render(f"Current Player: {self.player_names[self.current_player]}", True, (255, 255, 255))
-        self.screen.blit(current_text, (300, 50))
-
-        # Add display for current turn score
-        turn_text = self.font.render(f"Turn Score: {self.turn_score}", True, (255, 255, 255))
-        self.screen.blit(turn_text, (300, 100))
-
-        # Show if player can take previous score
-        if self.can_take_previous_score:
-            prev_score_text = self.font.render(f"Can take previous score: {self.turn_score}", 
-                                             True, (255, 255, 0))
-            self.screen.blit(prev_score_text, (300, 150))
-
-        # Show minimum score warning if needed
-        if self.scores[self.current_player] < 1000:
-            min_score_text = self.font.render("Need 1000 to keep score", True, (255, 100, 100))
-            text_width = min_score_text.get_width()
-            self.screen.blit(min_score_text, (self.screen.get_width() - text_width - 20, 20))
-
-        # Show "No Score!" text when applicable
-        if self.show_no_score:
-            no_score_text = self.font.render("No Score!", True, (255, 0, 0))
-            self.screen.blit(no_score_text, (350, 150)) 
-
-    def check_potential_bust(self):
-        """Check if keeping all possible scoring dice would cause a bust"""
-        # Get all dice that could be kept
-        potential_kept = []
-        for die in self.dice:
-            die.kept = True
-            if self.is_valid_selection():
-                potential_kept.append(die)
-            die.kept = False
-
-        # Calculate potential score
-        potential_score = self.calculate_score(potential_kept)
-        if self.scores[self.current_player] + self.turn_score + potential_score > 10000:
-            self.show_bust = True
-            self.bust_timer = self.bust_delay
-            self.turn_score = 0
-            self.end_turn()
-            return True
-        return False 
-
-    def start_roll(self):
-        self.roll_sound.play()
-        # ... existing roll code ... 
\ No newline at end of file
+        return engine.calculate_score([die.value for die in dice_to_check], self.ruleset)
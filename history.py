@@ -0,0 +1,473 @@
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from engine import selection_score
+from ratings import MAX_PLAYERS, Ratings, recompute
+from replay import new_seed, pack_faces
+from ruleset import CLASSIC
+from scoring import pack
+
+# Turn results stored in turns.result
+BANKED = "banked"
+WON = "won"
+FARKLE = "farkle"
+BUST = "bust"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    seed INTEGER,
+    player_count INTEGER,
+    winner TEXT,
+    finished REAL,
+    rules TEXT
+);
+CREATE TABLE IF NOT EXISTS seats (
+    game_id INTEGER,
+    seat INTEGER,
+    name TEXT,
+    bot INTEGER,
+    score INTEGER,
+    won INTEGER,
+    PRIMARY KEY (game_id, seat)
+);
+CREATE TABLE IF NOT EXISTS turns (
+    game_id INTEGER,
+    number INTEGER,
+    seat INTEGER,
+    name TEXT,
+    result TEXT,
+    score INTEGER,
+    rolls INTEGER,
+    took_previous INTEGER,
+    PRIMARY KEY (game_id, number)
+);
+CREATE TABLE IF NOT EXISTS rolls (
+    game_id INTEGER,
+    turn INTEGER,
+    number INTEGER,
+    dice INTEGER,
+    faces INTEGER,
+    score INTEGER,
+    PRIMARY KEY (game_id, turn, number)
+);
+CREATE TABLE IF NOT EXISTS ratings (
+    name TEXT,
+    rules TEXT,
+    rating REAL,
+    games INTEGER,
+    PRIMARY KEY (name, rules)
+);
+-- Per-player stats are answered from these indexes and the games table's key
+DROP INDEX IF EXISTS seats_by_name;
+DROP INDEX IF EXISTS turns_by_name;
+DROP INDEX IF EXISTS ratings_by_rating;
+CREATE INDEX IF NOT EXISTS seats_by_player ON seats (name, game_id, won, score);
+CREATE INDEX IF NOT EXISTS turns_by_player ON turns (name, game_id, result, score, took_previous);
+CREATE INDEX IF NOT EXISTS ratings_by_rules ON ratings (rules, rating);
+"""
+
+# Row layout of each table, in the order rows are queued
+INSERTS = {
+    "games": "INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?)",
+    "seats": "INSERT OR REPLACE INTO seats VALUES (?, ?, ?, ?, ?, ?)",
+    "turns": "INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "rolls": "INSERT OR REPLACE INTO rolls VALUES (?, ?, ?, ?, ?, ?)",
+    "ratings": "INSERT OR REPLACE INTO ratings VALUES (?, ?, ?, ?)",
+}
+
+
+def connect(path):
+    """Open the database, creating the tables if they aren't there"""
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")  # Stats can be read while games are written
+    connection.execute("PRAGMA synchronous=NORMAL")
+    migrate(connection)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def migrate(connection):
+    """
+    Bring a database from before games recorded their rules up to date
+
+    Which rules those games were played by wasn't kept, so they and the
+    ratings from them are put down as the classic rules.
+    """
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(games)")]
+    if columns and "rules" not in columns:
+        with connection:
+            connection.execute("ALTER TABLE games ADD COLUMN rules TEXT")
+            connection.execute("UPDATE games SET rules = ?", (CLASSIC.name,))
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(ratings)")]
+    if columns and "rules" not in columns:
+        with connection:
+            connection.execute("ALTER TABLE ratings RENAME TO old_ratings")
+            connection.executescript(SCHEMA)
+            connection.execute("INSERT INTO ratings SELECT name, ?, rating, games FROM old_ratings", (CLASSIC.name,))
+            connection.execute("DROP TABLE old_ratings")
+
+
+class HistoryStore:
+    """
+    SQLite record of every game, turn and roll played
+
+    Rows are queued by the game and written by a background thread in
+    batches, one transaction per batch, so the render loop never waits on
+    the disk. Finished games are queued as "results" too, which the writer
+    rates against the ratings it keeps for the game's rules and saves with
+    the batch. A batch that fails to write is dropped and its error raised
+    from the next flush() or close(), so nothing waiting on the writer hangs.
+    """
+    def __init__(self, path, batch_size=1000, flush_interval=1.0):
+        """
+        Initialize the store, the writer thread starts with the first row
+        Args:
+            path (str): database file, created if it doesn't exist
+            batch_size (int): most rows written in one transaction
+            flush_interval (float): seconds a row may wait for more to batch with
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.rows_written = 0
+        self.error = None  # Last write that failed, raised by flush() or close()
+
+    def write(self, table, row):
+        """Queue a row for the writer thread"""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="history", daemon=True)
+                self.thread.start()
+        self.queue.put((table, row))
+
+    def flush(self):
+        """Block until every row queued so far is written or dropped, raising the last write error if any"""
+        if self.thread is not None:
+            self.queue.join()
+        self.raise_error()
+
+    def close(self):
+        """Write out what's queued and stop the writer, raising the last write error if any"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        self.raise_error()
+
+    def raise_error(self):
+        """Raise the last write error, once"""
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def run(self):
+        """Write queued rows in batches until closed"""
+        connection = None
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+            try:
+                if connection is None:  # Opened here, or again after a failed batch
+                    connection = connect(self.path)
+                    ratings = load_ratings(connection)
+                rows = {}
+                for item in batch:
+                    if item is not None:
+                        rows.setdefault(item[0], []).append(item[1])
+                for rules, names, scores in rows.pop("results", []):
+                    rated = ratings.setdefault(rules, Ratings()).update(names, scores)
+                    rows.setdefault("ratings", []).extend((name, rules, rating, games)
+                                                          for name, rating, games in rated)
+                with connection:  # One transaction for the whole batch
+                    for table, table_rows in rows.items():
+                        connection.executemany(INSERTS[table], table_rows)
+                self.rows_written += len(batch) - (not running)
+            except Exception as error:  # The batch is lost, but the writer carries on and flush() hears of it
+                self.error = error
+                if connection is not None:
+                    connection.close()
+                    connection = None  # Ratings are read back from what was saved
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+        if connection is not None:
+            connection.close()
+
+
+class GameRecorder:
+    """
+    Engine log that records a game into a HistoryStore
+
+    Given to an Engine as its log, it hears every roll, keep, end of turn
+    and taken offer, works out how each turn ended and queues the rows.
+    Calls are passed on to another log, like a replay EventLog, if given.
+    """
+    def __init__(self, store, names, bots=None, forward=None):
+        """
+        Initialize the recorder
+        Args:
+            store (HistoryStore): where rows go
+            names (list): player name of each seat
+            bots (list): whether each seat is a bot
+            forward: log to pass every call on to, if any
+        """
+        self.store = store
+        self.names = names
+        self.bots = bots if bots else [False] * len(names)
+        self.forward = forward
+        self.engine = None
+        self.game_id = new_seed()
+        self.seed = None
+        self.turn_number = 0
+        self.rolls = 0  # Rolls made in the current turn
+        self.took_previous = False
+
+    def attach(self, engine):
+        """Follow the engine being logged, its state before each action decides the outcome"""
+        self.engine = engine
+
+    def start_game(self, player_count, seed):
+        self.seed = seed
+        if self.forward is not None:
+            self.forward.start_game(player_count, seed)
+
+    def roll(self, values):
+        if self.forward is not None:
+            self.forward.roll(values)
+        game = self.engine
+        banked = game.scores[game.current_player]
+        self.rolls += 1
+        if not values:
+            self.finish_turn(BUST, 0)  # Every die came back, but rolling them would go over
+            return
+        score = game.ruleset.score[pack(values)]
+        self.store.write("rolls", (self.game_id, self.turn_number, self.rolls, len(values),
+                                   pack_faces(values), score))
+        if score == 0:
+            self.finish_turn(FARKLE, 0)
+        elif banked + game.turn_score + score > game.ruleset.target:
+            self.finish_turn(BUST, 0)
+
+    def keep(self, mask):
+        if self.forward is not None:
+            self.forward.keep(mask)
+        game = self.engine
+        score = selection_score(game.dice, mask, game.ruleset)
+        if game.scores[game.current_player] + game.turn_score + score > game.ruleset.target:
+            self.finish_turn(BUST, 0)
+
+    def end_turn(self):
+        if self.forward is not None:
+            self.forward.end_turn()
+        game = self.engine
+        won = game.scores[game.current_player] + game.turn_score >= game.ruleset.target
+        self.finish_turn(WON if won else BANKED, game.turn_score)
+        if won:
+            self.finish_game(game.current_player)
+
+    def take_previous(self):
+        if self.forward is not None:
+            self.forward.take_previous()
+        self.took_previous = True
+
+    def finish_turn(self, result, score):
+        """Queue the turn that just ended"""
+        seat = self.engine.current_player
+        self.store.write("turns", (self.game_id, self.turn_number, seat, self.names[seat], result, score,
+                                   self.rolls, self.took_previous))
+        self.turn_number += 1
+        self.rolls = 0
+        self.took_previous = False
+
+    def finish_game(self, winner):
+        """Queue the game and every seat's final score"""
+        scores = list(self.engine.scores)
+        scores[winner] = self.engine.ruleset.target  # The engine banks the winning turn after logging it
+        rules = self.engine.ruleset.name
+        self.store.write("games", (self.game_id, self.seed, len(self.names), self.names[winner], time.time(), rules))
+        for seat, name in enumerate(self.names):
+            self.store.write("seats", (self.game_id, seat, name, self.bots[seat], scores[seat], seat == winner))
+        self.store.write("results", (rules, self.names, scores))
+
+    def close(self):
+        if self.forward is not None:
+            self.forward.close()
+
+
+def player_stats(path, names, rules=CLASSIC.name):
+    """
+    Summary of every finished game some players played by some rules
+    Args:
+        path (str): database file
+        names (list): players to look up
+        rules (str): name of the rules the games were played by
+    Returns:
+        dict: name -> dict of games, wins, win_rate, turns, average_turn,
+            bust_rate, farkle_rate, took_previous and take_previous_success.
+            Players with no finished games are left out, as is everyone if
+            there is no database yet.
+    """
+    try:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return {}
+    marks = ", ".join("?" * len(names))
+    stats = {}
+    try:
+        for name, games, wins in connection.execute(
+                f"SELECT name, COUNT(*), SUM(won) FROM seats JOIN games ON games.id = game_id "
+                f"WHERE name IN ({marks}) AND rules = ? GROUP BY name", names + [rules]):
+            stats[name] = {"games": games, "wins": wins, "win_rate": wins / games}
+        for name, turns, average, busts, farkles, took, kept in connection.execute(
+                f"SELECT name, COUNT(*), AVG(score), SUM(result = '{BUST}'), SUM(result = '{FARKLE}'), "
+                f"SUM(took_previous), SUM(took_previous AND score > 0) "
+                f"FROM turns JOIN games ON games.id = game_id "
+                f"WHERE name IN ({marks}) AND rules = ? GROUP BY name", names + [rules]):
+            if name in stats:
+                stats[name].update(turns=turns, average_turn=average, bust_rate=busts / turns,
+                                   farkle_rate=farkles / turns, took_previous=took,
+                                   take_previous_success=kept / took if took else None)
+    except sqlite3.OperationalError:
+        return {}  # Nothing has been written yet
+    finally:
+        connection.close()
+    return stats
+
+
+def load_ratings(connection):
+    """Ratings saved in the database, to carry on updating, as a dict of rules name -> Ratings"""
+    ratings = {}
+    for name, rules, rating, games in connection.execute("SELECT name, rules, rating, games FROM ratings"):
+        rules_ratings = ratings.setdefault(rules, Ratings())
+        rules_ratings.ratings[name] = rating
+        rules_ratings.games[name] = games
+    return ratings
+
+
+def recompute_ratings(path):
+    """
+    Rate every finished game from scratch and save the ratings, see ratings.recompute
+
+    Each set of rules is rated on its own, as games are when recorded.
+    Returns:
+        int: number of games rated
+    """
+    import numpy as np  # Only needed for recomputing, so the game doesn't load it
+    connection = connect(path)
+    try:
+        players = {}  # Rules name -> player name -> index
+        games = {}  # Rules name -> game id -> (player, score) of each seat
+        for rules, game_id, name, score in connection.execute(
+                "SELECT rules, game_id, name, score FROM seats JOIN games ON games.id = game_id "
+                "ORDER BY finished, game_id, seat"):
+            rules_players = players.setdefault(rules, {})
+            games.setdefault(rules, {}).setdefault(game_id, []).append(
+                (rules_players.setdefault(name, len(rules_players)), score))
+        rows = []
+        for rules, rules_games in games.items():
+            seats = np.full((len(rules_games), MAX_PLAYERS), -1, dtype=np.int64)
+            scores = np.zeros((len(rules_games), MAX_PLAYERS))
+            for row, game in enumerate(rules_games.values()):
+                seats[row, :len(game)], scores[row, :len(game)] = zip(*game)
+            ratings, played = recompute(seats, scores, len(players[rules]))
+            rows.extend((name, rules, float(ratings[player]), int(played[player]))
+                        for name, player in players[rules].items())
+        with connection:
+            connection.execute("DELETE FROM ratings")
+            connection.executemany(INSERTS["ratings"], rows)
+    finally:
+        connection.close()
+    return sum(map(len, games.values()))
+
+
+def leaderboard(path, rules=CLASSIC.name, limit=10):
+    """
+    Best rated players by some rules
+    Args:
+        path (str): database file
+        rules (str): name of the rules the ratings are for
+        limit (int): most players to list
+    Returns:
+        list: (name, rating, games) best first, empty if nobody is rated yet
+    """
+    try:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return []
+    try:
+        return connection.execute("SELECT name, rating, games FROM ratings WHERE rules = ? "
+                                  "ORDER BY rating DESC LIMIT ?", (rules, limit)).fetchall()
+    except sqlite3.OperationalError:
+        return []  # Nothing has been written yet
+    finally:
+        connection.close()
+
+
+def main():
+    """Print recorded stats for players, or fill a database with simulated games to test against"""
+    parser = argparse.ArgumentParser(description="Game history stats")
+    parser.add_argument("database")
+    parser.add_argument("names", nargs="*", help="players to show, everyone if none given")
+    parser.add_argument("--fill", type=int, metavar="GAMES", default=0,
+                        help="first record this many games between bots")
+    parser.add_argument("--rules", default=CLASSIC.name, help="name of the rules to show stats and ratings for")
+    parser.add_argument("--recompute", action="store_true", help="rate every recorded game again from scratch")
+    args = parser.parse_args()
+
+    if args.fill:
+        import random
+        from engine import Engine
+        from bot import ExpectimaxBot
+        store = HistoryStore(args.database)
+        bot = ExpectimaxBot(budget=0.001)
+        start = time.perf_counter()
+        for number in range(args.fill):
+            names = [f"Bot {seat + 1}" for seat in range(2 + number % 3)]
+            recorder = GameRecorder(store, names, [True] * len(names))
+            recorder.start_game(len(names), number)
+            game = Engine(len(names), random.Random(number), recorder)
+            recorder.attach(game)
+            while not game.game_over:
+                action = bot.act(game)
+                getattr(game, action[0])(*action[1:])
+        store.close()
+        print(f"Recorded {args.fill} games ({store.rows_written} rows) in {time.perf_counter() - start:.1f}s")
+
+    names = args.names
+    if not names:
+        with sqlite3.connect(args.database) as connection:
+            names = [name for name, in connection.execute("SELECT DISTINCT name FROM seats")]
+    start = time.perf_counter()
+    stats = player_stats(args.database, names, args.rules)
+    elapsed = time.perf_counter() - start
+    for name, row in sorted(stats.items()):
+        success = row["take_previous_success"]
+        print(f"{name}: {row['games']} games, {row['win_rate']:.1%} won, "
+              f"{row['average_turn']:.0f} per turn, {row['farkle_rate']:.1%} farkles, {row['bust_rate']:.1%} busts, "
+              f"taking the previous score paid off {'-' if success is None else f'{success:.1%}'}")
+    print(f"Queried in {elapsed * 1000:.1f} ms")
+
+    if args.recompute:
+        start = time.perf_counter()
+        games = recompute_ratings(args.database)
+        print(f"Rated {games} games from scratch in {time.perf_counter() - start:.2f}s")
+    for place, (name, rating, games) in enumerate(leaderboard(args.database, args.rules), 1):
+        print(f"{place}. {name}: {rating:.0f} after {games} games")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import queue
+import threading
+
+
+class Job:
+    """One piece of analysis handed to the worker, and its result once it has run"""
+    __slots__ = ("fn", "args", "generation", "result", "error", "done", "cancelled")
+
+    def __init__(self, fn, args, generation):
+        self.fn = fn
+        self.args = args
+        self.generation = generation
+        self.result = None
+        self.error = None
+        self.done = False
+        self.cancelled = False
+
+
+class Worker:
+    """
+    Background thread running analysis off the render loop
+
+    The game submits a job for the position on screen, keeps drawing, and
+    polls for the answer on later frames. Whenever the position changes,
+    cancel() marks everything submitted so far as stale: queued jobs are
+    skipped and a job already running has its answer thrown away, so an
+    old answer is never applied to a new position.
+
+    Jobs run one at a time on a single thread, so a bot's transposition
+    table is only ever touched from one place. A thread rather than a
+    process keeps that table alive between moves, and the search gives up
+    the interpreter often enough that frames keep coming while it runs.
+    """
+    def __init__(self, name="analysis"):
+        """
+        Initialize the worker, the thread starts with the first job
+        Args:
+            name (str): thread name, shows up in profilers and tracebacks
+        """
+        self.name = name
+        self.queue = queue.Queue()
+        self.generation = 0  # Bumped by cancel(), jobs from older generations are stale
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(*args) to run in the background
+        Returns:
+            Job: poll it with result()
+        """
+        with self.lock:
+            job = Job(fn, args, self.generation)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+                self.thread.start()
+        self.queue.put(job)
+        return job
+
+    def cancel(self):
+        """Mark every job submitted so far as stale"""
+        with self.lock:
+            self.generation += 1
+
+    def is_stale(self, job):
+        return job.generation != self.generation
+
+    def result(self, job):
+        """
+        Check on a job without waiting
+        Returns:
+            tuple: (True, result) once it has finished, (False, None) while it
+                is queued or running, or for good if it was cancelled
+        """
+        if job is None or not job.done or job.cancelled:
+            return (False, None)
+        if job.error is not None:
+            raise job.error
+        return (True, job.result)
+
+    def run(self):
+        """Run queued jobs until the program exits"""
+        while True:
+            job = self.queue.get()
+            if self.is_stale(job):
+                job.cancelled = True
+                continue
+            try:
+                job.result = job.fn(*job.args)
+            except Exception as error:  # Raised again on the render thread by result()
+                job.error = error
+            job.cancelled = self.is_stale(job)  # The position moved on while it ran
+            job.done = True
+
+
+# Shared by every view so analysis runs on one thread
+worker = Worker()
@@ -1,13 +1,28 @@
+import time
+START = time.perf_counter()  # Cold start is measured from here to the first frame
+
+import argparse
+import os
 import pygame
+import random
 import sys
 from menu import Menu
-from game import Game
+from assets import BASE_DIR, ROLL_SOUND, assets
+from profiler import profiler
+from jobs import worker
+from ruleset import CLASSIC, RuleSet, load_all
 
 class DiceApp:
-    def __init__(self):
+    def __init__(self, seed=None, log=None, server=None, history_path=None, rule_sets=None):
         """
         Initialize the main application
         Sets up the pygame window and initializes game states
+        Args:
+            seed (int): seed every game's rolls are derived from, random if not given
+            log: replay.EventLog every game is recorded in
+            server (tuple): (host, port) of a server.py to play on instead of locally
+            history_path (str): database every local game is recorded in, see history.py
+            rule_sets (list): RuleSet choices offered in the menu, the first one picked to start with
         """
         pygame.init()
         pygame.mixer.init()  # Initialize sound system
@@ -17,42 +32,160 @@ class DiceApp:
         pygame.display.set_caption("Dice Game")
         self.FPS = 60  # Set consistent frame rate
         self.clock = pygame.time.Clock()
-        
-        # Add error handling for sound loading
-        try:
-            self.roll_sound = pygame.mixer.Sound('sounds/dice_roll.wav')
-        except:
-            print("Warning: Could not load sound file")
-            self.roll_sound = None
-        
-        self.menu = Menu(self.screen)
+        self.idle_timeout = 1000  # Longest wait for input in ms when nothing is animating
+        pygame.event.set_blocked(pygame.MOUSEMOTION)  # Hovering changes nothing, so don't wake for it
+
+        self.menu = Menu(self.screen, history_path, rule_sets)
         self.game = None
         self.current_state = "menu"  # Tracks whether we're in menu or game state
+        self.seeds = random.Random(seed) if seed is not None else None  # Seeds for each new game
+        self.log = log
+        self.server = server
+        self.history_path = history_path
+        self.history = None  # history.HistoryStore, opened when the first game starts
+        self.bots = {}  # RuleSet -> computer player for bot seats, made when a game first needs one
+        self.startup_time = None  # Seconds from launch to the first frame
 
     def run(self):
         """
         Main application loop
         Handles switching between menu and game states
         """
+        dt = 0.0
+        first_frame = True
         while True:
-            dt = self.clock.tick(self.FPS) / 1000.0  # Get delta time in seconds
+            state = self.current_state
+            profiler.begin_frame()
+            view = self.menu if self.current_state == "menu" else self.game
+            if profiler.overlay_rect is not None:
+                view.renderer.damage(profiler.overlay_rect)  # Repaint what the overlay covered
+                profiler.overlay_rect = None
 
             # Handle game states
             if self.current_state == "menu":
-                menu_result = self.menu.update()
-                self.menu.draw(self.screen)
+                with profiler.span("update"):
+                    menu_result = self.menu.update()
+                with profiler.span("draw"):
+                    dirty = self.menu.draw(self.screen)
                 if menu_result:
-                    player_count, speed, names = menu_result  # Unpack all three values
-                    self.game = Game(self.screen, player_count, speed, self.roll_sound, player_names=names)
+                    from game import Game  # Usually imported already by the asset thread
+                    player_count, speed, names, bots, ruleset = menu_result  # Unpack all five values
+                    seed = self.seeds.randrange(2 ** 63) if self.seeds is not None else None
+                    rules = None
+                    if self.server is not None:
+                        from client import RemoteEngine
+                        rules = RemoteEngine(player_count, *self.server, seed=seed)
+                    bot = self.bots.get(ruleset)
+                    if any(bots) and bot is None:
+                        from bot import ExpectimaxBot
+                        # Shared by every bot seat and game with these rules, so its table keeps filling
+                        bot = self.bots[ruleset] = ExpectimaxBot(ruleset=ruleset)
+                    if self.history_path is not None and self.history is None:
+                        from history import HistoryStore
+                        self.history = self.menu.history = HistoryStore(self.history_path)
+                    # Replay logs pack rolls for the classic rules only
+                    log = self.log if ruleset == CLASSIC else None
+                    self.game = Game(self.screen, player_count, speed, assets.sound(ROLL_SOUND), player_names=names,
+                                     seed=seed, log=log, rules=rules, history=self.history,
+                                     bots=[bot if is_bot else None for is_bot in bots], ruleset=ruleset)
                     self.current_state = "game"
             elif self.current_state == "game":
-                game_over = self.game.update(dt)  # Pass delta time to game
-                self.game.draw(self.screen)
+                with profiler.span("update"):
+                    game_over = self.game.update(dt)  # Pass delta time to game
+                with profiler.span("draw"):
+                    dirty = self.game.draw(self.screen)
                 if game_over:
+                    worker.cancel()  # Nothing still thinking about the old game matters now
                     self.current_state = "menu"
+                    self.menu.refresh_stats()
+                    self.menu.renderer.invalidate()  # The game screen is still showing
+
+            # Only push the parts of the screen that changed, the overlay never keeps us awake
+            idle = not dirty and state == self.current_state and not self.is_animating()
+            with profiler.span("display.update"):
+                pygame.display.update(dirty + profiler.draw_overlay(self.screen))
+            profiler.end_frame()
+
+            if first_frame:
+                # The menu is up, so load what a game needs while the player looks at it
+                first_frame = False
+                self.startup_time = time.perf_counter() - START
+                if profiler.enabled:
+                    print(f"First frame after {self.startup_time * 1000:.0f} ms")
+                assets.warm()
+                self.menu.refresh_stats()
+
+            dt = self.wait_for_next_frame(idle)
 
-            pygame.display.flip()
+    def is_animating(self):
+        """Check if the current state has anything moving or counting down"""
+        if self.current_state == "menu":
+            return self.menu.stats_job is not None  # Keep frames coming until the stats arrive
+        return self.game.is_animating()
+
+    def wait_for_next_frame(self, idle):
+        """
+        Wait until the next frame should run
+        Args:
+            idle (bool): nothing changed or is animating, so sleep until input arrives
+        Returns:
+            float: seconds since the previous frame
+        """
+        if idle:
+            # Block instead of ticking, then leave the event for the current state to handle
+            event = pygame.event.wait(self.idle_timeout)
+            if event.type != pygame.NOEVENT:
+                pygame.event.post(event)
+            return self.clock.tick() / 1000.0
+        return self.clock.tick(self.FPS) / 1000.0  # Get delta time in seconds
+
+def main():
+    """Start the game, with profiling if asked for on the command line"""
+    parser = argparse.ArgumentParser(description="Play dice")
+    parser.add_argument("--profile", action="store_true",
+                        help="show frame timings and startup time from the start (F3 toggles them in game)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record spans and write them as Chrome trace JSON on exit")
+    parser.add_argument("--seed", type=int, help="seed for the rolls of every game played")
+    parser.add_argument("--log", metavar="FILE", help="append every game to a replay log")
+    parser.add_argument("--history", metavar="FILE", default=os.path.join(BASE_DIR, "history.db"),
+                        help="SQLite database every local game is recorded in")
+    parser.add_argument("--no-history", action="store_true", help="don't record games or show stats")
+    parser.add_argument("--connect", metavar="HOST[:PORT]",
+                        help="play on a server started with server.py, e.g. 127.0.0.1")
+    parser.add_argument("--rules", metavar="FILE",
+                        help="rules saved as JSON to pick in the menu, see ruleset.py (rules/ is always offered)")
+    args = parser.parse_args()
+
+    if args.profile or args.trace:
+        profiler.enable(overlay=args.profile)
+    log = None
+    if args.log:
+        from replay import EventLog  # Pulls in the rules tables, which startup otherwise leaves to the asset thread
+        log = EventLog(args.log)
+    server = None
+    rule_sets = [CLASSIC]
+    if args.connect:
+        from client import parse_address
+        server = parse_address(args.connect)  # Servers play the classic rules only
+    else:
+        rule_sets += [rules for rules in load_all() if rules != CLASSIC]
+    if args.rules and server is None:
+        try:
+            picked = RuleSet.load(args.rules)
+        except (OSError, ValueError, TypeError) as error:
+            parser.error(f"can't play rules {args.rules}: {error}")
+        rule_sets = [picked] + [rules for rules in rule_sets if rules != picked]
+    app = DiceApp(args.seed, log, server, None if args.no_history else args.history, rule_sets)
+    try:
+        app.run()
+    finally:
+        if args.trace:
+            profiler.save_trace(args.trace)
+        if log is not None:
+            log.close()
+        if app.history is not None:
+            app.history.close()  # Write out whatever is still queued
 
 if __name__ == "__main__":
-    app = DiceApp()
-    app.run() 
\ No newline at end of file
+    main()
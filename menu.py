@@ -1,27 +1,46 @@
 import pygame
 import sys
-from game import Game
+from render import DirtyRenderer, render_text
+from profiler import profiler
+from assets import assets
+from jobs import worker
+from ruleset import CLASSIC
 
 class Menu:
-    def __init__(self, screen):
+    def __init__(self, screen, history_path=None, rule_sets=None):
         """
         Initialize the menu screen
         Args:
             screen: pygame display surface to draw the menu on
+            history_path (str): game history database to show player stats from, if any
+            rule_sets (list): RuleSet choices, the first one picked to start with
         """
         self.screen = screen
-        self.font = pygame.font.Font(None, 36)
+        self.font = assets.font(None, 36)
+        self.stats_font = assets.font(None, 24)
+        self.history_path = history_path
+        self.history = None  # history.HistoryStore games are being written to, once there is one
+        self.stats = {}  # Player name -> history.player_stats summary
+        self.leaderboard = []  # (name, rating, games) of the best rated players
+        self.leaderboard_size = 8  # As many as fit above the rules selector, a line apart
+        self.stats_job = None
         self.player_count = 2  # Default number of players
         self.speed_multiplier = 1.0  # Default speed
+        self.rule_sets = rule_sets or [CLASSIC]
+        self.current_rules_index = 0
         self.player_names = ["Owen", "Olivia", "Zoe", "Mike", "Jenn", "Eleanor"]  # Available names
+        self.bot_names = ["Bot 1", "Bot 2", "Bot 3", "Bot 4", "Bot 5", "Bot 6"]  # Seats the computer plays
         self.selected_names = ["Owen", "Olivia"]  # Default selected names
         self.name_buttons = []  # Will store rect and current name for each player
         self.name_button_start_x = 50
         self.name_button_start_y = screen.get_height() - 250  # Start 250px from bottom
         self.name_button_spacing = 40
+        self.stats_x = 520  # Player stats line up right of the start button
         self.update_name_buttons()
         # Define clickable button areas
         self.buttons = {
+            'rules_left': pygame.Rect(300, 200, 30, 30),
+            'rules_right': pygame.Rect(600, 200, 30, 30),
             'decrease': pygame.Rect(300, 250, 30, 30),  # "-" button
             'increase': pygame.Rect(470, 250, 30, 30),  # "+" button
             'speed_left': pygame.Rect(300, 300, 30, 30),   # New speed buttons
@@ -30,6 +49,29 @@ class Menu:
         }
         self.speed_options = [1.0, 1.5, 2.0, 4.0, float('inf')]  # inf for instant
         self.current_speed_index = 0
+        self.renderer = DirtyRenderer(screen, self.make_background())
+
+    def refresh_stats(self):
+        """Look the players' stats up again on the worker, the menu keeps showing the old ones meanwhile"""
+        if self.history_path is not None:
+            self.stats_job = worker.submit(self.load_stats, self.rule_sets[self.current_rules_index].name)
+
+    def load_stats(self, rules):
+        """Read every selectable name's stats and the leaderboard for the named rules, run on the worker"""
+        from history import leaderboard, player_stats  # Pulls in the rules tables, so kept off the startup path
+        if self.history is not None:
+            try:
+                self.history.flush()  # Include the game that just finished
+            except Exception as error:  # Show what did get saved, a failed write shouldn't stop the menu
+                print(f"Couldn't save game history: {error}")
+        return (player_stats(self.history_path, self.player_names + self.bot_names, rules),
+                leaderboard(self.history_path, rules, self.leaderboard_size))
+
+    def select_rules(self, index):
+        """Pick a rule set and build its tables on the worker, so starting a game doesn't wait for them"""
+        self.current_rules_index = index % len(self.rule_sets)
+        worker.submit(self.rule_sets[self.current_rules_index].compile)
+        self.refresh_stats()  # Stats and ratings are kept per rule set
 
     def update_name_buttons(self):
         self.name_buttons = []
@@ -46,11 +88,23 @@ class Menu:
 
     def update(self):
         """Handle menu logic"""
+        if self.stats_job is not None:
+            if worker.is_stale(self.stats_job):
+                self.stats_job = None
+            else:
+                done, result = worker.result(self.stats_job)
+                if done:
+                    self.stats, self.leaderboard = result
+                    self.stats_job = None
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
-            
+
+            if event.type == pygame.KEYDOWN and event.key == profiler.toggle_key:
+                profiler.toggle()
+
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_pos = event.pos
                 if self.buttons['decrease'].collidepoint(mouse_pos):
@@ -65,76 +119,110 @@ class Menu:
                     self.current_speed_index = (self.current_speed_index - 1) % len(self.speed_options)
                 elif self.buttons['speed_right'].collidepoint(mouse_pos):
                     self.current_speed_index = (self.current_speed_index + 1) % len(self.speed_options)
+                elif self.buttons['rules_left'].collidepoint(mouse_pos):
+                    self.select_rules(self.current_rules_index - 1)
+                elif self.buttons['rules_right'].collidepoint(mouse_pos):
+                    self.select_rules(self.current_rules_index + 1)
                 elif self.buttons['start'].collidepoint(mouse_pos):
-                    # Return player count, speed, and selected names
-                    return (self.player_count, self.speed_options[self.current_speed_index], self.selected_names)
+                    # Return player count, speed, selected names, which seats are bots and the rules
+                    bots = [name in self.bot_names for name in self.selected_names]
+                    return (self.player_count, self.speed_options[self.current_speed_index], self.selected_names, bots,
+                            self.rule_sets[self.current_rules_index])
 
                 # Handle name selection buttons
                 for button in self.name_buttons:
                     if button['rect'].collidepoint(mouse_pos):
-                        # Cycle to next name
-                        current_index = self.player_names.index(button['name'])
-                        next_index = (current_index + 1) % len(self.player_names)
-                        button['name'] = self.player_names[next_index]
-                        self.selected_names[button['player']] = self.player_names[next_index]
+                        # Cycle to next name, bots come after the people
+                        names = self.player_names + self.bot_names
+                        next_name = names[(names.index(button['name']) + 1) % len(names)]
+                        button['name'] = next_name
+                        self.selected_names[button['player']] = next_name
 
         return None
 
     def draw(self, screen):
-        """Draw menu state"""
-        screen.fill((50, 100, 50))  # Green background
+        """
+        Draw menu state, repainting only what changed
+        Returns:
+            list: rects that changed, for pygame.display.update
+        """
+        renderer = self.renderer
+
+        # Draw text
+        renderer.add_text("rules", self.font, f"Rules: {self.rule_sets[self.current_rules_index].name}",
+                          (255, 255, 255), (350, 205))
+        renderer.add_text("players", self.font, f"Players: {self.player_count}", (255, 255, 255), (350, 255))
+
+        # Speed text
+        current_speed = self.speed_options[self.current_speed_index]
+        speed_text = "Instant" if current_speed == float('inf') else f"{current_speed}x"
+        renderer.add_text("speed", self.font, f"Game Speed: {speed_text}", (255, 255, 255), (350, 305))
+
+        for i, button in enumerate(self.name_buttons):
+            renderer.add(("name", i), button['rect'], button['name'],
+                         lambda surface, button=button: self.draw_name_button(surface, button))
+            renderer.add_text(("stats", i), self.stats_font, self.stats_text(button['name']), (200, 200, 200),
+                              (self.stats_x, button['rect'].y + 8))
+
+        # Leaderboard in the top right corner, once anyone is rated
+        if self.leaderboard:
+            renderer.add_text("leaderboard", self.stats_font, "Leaderboard", (255, 255, 255), (self.stats_x, 20))
+        for place, (name, rating, games) in enumerate(self.leaderboard, 1):
+            renderer.add_text(("rating", place), self.stats_font, f"{place}. {name}  {rating:.0f}  ({games} games)",
+                              (200, 200, 200), (self.stats_x, 25 + place * self.stats_font.get_linesize()))
+
+        return renderer.render()
+
+    def stats_text(self, name):
+        """Short summary of a player's recorded games, empty if there are none"""
+        stats = self.stats.get(name)
+        if not stats:
+            return ""
+        return f"{stats['games']} games, {stats['win_rate']:.0%} won, {stats['average_turn']:.0f}/turn"
+
+    def make_background(self):
+        """Pre-render the parts of the menu that never change"""
+        background = pygame.Surface(self.screen.get_size())
+        background.fill((50, 100, 50))  # Green background
         
         # Draw title
-        title = self.font.render("Dice Game", True, (255, 255, 255))
-        screen.blit(title, (350, 100))
+        title = render_text(self.font, "Dice Game", (255, 255, 255))
+        background.blit(title, (350, 100))
+
+        # Draw rules selector
+        pygame.draw.rect(background, (200, 200, 200), self.buttons['rules_left'])
+        pygame.draw.rect(background, (200, 200, 200), self.buttons['rules_right'])
 
         # Draw player count selector
-        pygame.draw.rect(screen, (200, 200, 200), self.buttons['decrease'])
-        pygame.draw.rect(screen, (200, 200, 200), self.buttons['increase'])
+        pygame.draw.rect(background, (200, 200, 200), self.buttons['decrease'])
+        pygame.draw.rect(background, (200, 200, 200), self.buttons['increase'])
         
         # Draw speed selector
-        pygame.draw.rect(screen, (200, 200, 200), self.buttons['speed_left'])
-        pygame.draw.rect(screen, (200, 200, 200), self.buttons['speed_right'])
+        pygame.draw.rect(background, (200, 200, 200), self.buttons['speed_left'])
+        pygame.draw.rect(background, (200, 200, 200), self.buttons['speed_right'])
         
         # Draw start button
-        pygame.draw.rect(screen, (200, 200, 200), self.buttons['start'])
+        pygame.draw.rect(background, (200, 200, 200), self.buttons['start'])
 
-        # Draw text
-        player_text = self.font.render(f"Players: {self.player_count}", True, (255, 255, 255))
-        minus = self.font.render("-", True, (0, 0, 0))
-        plus = self.font.render("+", True, (0, 0, 0))
-        
-        # Speed text
-        current_speed = self.speed_options[self.current_speed_index]
-        speed_text = "Instant" if current_speed == float('inf') else f"{current_speed}x"
-        speed_label = self.font.render(f"Game Speed: {speed_text}", True, (255, 255, 255))
-        left = self.font.render("<", True, (0, 0, 0))
-        right = self.font.render(">", True, (0, 0, 0))
-        
-        start = self.font.render("Start Game", True, (0, 0, 0))
-
-        # Position text
-        screen.blit(player_text, (350, 255))
-        screen.blit(minus, (310, 255))
-        screen.blit(plus, (480, 255))
-        screen.blit(speed_label, (350, 305))
-        screen.blit(left, (310, 305))
-        screen.blit(right, (610, 305))
-        screen.blit(start, (340, 415)) 
+        # Position button captions
+        background.blit(render_text(self.font, "<", (0, 0, 0)), (310, 205))
+        background.blit(render_text(self.font, ">", (0, 0, 0)), (610, 205))
+        background.blit(render_text(self.font, "-", (0, 0, 0)), (310, 255))
+        background.blit(render_text(self.font, "+", (0, 0, 0)), (480, 255))
+        background.blit(render_text(self.font, "<", (0, 0, 0)), (310, 305))
+        background.blit(render_text(self.font, ">", (0, 0, 0)), (610, 305))
+        background.blit(render_text(self.font, "Start Game", (0, 0, 0)), (340, 415))
 
         # Draw name selection section
-        name_section_label = self.font.render("Player Names", True, (255, 255, 255))
-        click_label = self.font.render("(click to change)", True, (200, 200, 200))  # Lighter color
-        screen.blit(name_section_label, (self.name_button_start_x, self.name_button_start_y - 60))
-        screen.blit(click_label, (self.name_button_start_x, self.name_button_start_y - 30))
-        
-        for i, button in enumerate(self.name_buttons):
-            pygame.draw.rect(screen, (200, 200, 200), button['rect'])
-            name_text = self.font.render(button['name'], True, (0, 0, 0))
-            text_rect = name_text.get_rect(center=button['rect'].center)
-            screen.blit(name_text, text_rect)
-
-    def start_game(self):
-        # Create game instance with selected names
-        return Game(self.screen, self.player_count, self.speed_options[self.current_speed_index], 
-                   self.roll_sound, player_names=self.selected_names) 
\ No newline at end of file
+        name_section_label = render_text(self.font, "Player Names", (255, 255, 255))
+        click_label = render_text(self.font, "(click to change, or pick a bot)", (200, 200, 200))  # Lighter color
+        background.blit(name_section_label, (self.name_button_start_x, self.name_button_start_y - 60))
+        background.blit(click_label, (self.name_button_start_x, self.name_button_start_y - 30))
+        return background
+
+    def draw_name_button(self, surface, button):
+        """Draw one player's name button"""
+        pygame.draw.rect(surface, (200, 200, 200), button['rect'])
+        name_text = render_text(self.font, button['name'], (0, 0, 0))
+        text_rect = name_text.get_rect(center=button['rect'].center)
+        surface.blit(name_text, text_rect)
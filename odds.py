@@ -0,0 +1,165 @@
+import argparse
+import json
+from fractions import Fraction
+from math import factorial
+import scoring
+from engine import DICE_COUNT
+from ruleset import CLASSIC
+
+# Best keepable score -> exact chance, per (scoring rules, number of dice). Filled on first use or by load()
+_DISTRIBUTIONS = {}
+# (scoring rules, dice, points left before the target) -> exact chance of a bust
+_BUSTS = {}
+
+
+def roll_ways(key):
+    """Number of orderings of the dice that make up a roll, the multinomial coefficient"""
+    counts = scoring.unpack(key)
+    ways = factorial(sum(counts))
+    for count in counts:
+        ways //= factorial(count)
+    return ways
+
+
+def score_distribution(dice, ruleset=CLASSIC):
+    """
+    Exact distribution of the best score that can be kept out of a roll
+
+    Rolls are enumerated as multisets weighted by how many of the 6^n
+    orderings make them, so six dice take 462 lookups instead of 46656.
+    Args:
+        dice (int): number of dice rolled, 0 meaning a full set came back
+        ruleset (RuleSet): compiled rules to score by
+    Returns:
+        dict: best keepable score -> Fraction, with 0 for a farkle
+    """
+    dice = dice or ruleset.dice
+    key = (ruleset.tables_key, dice)
+    distribution = _DISTRIBUTIONS.get(key)
+    if distribution is None:
+        ways = {}
+        for roll in ruleset.rolls:
+            if scoring.dice_count(roll) == dice:
+                best = ruleset.score[roll]  # Keeping every keepable die scores the whole roll
+                ways[best] = ways.get(best, 0) + roll_ways(roll)
+        total = 6 ** dice
+        distribution = _DISTRIBUTIONS[key] = {score: Fraction(n, total) for score, n in sorted(ways.items())}
+    return distribution
+
+
+def farkle_probability(dice, ruleset=CLASSIC):
+    """Exact chance that a roll of this many dice has nothing that scores"""
+    return score_distribution(dice, ruleset).get(0, Fraction(0))
+
+
+def bust_probability(dice, banked, turn_score, ruleset=CLASSIC):
+    """
+    Exact chance that the next roll busts by going past the target
+
+    A roll busts when keeping every scoring die would go over, since the
+    player would be forced to keep them all.
+    Args:
+        dice (int): number of dice about to be rolled, 0 meaning a full set came back
+        banked (int): player's banked score
+        turn_score (int): score built up this turn
+        ruleset (RuleSet): compiled rules, whose target must be hit exactly
+    Returns:
+        Fraction: chance of a bust, farkles not included
+    """
+    dice = dice or ruleset.dice
+    left = ruleset.target - banked - turn_score
+    key = (ruleset.tables_key, dice, left)
+    probability = _BUSTS.get(key)
+    if probability is None:
+        if left < 0:
+            probability = 1 - farkle_probability(dice, ruleset)  # Already over, anything that scores busts
+        else:
+            probability = sum((p for score, p in score_distribution(dice, ruleset).items() if score > left),
+                              Fraction(0))
+        _BUSTS[key] = probability
+    return probability
+
+
+def next_roll_odds(dice, banked, turn_score, ruleset=CLASSIC):
+    """
+    Chances of losing the turn on the next roll, for showing to players
+    Returns:
+        tuple: (farkle, bust) probabilities as floats
+    """
+    return float(farkle_probability(dice, ruleset)), float(bust_probability(dice, banked, turn_score, ruleset))
+
+
+def save(path, ruleset=CLASSIC):
+    """
+    Write every distribution of some scoring rules to a JSON file, exactly, as "numerator/denominator" strings
+    Args:
+        path (str): file to write
+        ruleset (RuleSet): compiled rules the distributions are for, recorded so load() can check them
+    """
+    tables = {str(dice): {str(score): str(p) for score, p in score_distribution(dice, ruleset).items()}
+              for dice in range(1, ruleset.dice + 1)}
+    with open(path, "w") as f:
+        json.dump({"rules": list(ruleset.tables_key), "distributions": tables}, f, indent=1)
+
+
+def load(path, ruleset=CLASSIC):
+    """
+    Read distributions written by save() instead of enumerating them again
+    Args:
+        path (str): file written by save()
+        ruleset (RuleSet): rules the distributions are wanted for
+    Raises:
+        ValueError: if the file was written for different scoring rules
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if tuple(data.get("rules", ())) != ruleset.tables_key:
+        raise ValueError(f"{path} has odds for other scoring rules than {ruleset.name}")
+    for key in [key for key in _BUSTS if key[0] == ruleset.tables_key]:
+        del _BUSTS[key]  # Worked out from the distributions being replaced
+    for dice, distribution in data["distributions"].items():
+        _DISTRIBUTIONS[(ruleset.tables_key, int(dice))] = {int(score): Fraction(p)
+                                                            for score, p in distribution.items()}
+
+
+def monte_carlo(dice, rolls, rng):
+    """
+    Sampled distribution of the best keepable score, to check against the exact one
+    Returns:
+        dict: best keepable score -> observed frequency
+    """
+    import numpy as np  # Only needed for checking, so the game doesn't load it
+    from simulate import SCORE, roll_keys
+    scores = SCORE[roll_keys(rng, np.full(rolls, dice))]  # Classic rules, as save() writes
+    values, counts = np.unique(scores, return_counts=True)
+    return {int(score): count / rolls for score, count in zip(values, counts)}
+
+
+def main():
+    """Print the exact tables, optionally checking them against sampled rolls"""
+    parser = argparse.ArgumentParser(description="Exact roll probabilities")
+    parser.add_argument("--save", metavar="FILE", help="write the distributions as JSON")
+    parser.add_argument("--check", type=int, metavar="ROLLS", default=0,
+                        help="sample this many rolls per dice count and report the largest difference")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import numpy as np
+    rng = np.random.default_rng(args.seed)
+    for dice in range(1, DICE_COUNT + 1):
+        distribution = score_distribution(dice)
+        expected = sum(score * p for score, p in distribution.items())
+        line = (f"{dice} dice: farkle {float(farkle_probability(dice)):.4%}, "
+                f"mean best score {float(expected):.1f}, {len(distribution)} outcomes")
+        if args.check:
+            sampled = monte_carlo(dice, args.check, rng)
+            worst = max(abs(sampled.get(score, 0.0) - float(distribution.get(score, 0)))
+                        for score in set(sampled) | set(distribution))
+            line += f", sampled within {worst:.5f}"
+        print(line)
+    if args.save:
+        save(args.save)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+import pygame
+
+
+class Span:
+    """Times one block of code and hands the duration to the profiler"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """
+    Per-frame timings of the game's subsystems
+
+    Code marks the blocks worth timing with span(name). While the profiler
+    is enabled every span is added to its frame's totals and kept as a
+    trace event, and the overlay shows rolling p50/p99 times over the last
+    few seconds of frames. Disabled spans cost a method call and nothing
+    else, so they can stay in the hot paths.
+    """
+    overlay_pos = (10, 10)
+    toggle_key = pygame.K_F3  # Key that turns profiling on and off in any view
+
+    def __init__(self, window=240, max_events=500000):
+        """
+        Initialize the profiler
+        Args:
+            window (int): frames the rolling percentiles cover
+            max_events (int): most trace events kept, oldest dropped first
+        """
+        self.enabled = False
+        self.show_overlay = False
+        self.window = window
+        self.frames = deque(maxlen=window)  # Frame times in ms
+        self.history = {}  # Span name -> deque of per-frame totals in ms
+        self.totals = {}  # Span name -> ns spent in it this frame
+        self.events = deque(maxlen=max_events)  # (name, start ns, end ns)
+        self.origin = time.perf_counter_ns()
+        self.frame_start = None
+        self.font = None
+        self.overlay_rect = None  # Where the overlay was last painted, until the view repaints it
+        self.null_span = nullcontext()
+
+    def enable(self, overlay=True):
+        """Start recording, showing the overlay if asked"""
+        self.enabled = True
+        self.show_overlay = overlay
+
+    def toggle(self):
+        """Turn recording and the overlay on or off together"""
+        if self.enabled:
+            self.enabled = False
+            self.show_overlay = False
+            self.frame_start = None
+            self.totals = {}
+        else:
+            self.enable()
+
+    def span(self, name):
+        """Context manager timing the block under name"""
+        if not self.enabled:
+            return self.null_span
+        return Span(self, name)
+
+    def record(self, name, start, end):
+        """Add a finished span to this frame and the trace"""
+        self.totals[name] = self.totals.get(name, 0) + end - start
+        self.events.append((name, start, end))
+
+    def begin_frame(self):
+        """Mark the start of a frame's work"""
+        if self.enabled:
+            self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        """Mark the end of a frame's work and roll its totals into the history"""
+        if not self.enabled or self.frame_start is None:
+            return
+        end = time.perf_counter_ns()
+        self.record("frame", self.frame_start, end)
+        for name, total in self.totals.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+            self.history[name].append(total / 1e6)
+        self.frames.append((end - self.frame_start) / 1e6)
+        self.totals = {}
+        self.frame_start = None
+
+    def percentiles(self, samples):
+        """p50 and p99 of a list of times"""
+        if not samples:
+            return 0.0, 0.0
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+        return ordered[last * 50 // 100], ordered[last * 99 // 100]
+
+    def summary(self):
+        """
+        Rolling times of the frame and each span
+        Returns:
+            list: (name, p50 ms, p99 ms) tuples, the whole frame first
+        """
+        rows = [("frame",) + self.percentiles(self.frames)]
+        for name in sorted(self.history):
+            if name != "frame":
+                rows.append((name,) + self.percentiles(self.history[name]))
+        return rows
+
+    def draw_overlay(self, screen):
+        """
+        Paint the timings over the top-left corner of the screen
+        Returns:
+            list: rects painted, empty when the overlay is hidden
+        """
+        if not self.show_overlay:
+            return []
+
+        if self.font is None:
+            self.font = pygame.font.SysFont("monospace", 14)  # Columns line up in a fixed width font
+        lines = [f"{name:<16}{p50:7.2f}{p99:7.2f} ms" for name, p50, p99 in self.summary()]
+        lines[0] += f"  ({len(self.frames)} frames, p50/p99)"
+        # Numbers change every frame, so these aren't worth a slot in the shared text cache
+        surfaces = [self.font.render(line, True, (255, 255, 0)) for line in lines]
+        width = max(surface.get_width() for surface in surfaces) + 10
+        height = sum(surface.get_height() for surface in surfaces) + 10
+        rect = pygame.Rect(self.overlay_pos, (width, height))
+
+        panel = pygame.Surface(rect.size)
+        panel.set_alpha(200)
+        screen.blit(panel, rect)
+        y = rect.y + 5
+        for surface in surfaces:
+            screen.blit(surface, (rect.x + 5, y))
+            y += surface.get_height()
+        self.overlay_rect = rect
+        return [rect]
+
+    def trace_events(self):
+        """Recorded spans in Chrome trace event format, times in microseconds"""
+        return [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": 0, "tid": 0,
+                 "ts": (start - self.origin) / 1000, "dur": (end - start) / 1000}
+                for name, start, end in self.events]
+
+    def save_trace(self, path):
+        """Write the recorded spans as a JSON file for chrome://tracing or Perfetto"""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+
+# Shared by every module so spans from the whole frame land in one place
+profiler = Profiler()
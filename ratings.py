@@ -0,0 +1,201 @@
+import argparse
+import time
+from bisect import bisect_left, bisect_right
+
+START_RATING = 1500.0
+K_FACTOR = 32.0  # Most a rating moves in one game
+SCALE = 400.0  # Rating gap at which the stronger player is expected to do 10x better
+MAX_PLAYERS = 6
+WAVE_WIDTH = 16  # Fewest games per wave, on average, for array operations to beat a plain loop
+
+
+def placements(scores):
+    """
+    How each player placed, as the share of the other players they finished above
+    Args:
+        scores (list): final score of each seat
+    Returns:
+        list: 1.0 for beating everyone, 0.0 for finishing last, ties count half
+    """
+    ordered = sorted(scores)
+    others = len(scores) - 1
+    return [(bisect_left(ordered, score) + (bisect_right(ordered, score) - bisect_left(ordered, score) - 1) / 2) / others
+            for score in scores]
+
+
+class Ratings:
+    """
+    Elo ratings for games of two to six players
+
+    Each player is rated against the average of the others in the game:
+    their expected share of the field comes from the gap to that average
+    and their actual share from where they placed. A game therefore costs
+    a constant amount of work per seat, and nothing is recomputed from
+    earlier games.
+    """
+    def __init__(self, k_factor=K_FACTOR):
+        self.k_factor = k_factor
+        self.ratings = {}  # Player name -> rating
+        self.games = {}  # Player name -> rated games played
+
+    def rating(self, name):
+        return self.ratings.get(name, START_RATING)
+
+    def update(self, names, scores):
+        """
+        Rate one finished game
+        Args:
+            names (list): player name of each seat
+            scores (list): final score of each seat, the winner's highest
+        Returns:
+            list: (name, new rating, games) of each player, for saving
+        """
+        before = [self.rating(name) for name in names]
+        total = sum(before)
+        others = len(names) - 1
+        changed = []
+        for name, rating, placed in zip(names, before, placements(scores)):
+            field = (total - rating) / others
+            expected = 1.0 / (1.0 + 10.0 ** ((field - rating) / SCALE))
+            self.ratings[name] = rating + self.k_factor * (placed - expected)
+            self.games[name] = self.games.get(name, 0) + 1
+            changed.append((name, self.ratings[name], self.games[name]))
+        return changed
+
+    def leaderboard(self, limit=None):
+        """(name, rating, games) of the best rated players first"""
+        board = sorted(((name, rating, self.games[name]) for name, rating in self.ratings.items()),
+                       key=lambda row: -row[1])
+        return board[:limit]
+
+
+def recompute(seats, scores, players, k_factor=K_FACTOR):
+    """
+    Rate a whole history of games from scratch, the same as updating game by game
+
+    Games are grouped into waves where nobody plays twice, each game going
+    in the wave after the latest one any of its players was in. Games in a
+    wave don't affect each other, so a wave is rated in a few array
+    operations, and the waves in order give exactly the sequential ratings.
+    The more players there are, the wider and fewer the waves. With only a
+    handful of players the waves are a few games wide, so the games are
+    rated one by one instead.
+    Args:
+        seats (ndarray): (games, MAX_PLAYERS) player index of each seat, -1 for no one
+        scores (ndarray): (games, MAX_PLAYERS) final score of each seat
+        players (int): number of distinct players
+        k_factor (float): most a rating moves in one game
+    Returns:
+        tuple: (ratings, games played) arrays indexed by player
+    """
+    import numpy as np  # Only bulk recomputes need it, so recording games doesn't load it
+    seats = np.asarray(seats, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    present = seats >= 0
+    count = present.sum(axis=1)
+
+    # Placement of every seat, compared against the other seats of its game
+    pair = present[:, :, None] & present[:, None, :]
+    above = ((scores[:, :, None] > scores[:, None, :]) & pair).sum(axis=2)
+    tied = ((scores[:, :, None] == scores[:, None, :]) & pair).sum(axis=2) - 1
+    placed = (above + tied / 2) / (count - 1)[:, None]
+
+    if players // 2 < WAVE_WIDTH:
+        return _rate_in_order(seats, placed, players, k_factor)  # Waves can't be wider than this
+
+    # Wave of each game, one step past the latest wave of any of its players
+    last = [0] * (players + 1)  # Empty seats read and write the extra entry, which is put back to 0
+    wave_of = last.__getitem__
+    waves = []
+    for row in seats.tolist():
+        wave = max(map(wave_of, row))
+        waves.append(wave)
+        wave += 1
+        for player in row:
+            last[player] = wave
+        last[-1] = 0
+    if max(waves, default=0) + 1 > len(waves) / WAVE_WIDTH:
+        return _rate_in_order(seats, placed, players, k_factor)
+    order = np.argsort(np.array(waves), kind="stable")
+    bounds = np.flatnonzero(np.diff(np.array(waves)[order])) + 1
+
+    ratings = np.full(players + 1, START_RATING)  # The extra entry soaks up empty seats
+    games = np.zeros(players + 1, dtype=np.int64)
+    for wave in np.split(order, bounds):
+        index = seats[wave]
+        valid = present[wave]
+        before = np.where(valid, ratings[index], 0.0)
+        field = (before.sum(axis=1, keepdims=True) - before) / (count[wave] - 1)[:, None]
+        expected = 1.0 / (1.0 + 10.0 ** ((field - before) / SCALE))
+        change = np.where(valid, k_factor * (placed[wave] - expected), 0.0)
+        ratings[index] += change  # Nobody appears twice in a wave, empty seats all land on the spare entry
+        games[index] += valid
+    return ratings[:players], games[:players]
+
+
+def _rate_in_order(seats, placed, players, k_factor):
+    """Rate games one after another, as Ratings.update would, for histories with few players"""
+    import numpy as np
+    ratings = [START_RATING] * players
+    games = [0] * players
+    for row, row_placed in zip(seats.tolist(), placed.tolist()):
+        seated = [(player, ratings[player], share) for player, share in zip(row, row_placed) if player >= 0]
+        total = sum(rating for _, rating, _ in seated)
+        others = len(seated) - 1
+        for player, rating, share in seated:
+            field = (total - rating) / others
+            ratings[player] = rating + k_factor * (share - 1.0 / (1.0 + 10.0 ** ((field - rating) / SCALE)))
+            games[player] += 1
+    return np.array(ratings), np.array(games)
+
+
+def random_games(rng, games, players):
+    """
+    Random history for timing recomputes, stronger players winning more
+    Returns:
+        tuple: (seats, scores) as taken by recompute
+    """
+    import numpy as np
+    seats = rng.integers(0, players, size=(games, MAX_PLAYERS))
+    seats[np.arange(MAX_PLAYERS) >= rng.integers(2, MAX_PLAYERS + 1, size=(games, 1))] = -1
+    while True:  # Draw again any game that seated someone twice
+        ordered = np.sort(seats, axis=1)
+        repeated = ((ordered[:, 1:] == ordered[:, :-1]) & (ordered[:, 1:] >= 0)).any(axis=1)
+        if not repeated.any():
+            break
+        redraw = rng.integers(0, players, size=(int(repeated.sum()), MAX_PLAYERS))
+        seats[repeated] = np.where(seats[repeated] >= 0, redraw, -1)
+    skill = np.linspace(0, 1000, players)
+    scores = np.where(seats >= 0, skill[seats] + rng.normal(0, 1000, seats.shape), 0)
+    return seats, scores
+
+
+def main():
+    """Time a recompute over random games, checking it against rating them one at a time"""
+    parser = argparse.ArgumentParser(description="Rating recompute speed, see history.py for recorded games")
+    parser.add_argument("games", type=int)
+    parser.add_argument("--players", type=int, default=1000, help="players in the random games")
+    parser.add_argument("--check", type=int, metavar="GAMES", default=10000,
+                        help="rate this many of the games through Ratings.update and compare")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    import numpy as np
+    seats, scores = random_games(np.random.default_rng(args.seed), args.games, args.players)
+    start = time.perf_counter()
+    recompute(seats, scores, args.players)
+    elapsed = time.perf_counter() - start
+    print(f"Rated {len(seats)} games of {args.players} players in {elapsed:.2f}s "
+          f"({len(seats) / elapsed:,.0f} games/s)")
+    if args.check:
+        seats, scores = seats[:args.check], scores[:args.check]
+        ratings, _ = recompute(seats, scores, args.players)
+        one_by_one = Ratings()
+        for row, row_scores in zip(seats.tolist(), scores.tolist()):
+            one_by_one.update([p for p in row if p >= 0], [s for p, s in zip(row, row_scores) if p >= 0])
+        worst = max(abs(ratings[p] - one_by_one.rating(p)) for p in range(args.players))
+        print(f"Matches rating the first {len(seats)} one at a time to within {worst:.2g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    """
+    Rendered text surfaces shared by every view
+
+    Labels, captions and score lines mostly stay the same from frame to
+    frame, so each is rasterised once and reused until it falls out of the
+    cache.
+    """
+    def __init__(self, max_size=256):
+        """
+        Initialize the cache
+        Args:
+            max_size (int): most surfaces kept before the least recently used is dropped
+        """
+        self.max_size = max_size
+        self.surfaces = OrderedDict()  # (font, text, color, antialias) -> surface
+
+    def render(self, font, text, color, antialias=True):
+        """
+        Rendered text, from the cache when it was rendered before
+        Args:
+            font: pygame font to render with
+            text (str): text to render
+            color (tuple): RGB text color
+            antialias (bool): whether to antialias the text
+        Returns:
+            pygame.Surface: the rendered text, shared so it must not be drawn on
+        """
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)  # Most recently used goes last
+            return surface
+
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)  # Evict the least recently used text
+        return surface
+
+    def clear(self):
+        """Drop every cached surface"""
+        self.surfaces.clear()
+
+
+# Shared by Game and Menu so common strings are only rasterised once
+text_cache = TextCache()
+
+
+def render_text(font, text, color, antialias=True):
+    """Render text through the shared cache"""
+    return text_cache.render(font, text, color, antialias)
+
+
+class DirtyRenderer:
+    """
+    Redraw only the parts of the screen whose contents changed
+
+    Every frame the view adds each thing it shows as an item: a key naming
+    it, the rect it covers, a signature of everything that affects how it
+    looks and a function that paints it. Items whose rect or signature
+    changed since the last frame, and items that appeared or disappeared,
+    mark their old and new rects dirty. Only those rects are restored from
+    the pre-rendered static background and repainted, clipped so nothing
+    outside them is touched.
+    """
+    def __init__(self, screen, background=None):
+        """
+        Initialize the renderer
+        Args:
+            screen: pygame display surface
+            background: surface with the static layer, plain black if None
+        """
+        self.screen = screen
+        self.background = background
+        self.previous = {}  # key -> (rect, signature) painted last frame
+        self.items = []  # (key, rect, signature, draw) queued this frame
+        self.damaged = []  # Rects something else painted over since last frame
+        self.full_redraw = True
+
+    def set_background(self, background):
+        """Replace the static layer, repainting everything next frame"""
+        self.background = background
+        self.full_redraw = True
+
+    def invalidate(self):
+        """Repaint the whole screen next frame, e.g. after another view drew on it"""
+        self.full_redraw = True
+
+    def damage(self, rect):
+        """Repaint an area next frame, e.g. one an overlay was drawn over"""
+        self.damaged.append(pygame.Rect(rect))
+
+    def add(self, key, rect, signature, draw):
+        """
+        Queue an item for this frame, in painting order
+        Args:
+            key: hashable name, unique within the frame
+            rect (pygame.Rect): area the item paints
+            signature: hashable value that changes whenever the item looks different
+            draw: function taking the screen and painting the item
+        """
+        self.items.append((key, pygame.Rect(rect), signature, draw))
+
+    def add_text(self, key, font, text, color, pos):
+        """
+        Queue a line of text
+        Args:
+            key: hashable name, unique within the frame
+            font: pygame font to render with
+            text (str): text to show
+            color (tuple): RGB text color
+            pos (tuple): top-left position
+        Returns:
+            pygame.Rect: area the text covers
+        """
+        surface = render_text(font, text, color)
+        rect = surface.get_rect(topleft=pos)
+        self.add(key, rect, (text, color), lambda screen: screen.blit(surface, rect))
+        return rect
+
+    def render(self):
+        """
+        Repaint the changed parts of the screen
+        Returns:
+            list: rects that changed, for pygame.display.update
+        """
+        current = {}
+        dirty = self.damaged
+        self.damaged = []
+        for key, rect, signature, _ in self.items:
+            current[key] = (rect, signature)
+            old = self.previous.get(key)
+            if old != (rect, signature):
+                dirty.append(rect)
+                if old is not None:
+                    dirty.append(old[0])
+        for key, (rect, _) in self.previous.items():
+            if key not in current:
+                dirty.append(rect)
+
+        if self.full_redraw:
+            dirty = [self.screen.get_rect()]
+            self.full_redraw = False
+        dirty = self.merge(dirty)
+
+        for area in dirty:
+            self.screen.set_clip(area)
+            if self.background is not None:
+                self.screen.blit(self.background, area, area)
+            else:
+                self.screen.fill((0, 0, 0), area)
+            for _, rect, _, draw in self.items:
+                if rect.colliderect(area):
+                    draw(self.screen)
+        self.screen.set_clip(None)
+
+        self.previous = current
+        self.items = []
+        return dirty
+
+    def merge(self, rects):
+        """Combine overlapping rects so no area is painted twice"""
+        screen_rect = self.screen.get_rect()
+        merged = []
+        for rect in rects:
+            rect = rect.clip(screen_rect)
+            if not rect.width or not rect.height:
+                continue
+            # Absorb every rect this one overlaps until none are left
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
@@ -0,0 +1,189 @@
+import argparse
+import os
+import random
+import struct
+import time
+from engine import DICE_COUNT, Engine
+from state import State
+
+# File layout: MAGIC once, then each game as a GAME record followed by its actions.
+# Every record starts with one byte saying what it is:
+#   0x00-0x06  ROLL, low bits are the dice rolled, then their faces in 2 bytes
+#   0x41-0x7F  KEEP, low 6 bits are the mask of active dice kept
+#   0x80       END_TURN
+#   0x81       TAKE_PREVIOUS
+#   0xFF       GAME, then the player count and seed in GAME_HEADER
+# Farkles and busts follow from the rolls and keeps, so they aren't stored.
+MAGIC = b"DICELOG1"
+ROLL = 0x00
+KEEP = 0x40
+END_TURN = 0x80
+TAKE_PREVIOUS = 0x81
+GAME = 0xFF
+GAME_HEADER = struct.Struct("<BQ")
+FACES = struct.Struct("<H")
+
+
+def pack_faces(values):
+    """Pack up to six faces into one base-6 number that fits in 2 bytes"""
+    number = 0
+    for value in reversed(values):
+        number = number * 6 + value - 1
+    return number
+
+
+def unpack_faces(number, count):
+    """Faces packed by pack_faces"""
+    values = []
+    for _ in range(count):
+        number, digit = divmod(number, 6)
+        values.append(digit + 1)
+    return values
+
+
+def new_seed():
+    """Random seed for a game that wasn't given one, so it can still be replayed"""
+    return random.SystemRandom().randrange(2 ** 63)
+
+
+class EventLog:
+    """
+    Append-only binary log of every action taken in a game
+
+    Rolls cost 3 bytes and every other action 1, so a whole game is a few
+    hundred bytes. Records are written straight through, so a crash loses
+    nothing that was already played.
+    """
+    def __init__(self, path):
+        """
+        Open a log, creating it if it doesn't exist
+        Args:
+            path (str): log file, appended to if it already has games
+        """
+        self.path = path
+        self.file = open(path, "ab", buffering=0)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def start_game(self, player_count, seed):
+        """Mark the start of a new game"""
+        self.file.write(bytes([GAME]) + GAME_HEADER.pack(player_count, seed))
+
+    def roll(self, values):
+        """Record the faces a roll landed on, none if it busted before rolling"""
+        record = bytes([ROLL | len(values)])
+        if values:
+            record += FACES.pack(pack_faces(values))
+        self.file.write(record)
+
+    def keep(self, mask):
+        """Record the mask of active dice kept"""
+        self.file.write(bytes([KEEP | mask]))
+
+    def end_turn(self):
+        """Record the player banking their turn"""
+        self.file.write(bytes([END_TURN]))
+
+    def take_previous(self):
+        """Record the player taking the previous player's score"""
+        self.file.write(bytes([TAKE_PREVIOUS]))
+
+    def close(self):
+        self.file.close()
+
+
+def read_games(path):
+    """
+    Parse a log file
+    Args:
+        path (str): file written by EventLog
+    Returns:
+        list: (player count, seed, actions) per game. Actions are
+            (ROLL, faces), (KEEP, mask), (END_TURN, None) or (TAKE_PREVIOUS, None).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a game log")
+
+    games = []
+    actions = None
+    pos = len(MAGIC)
+    while pos < len(data):
+        code = data[pos]
+        pos += 1
+        if code == GAME:
+            player_count, seed = GAME_HEADER.unpack_from(data, pos)
+            pos += GAME_HEADER.size
+            actions = []
+            games.append((player_count, seed, actions))
+            continue
+        if actions is None:
+            raise ValueError(f"{path} has actions before the first game")
+        if code <= DICE_COUNT:
+            values = []
+            if code:
+                values = unpack_faces(FACES.unpack_from(data, pos)[0], code)
+                pos += FACES.size
+            actions.append((ROLL, values))
+        elif KEEP < code < END_TURN:
+            actions.append((KEEP, code & ~KEEP))
+        elif code in (END_TURN, TAKE_PREVIOUS):
+            actions.append((code, None))
+        else:
+            raise ValueError(f"Unknown record 0x{code:02x} at byte {pos - 1} of {path}")
+    return games
+
+
+def replay_game(player_count, actions, states=None):
+    """
+    Play a recorded game again through the rules engine
+    Args:
+        player_count (int): number of players
+        actions (list): actions from read_games
+        states (list): if given, the state.State after each action is appended to it
+    Returns:
+        Engine: the engine after the last action
+    """
+    game = Engine(player_count)
+    for i, (action, arg) in enumerate(actions):
+        if action == ROLL:
+            result = game.roll(values=arg)
+        elif action == KEEP:
+            result = game.keep(arg)
+        elif action == END_TURN:
+            result = game.end_turn()
+        else:
+            result = game.take_previous()
+        if result is None:
+            raise ValueError(f"Action {i} of the game isn't allowed by the rules")
+        if states is not None:
+            states.append(State.of(game))
+    return game
+
+
+def main():
+    """Replay every game in a log and print how each ended"""
+    parser = argparse.ArgumentParser(description="Replay recorded games")
+    parser.add_argument("log", help="log file written with main.py --log")
+    parser.add_argument("--quiet", action="store_true", help="only print the totals")
+    parser.add_argument("--states", action="store_true", help="also count the distinct positions played through")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games = read_games(args.log)
+    states = [] if args.states else None
+    for number, (player_count, seed, actions) in enumerate(games):
+        game = replay_game(player_count, actions, states)
+        if not args.quiet:
+            result = f"player {game.winner + 1} won" if game.game_over else "unfinished"
+            print(f"game {number}: seed {seed}, {len(actions)} actions, {result}, scores {game.scores}")
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(args.log)
+    print(f"{len(games)} games ({size} bytes) replayed in {elapsed:.3f}s")
+    if states is not None:
+        print(f"{len(set(states))} distinct positions out of {len(states)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules")  # Variants the menu offers
+STEP = 50  # Every score is a multiple of this, see state.State
+MAX_DICE = 7  # Scoring keys count each face in 3 bits
+ORDERED_DICE = 6  # Engine rolls of more dice are joined from tables compile() builds
+MAX_TARGET = 12000  # state.State packs scores in 8 bits of steps, this leaves room for a bust
+
+# Tables already built, keyed by the rules they depend on, shared by equal rule sets
+_TABLES = {}
+# The menu compiles on the worker thread while a game may be starting. Reentrant, as importing
+# the engine from compile() compiles the classic rules.
+_TABLES_LOCK = threading.RLock()
+
+
+class RuleSet:
+    """
+    House rules of a game of dice
+
+    Every rule the engine, bots and odds look at: the target, the entry
+    score, the number of dice and what the straight and pairs are worth.
+    compile() turns the scoring rules into the same lookup tables the
+    classic rules use, so a variant costs a table lookup like any other and
+    nothing on the hot paths checks which rules are being played.
+    """
+    FIELDS = ("name", "target", "entry", "dice", "straight", "pairs", "pairs_score")
+
+    def __init__(self, name="Classic", target=10000, entry=1000, dice=6, straight=1500, pairs=3, pairs_score=1500):
+        """
+        Initialize the rules, raising ValueError if they can't be played
+        Args:
+            name (str): shown in the menu
+            target (int): score that must be hit exactly to win
+            entry (int): score needed before points can be banked
+            dice (int): dice in a full set, up to MAX_DICE
+            straight (int): score of one of each face, 0 if it doesn't score
+            pairs (int): number of pairs that score together
+            pairs_score (int): score of that many pairs, 0 if they don't score
+        """
+        if not 1 <= dice <= MAX_DICE:
+            raise ValueError(f"{name}: dice must be 1 to {MAX_DICE}, got {dice}")
+        if target % STEP or entry % STEP or not 0 < target <= MAX_TARGET or not 0 <= entry <= target:
+            raise ValueError(f"{name}: target and entry must be multiples of {STEP}, "
+                             f"with 0 <= entry <= target <= {MAX_TARGET}")
+        if pairs_score and not 2 <= pairs * 2 <= dice:
+            raise ValueError(f"{name}: {pairs} pairs don't fit in {dice} dice")
+        if straight % STEP or pairs_score % STEP:
+            raise ValueError(f"{name}: straight and pairs scores must be multiples of {STEP}")
+        self.name = name
+        self.target = target
+        self.entry = entry
+        self.dice = dice
+        self.straight = straight
+        self.pairs = pairs
+        self.pairs_score = pairs_score
+        self.tables_key = (dice, straight, pairs, pairs_score)  # Everything the tables depend on
+        self.key = (target, entry) + self.tables_key  # Everything play depends on, the name aside
+        # Filled in by compile()
+        self.score = None
+        self.keepable = None
+        self.legal_keeps = None
+        self.rolls = None
+        self.masks = None
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read rules saved as JSON, any field left out keeps the classic rule
+        Args:
+            path (str): file written by save()
+        Returns:
+            RuleSet
+        """
+        with open(path) as f:
+            data = json.load(f)
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"{path}: unknown rules {', '.join(sorted(unknown))}")
+        data.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+        return cls(**data)
+
+    def save(self, path):
+        """Write the rules as JSON"""
+        with open(path, "w") as f:
+            json.dump({field: getattr(self, field) for field in self.FIELDS}, f, indent=1)
+
+    def compile(self):
+        """
+        Build the lookup tables, once per distinct set of scoring rules
+        Returns:
+            RuleSet: self, ready to play
+        """
+        if self.score is None:
+            with _TABLES_LOCK:
+                if self.score is None:  # Another thread may have compiled it while this one waited
+                    tables = _TABLES.get(self.tables_key)
+                    if tables is None:
+                        import scoring  # Builds the classic tables, so only rules that get played load it
+                        if self.tables_key == (scoring.DICE, scoring.STRAIGHT, scoring.PAIRS, scoring.PAIRS_SCORE):
+                            built = (scoring.SCORE, scoring.KEEPABLE, scoring.LEGAL_KEEPS, scoring.ROLLS)
+                        else:
+                            built = scoring.build_tables(*self.tables_key)
+                        # The last table remembers legal keep masks per ordering of faces, see engine.roll_masks
+                        tables = _TABLES[self.tables_key] = built + ({},)
+                    if self.dice > ORDERED_DICE:
+                        import engine  # Only rules with more dice than the engine built at import need it here
+                        engine.prepare_rolls(self.dice)  # So the first roll doesn't stall the game
+                    self.keepable, self.legal_keeps, self.rolls, self.masks = tables[1:]
+                    self.score = tables[0]  # Set last, it's what the check above reads without the lock
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, RuleSet) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"RuleSet({self.name!r}, target={self.target}, entry={self.entry}, dice={self.dice})"
+
+
+def load_all(directory=RULES_DIR):
+    """
+    Every rule set saved in a directory, by file name
+    Returns:
+        list: RuleSet of each .json file, files that can't be played are skipped with a warning
+    """
+    rule_sets = []
+    if not os.path.isdir(directory):
+        return rule_sets
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".json"):
+            try:
+                rule_sets.append(RuleSet.load(os.path.join(directory, file_name)))
+            except (OSError, ValueError, TypeError) as error:
+                print(f"Skipping rules {file_name}: {error}")
+    return rule_sets
+
+
+# The rules in the README, played unless another set is picked
+CLASSIC = RuleSet()
@@ -0,0 +1,236 @@
+import itertools
+
+FACES = (1, 2, 3, 4, 5, 6)
+# Classic rules, see ruleset.RuleSet for the variants
+DICE = 6
+STRAIGHT = 1500  # One of each face
+PAIRS = 3  # Pairs that score together
+PAIRS_SCORE = 1500
+
+# A roll is keyed by its histogram packed three bits per face, so the key of
+# a group of dice is just the sum of FACE_KEY over their values
+FACE_BITS = 3
+FACE_KEY = (0,) + tuple(1 << (FACE_BITS * (face - 1)) for face in FACES)
+TABLE_SIZE = 1 << (FACE_BITS * len(FACES))
+
+
+def pack(values):
+    """
+    Pack face values into a histogram key
+    Args:
+        values (list): die face values
+    Returns:
+        int: packed histogram key
+    """
+    key = 0
+    for value in values:
+        key += FACE_KEY[value]
+    return key
+
+
+def pack_counts(counts):
+    """
+    Pack a list of face counts into a histogram key
+    Args:
+        counts (list): counts indexed by face value, index 0 is unused
+    Returns:
+        int: packed histogram key
+    """
+    key = 0
+    for face in FACES:
+        key += counts[face] * FACE_KEY[face]
+    return key
+
+
+def unpack(key):
+    """
+    Unpack a histogram key into face counts
+    Args:
+        key (int): packed histogram key
+    Returns:
+        list: counts indexed by face value, index 0 is unused
+    """
+    counts = [0] * 7
+    for face in FACES:
+        counts[face] = (key >> (FACE_BITS * (face - 1))) & 7
+    return counts
+
+
+def count_values(values):
+    """
+    Count how many times each face appears
+    Args:
+        values (list): die face values
+    Returns:
+        list: counts indexed by face value, index 0 is unused
+    """
+    counts = [0] * 7
+    for value in values:
+        counts[value] += 1
+    return counts
+
+
+def score_counts(counts, straight=STRAIGHT, pairs=PAIRS, pairs_score=PAIRS_SCORE):
+    """
+    Calculate the score of a group of kept dice from their face counts
+
+    This is the reference the tables are built from. A straight or a set
+    of pairs scores flat, plus whatever the dice left over score, when
+    that beats counting the dice one face at a time.
+    Args:
+        counts (list): counts indexed by face value, as from count_values
+        straight (int): score of one of each face, 0 if it doesn't score
+        pairs (int): number of pairs that score together
+        pairs_score (int): score of that many pairs, 0 if they don't score
+    Returns:
+        int: score for the dice, 0 if nothing scores
+    """
+    score = 0
+    for value in FACES:
+        count = counts[value]
+        if count >= 3:
+            # Three of a kind, plus the same again for each extra die
+            score += (1000 if value == 1 else value * 100) * (count - 2)
+        elif value == 1:
+            score += 100 * count
+        elif value == 5:
+            score += 50 * count
+
+    if straight and all(counts[face] for face in FACES):
+        rest = [0] + [counts[face] - 1 for face in FACES]
+        score = max(score, straight + score_counts(rest, straight, pairs, pairs_score))
+    if pairs_score:
+        for paired in itertools.combinations([face for face in FACES if counts[face] >= 2], pairs):
+            rest = counts[:]
+            for face in paired:
+                rest[face] -= 2
+            score = max(score, pairs_score + score_counts(rest, straight, pairs, pairs_score))
+    return score
+
+
+def keepable_counts(counts, straight=STRAIGHT, pairs=PAIRS, pairs_score=PAIRS_SCORE):
+    """
+    Find the faces of a roll that may be kept on their own
+    Args:
+        counts (list): counts of the rolled dice indexed by face value
+        straight, pairs, pairs_score: the combinations that score, as for score_counts
+    Returns:
+        int: bitmask with bit v set if a v may be kept
+    """
+    faces = 0
+    for face in FACES:
+        if counts[face] and (face == 1 or face == 5 or counts[face] >= 3):
+            faces |= 1 << face
+
+    # A straight makes every face keepable, enough pairs every paired face
+    if straight and all(counts[face] for face in FACES):
+        for face in FACES:
+            faces |= 1 << face
+    paired = [face for face in FACES if counts[face] >= 2]
+    if pairs_score and len(paired) >= pairs:
+        for face in paired:
+            faces |= 1 << face
+    return faces
+
+
+def roll_multisets(dice_count):
+    """
+    Every distinct roll of a number of dice, as face counts
+    Args:
+        dice_count (int): number of dice rolled
+    Returns:
+        list: counts lists indexed by face value
+    """
+    rolls = []
+    for values in itertools.combinations_with_replacement(FACES, dice_count):
+        rolls.append(count_values(values))
+    return rolls
+
+
+def sub_multisets(counts):
+    """
+    Every non-empty group of dice that can be taken out of a roll
+    Args:
+        counts (list): counts of the rolled dice indexed by face value
+    Returns:
+        list: counts lists of each sub-multiset
+    """
+    ranges = [range(counts[face] + 1) for face in FACES]
+    subs = []
+    for sub in itertools.product(*ranges):
+        if any(sub):
+            subs.append([0] + list(sub))
+    return subs
+
+
+def build_tables(dice=DICE, straight=STRAIGHT, pairs=PAIRS, pairs_score=PAIRS_SCORE):
+    """
+    Build the scoring tables for every roll of 1 up to a number of dice
+    Args:
+        dice (int): most dice rolled at once, up to ruleset.MAX_DICE
+        straight, pairs, pairs_score: the combinations that score, as for score_counts
+    Returns:
+        tuple: (SCORE, KEEPABLE, LEGAL_KEEPS, ROLLS) as described below
+    """
+    score = [0] * TABLE_SIZE
+    keepable = [0] * TABLE_SIZE
+    legal_keeps = [()] * TABLE_SIZE
+    rolls = []
+
+    for dice_count in range(1, dice + 1):
+        for counts in roll_multisets(dice_count):
+            key = pack_counts(counts)
+            rolls.append(key)
+            score[key] = score_counts(counts, straight, pairs, pairs_score)
+            faces = keepable_counts(counts, straight, pairs, pairs_score)
+            keepable[key] = faces
+
+            # A keep is legal if every die in it is keepable and it scores. Keeps are
+            # smaller rolls, so their scores are already in the table.
+            keeps = []
+            for sub in sub_multisets(counts):
+                sub_key = pack_counts(sub)
+                if all(faces >> face & 1 for face in FACES if sub[face]) and score[sub_key] > 0:
+                    keeps.append(sub_key)
+            legal_keeps[key] = tuple(keeps)
+
+    return score, keepable, legal_keeps, tuple(rolls)
+
+
+# Tables indexed by packed histogram key:
+# SCORE - score of the dice if all kept, 0 means the roll is a farkle
+# KEEPABLE - bitmask of faces that may be kept on their own (bit v for face v)
+# LEGAL_KEEPS - keys of every legal scoring keep out of the roll
+# ROLLS - keys of all 923 distinct rolls of 1 to 6 dice
+# These are the classic rules, ruleset.RuleSet.compile builds them for the others
+SCORE, KEEPABLE, LEGAL_KEEPS, ROLLS = build_tables()
+
+
+def score(key):
+    """Score of a group of kept dice"""
+    return SCORE[key]
+
+
+def is_farkle(key):
+    """Check if a roll has nothing that scores"""
+    return SCORE[key] == 0
+
+
+def max_score(key):
+    """
+    Best score that can be kept out of a roll
+
+    Dice that can't be kept never add to a score, so keeping every keepable
+    die scores the same as the whole roll.
+    """
+    return SCORE[key]
+
+
+def legal_keeps(key):
+    """Keys of every legal scoring keep out of a roll"""
+    return LEGAL_KEEPS[key]
+
+
+def dice_count(key):
+    """Number of dice in a packed histogram"""
+    return sum(unpack(key))
@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+from engine import Engine
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_PLAYERS = 6
+MAX_LINE = 64 * 1024  # Longest request accepted, longer lines are skipped with an error reply
+
+# Engine methods clients may call, with the message fields passed to them
+ACTIONS = {
+    "keep": ("mask",),
+    "end_turn": (),
+    "take_previous": (),
+}
+
+
+def whole_number(message, field, default=None):
+    """
+    Integer field of a request
+    Returns:
+        int: the field, or default if it's missing
+    Raises:
+        ValueError: if it's there but not a whole number, like 1.5, 1e999 or "3"
+    """
+    value = message.get(field, default)
+    if value is not default and (not isinstance(value, int) or isinstance(value, bool)):
+        raise ValueError(f"{field} must be a whole number")
+    return value
+
+
+def engine_state(game):
+    """Everything a client needs to show a table, as plain JSON values"""
+    return {
+        "scores": game.scores,
+        "current_player": game.current_player,
+        "turn_score": game.turn_score,
+        "dice": game.dice,
+        "kept": game.kept,
+        "must_roll": game.must_roll,
+        "has_rolled": game.has_rolled,
+        "can_keep": game.can_keep,
+        "can_end_turn": game.can_end_turn(),
+        "can_take_previous": game.can_take_previous(),
+        "previous_turn_score": game.previous_turn_score,
+        "previous_dice_count": game.previous_dice_count,
+        "game_over": game.game_over,
+        "winner": game.winner,
+    }
+
+
+class Table:
+    """One game hosted by the server and the connections seated at it"""
+    def __init__(self, table_id, player_count, seed=None):
+        """
+        Initialize the table
+        Args:
+            table_id (int): id clients use to join
+            player_count (int): number of players
+            seed (int): seed for the table's rolls, random if not given
+        """
+        self.id = table_id
+        self.engine = Engine(player_count, random.Random(seed))
+        self.seats = [None] * player_count  # Connection playing each seat
+
+    def claim(self, connection, count):
+        """
+        Seat a connection in the next free seats
+        Args:
+            connection: Connection taking the seats
+            count (int): seats to take
+        Returns:
+            list: seat numbers taken, empty if there weren't enough free
+        """
+        free = [seat for seat, owner in enumerate(self.seats) if owner is None]
+        if count < 1 or len(free) < count:
+            return []
+        for seat in free[:count]:
+            self.seats[seat] = connection
+        return free[:count]
+
+    def leave(self, connection):
+        """Free every seat a connection had"""
+        self.seats = [None if owner is connection else owner for owner in self.seats]
+
+    def play(self, action, message):
+        """
+        Apply an action for the current player
+        Args:
+            action (str): "roll" or a name in ACTIONS
+            message (dict): request holding the action's fields
+        Returns:
+            dict: reply fields, with the result and the table's state
+        """
+        game = self.engine
+        if action == "roll":
+            # The dice stay visible on a farkle or bust, so send them before resolving
+            result = game.roll(resolve=False)
+            if result is None:
+                raise ValueError("Rolling isn't allowed now")
+            reply = {"result": result, "state": engine_state(game)}
+            if game.pending:
+                game.resolve()
+                reply["resolved"] = engine_state(game)
+            return reply
+
+        missing = [field for field in ACTIONS[action] if field not in message]
+        if missing:
+            raise ValueError(f"{action} needs {', '.join(missing)}")
+        args = [whole_number(message, field) for field in ACTIONS[action]]
+        result = getattr(game, action)(*args)
+        if result is None:
+            raise ValueError(f"{action} isn't allowed now")
+        return {"result": result, "state": engine_state(game)}
+
+    def broadcast(self, message, exclude=None):
+        """Send a message to every other connection seated here"""
+        for connection in {owner for owner in self.seats if owner is not None}:
+            if connection is not exclude:
+                connection.send(message)
+
+
+class Connection:
+    """One client and the tables it sits at"""
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.tables = {}  # table id -> Table
+
+    def send(self, message):
+        """Queue a message, the event loop writes it out when it can"""
+        self.writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+class GameServer:
+    """
+    Many tables in one process, played over line-delimited JSON
+
+    Every request is one JSON object per line with an "op" field and an
+    optional "id" echoed in the reply. A table is created with
+    {"op": "create", "players": n} and joined with {"op": "join",
+    "table": id}. The seated connection whose seat is the current player
+    then sends "roll", "keep" (with "mask"), "end_turn" or "take_previous".
+    Replies carry "ok", the action's "result" and the table's "state", and
+    everyone else at the table gets the same as an "update" event.
+    """
+    def __init__(self):
+        self.tables = {}
+        self.ids = itertools.count(1)
+
+    async def handle(self, reader, writer):
+        """Serve one client until it disconnects"""
+        connection = Connection(reader, writer)
+        try:
+            while True:
+                try:
+                    line = await self.read_request(reader)
+                except ValueError as error:
+                    connection.send({"ok": False, "error": str(error)})
+                    await writer.drain()
+                    continue
+                if not line:
+                    break
+                connection.send(self.dispatch(connection, line))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for table in connection.tables.values():
+                table.leave(connection)
+                if not any(table.seats):
+                    del self.tables[table.id]  # Nobody left to play
+            writer.close()
+
+    async def read_request(self, reader):
+        """
+        Read the next request line
+        Returns:
+            bytes: the line, empty once the client has gone
+        Raises:
+            ValueError: if the line is longer than the reader's limit, once the rest of it is skipped
+        """
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            return error.partial  # A last line with no newline, or nothing at the end
+        except asyncio.LimitOverrunError:
+            pass
+        # Throw the rest of the line away a buffer at a time, so the next request starts clean
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.LimitOverrunError as error:
+                await reader.readexactly(error.consumed)
+            except asyncio.IncompleteReadError:
+                return b""
+        raise ValueError(f"Requests must be under {MAX_LINE} bytes")
+
+    def dispatch(self, connection, line):
+        """
+        Handle one request
+        Args:
+            connection: Connection that sent it
+            line (bytes): the JSON request
+        Returns:
+            dict: reply to send back
+        """
+        reply = {}
+        try:
+            message = json.loads(line)
+            if "id" in message:
+                reply["id"] = message["id"]
+            reply.update(self.apply(connection, message))
+            reply["ok"] = True
+        except (ValueError, KeyError, TypeError, ArithmeticError, RecursionError) as error:
+            # Anything a malformed request can raise is refused, never dropping the connection
+            reply["ok"] = False
+            reply["error"] = str(error)
+        return reply
+
+    def apply(self, connection, message):
+        """Carry out a request, raising ValueError if it can't be"""
+        op = message["op"]
+        if op == "create":
+            players = whole_number(message, "players", 2)
+            if not 2 <= players <= MAX_PLAYERS:
+                raise ValueError(f"Players must be 2-{MAX_PLAYERS}")
+            table = Table(next(self.ids), players, whole_number(message, "seed"))
+            seats = table.claim(connection, whole_number(message, "seats", players))
+            if not seats:
+                raise ValueError("Seats must be 1 to the player count")
+            self.tables[table.id] = table
+            connection.tables[table.id] = table
+            return {"table": table.id, "seats": seats, "state": engine_state(table.engine)}
+
+        table = self.tables.get(message.get("table"))
+        if table is None:
+            raise ValueError("No such table")
+        if op == "join":
+            seats = table.claim(connection, whole_number(message, "seats", 1))
+            if not seats:
+                raise ValueError("Table is full")
+            connection.tables[table.id] = table
+            return {"table": table.id, "seats": seats, "state": engine_state(table.engine)}
+        if op == "state":
+            return {"table": table.id, "state": engine_state(table.engine)}
+
+        if op != "roll" and op not in ACTIONS:
+            raise ValueError(f"Unknown op {op!r}")
+        if table.seats[table.engine.current_player] is not connection:
+            raise ValueError("It isn't your turn")
+        reply = table.play(op, message)
+        table.broadcast(dict(reply, event="update", op=op, table=table.id), exclude=connection)
+        return reply
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Accept clients until cancelled"""
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """Run the game server"""
+    parser = argparse.ArgumentParser(description="Host games of dice for network clients")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    print(f"Serving tables on {args.host}:{args.port}")
+    try:
+        asyncio.run(GameServer().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
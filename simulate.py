@@ -0,0 +1,329 @@
+import argparse
+import time
+import numpy as np
+import scoring
+from ruleset import CLASSIC, RuleSet
+
+# Turn outcomes reported by simulate_turns
+STOPPED = 0
+FARKLED = 1
+BUSTED = 2
+
+FACE_KEY = np.array(scoring.FACE_KEY, dtype=np.int64)
+FACE_SHIFTS = np.array([scoring.FACE_BITS * (face - 1) for face in scoring.FACES], dtype=np.int64)
+
+# Scoring rules -> arrays from _build_tables, shared by every simulation playing by them
+_TABLES = {}
+
+
+def _key_counts(keys):
+    """Face counts of packed keys, shape (..., 6) with column 0 for face 1"""
+    return (np.asarray(keys)[..., None] >> FACE_SHIFTS) & 7
+
+
+def _build_tables(ruleset):
+    """
+    The scoring tables as arrays, so a whole batch of rolls is scored in one lookup
+    Args:
+        ruleset (RuleSet): compiled rules to score by
+    Returns:
+        tuple: (SCORE, KEEPABLE, DICE, KEEP_ALL, KEEP_FEWEST) arrays indexed by roll key
+    """
+    score = np.array(ruleset.score, dtype=np.int64)
+    keepable = np.array(ruleset.keepable, dtype=np.int64)
+    dice = _key_counts(np.arange(scoring.TABLE_SIZE)).sum(axis=1)
+    keep_all = np.zeros(scoring.TABLE_SIZE, dtype=np.int64)
+    keep_fewest = np.zeros(scoring.TABLE_SIZE, dtype=np.int64)
+    for key in ruleset.rolls:
+        keeps = ruleset.legal_keeps[key]
+        if not keeps:
+            continue
+        # Keeping every keepable die scores the whole roll
+        keep_all[key] = max(keeps, key=lambda k: (score[k], dice[k]))
+        # Keeping as few dice as possible leaves the most to roll again
+        keep_fewest[key] = min(keeps, key=lambda k: (dice[k], -score[k]))
+    return score, keepable, dice, keep_all, keep_fewest
+
+
+def tables(ruleset):
+    """Arrays from _build_tables for a set of rules, built once per set of scoring rules"""
+    built = _TABLES.get(ruleset.tables_key)
+    if built is None:
+        built = _TABLES[ruleset.tables_key] = _build_tables(ruleset.compile())
+    return built
+
+
+# Classic rules:
+# SCORE - score of the dice if all kept, 0 for a farkle
+# KEEPABLE - bitmask of faces that may be kept on their own
+# DICE - number of dice in a key
+# KEEP_ALL - keep every scoring die
+# KEEP_FEWEST - the best scoring keep using the fewest dice
+SCORE, KEEPABLE, DICE, KEEP_ALL, KEEP_FEWEST = tables(CLASSIC)
+
+
+def roll_keys(rng, dice_left, ruleset=CLASSIC):
+    """
+    Roll a batch of dice and pack each roll into a histogram key
+    Args:
+        rng: numpy Generator
+        dice_left (ndarray): number of dice each row rolls, 1 to a full set
+        ruleset (RuleSet): rules giving the size of a full set
+    Returns:
+        ndarray: packed histogram key of each row's roll
+    """
+    values = rng.integers(1, 7, size=(len(dice_left), ruleset.dice), dtype=np.int8)
+    # Unused columns become face 0, which adds nothing to the key
+    values *= np.arange(ruleset.dice) < dice_left[:, None]
+    return FACE_KEY[values].sum(axis=1)
+
+
+def legal_keeps(roll, keep, ruleset=CLASSIC):
+    """
+    Check which keeps are legal scoring keeps out of their rolls
+    Args:
+        roll (ndarray): packed keys of the rolls
+        keep (ndarray): packed keys of the dice kept from each roll
+        ruleset (RuleSet): rules to score by
+    Returns:
+        ndarray: True where the keep could be made in the game
+    """
+    score, keepable_faces = tables(ruleset)[:2]
+    keep_counts = _key_counts(keep)
+    inside = (keep_counts <= _key_counts(roll)).all(axis=1)
+    # Every kept face has to be keepable on its own
+    kept_faces = ((keep_counts > 0) << np.arange(1, 7)).sum(axis=1)
+    keepable = (kept_faces & ~keepable_faces[roll]) == 0
+    return inside & keepable & (score[keep] > 0)
+
+
+class ThresholdStrategy:
+    """
+    Keep scoring dice and bank once the turn is worth enough
+
+    Strategies work on whole batches: every method gets arrays with one
+    entry per game and returns an array of decisions.
+    """
+    def __init__(self, stop_at=300, keep="all", take_previous=True, ruleset=CLASSIC):
+        """
+        Initialize the strategy
+        Args:
+            stop_at (int): bank once the turn score reaches this
+            keep (str): "all" keeps every scoring die, "fewest" keeps as few as possible
+            take_previous (bool): whether to start with the previous player's score
+            ruleset (RuleSet): rules of the games it plays
+        """
+        self.stop_at = stop_at
+        keep_all, keep_fewest = tables(ruleset)[3:]
+        self.keep_table = keep_fewest if keep == "fewest" else keep_all
+        self.target = ruleset.target
+        self.take = take_previous
+        self.name = f"threshold-{stop_at}-{keep}"
+
+    def take_previous(self, offer, offer_dice, banked):
+        """Decide whether to start with the previous player's score and dice"""
+        return np.full(len(offer), self.take)
+
+    def keep(self, roll, turn_score, banked, dice_left):
+        """Packed key of the dice to keep out of each roll"""
+        return self.keep_table[roll]
+
+    def stop(self, turn_score, banked, dice_left):
+        """Decide whether to bank after keeping, only honoured when allowed"""
+        return (turn_score >= self.stop_at) | (banked + turn_score == self.target)
+
+
+def _choose(strategies, players, method, *args):
+    """Ask each row's strategy for its decisions"""
+    if len(strategies) == 1:
+        return getattr(strategies[0], method)(*args)
+    result = None
+    for player, strategy in enumerate(strategies):
+        rows = players == player
+        if not rows.any():
+            continue
+        chosen = getattr(strategy, method)(*(arg[rows] for arg in args))
+        if result is None:
+            result = np.zeros(len(players), dtype=np.asarray(chosen).dtype)
+        result[rows] = chosen
+    return result
+
+
+def play_turns(rng, strategies, players, banked, turn_score, dice_left, ruleset=CLASSIC):
+    """
+    Play one turn in every row, following the same rules as engine.Engine
+    Args:
+        rng: numpy Generator
+        strategies (list): strategy of each player
+        players (ndarray): player whose turn it is in each row
+        banked (ndarray): each player's banked score
+        turn_score (ndarray): score the turn starts with
+        dice_left (ndarray): dice to roll first, 0 if a full set was kept
+        ruleset (RuleSet): rules to play by
+    Returns:
+        tuple: (score, dice_left, outcome, rolls) arrays. score is what the
+            turn banks, 0 unless the outcome is STOPPED.
+    """
+    score, _, dice_in, _, _ = tables(ruleset)
+    target, entry = ruleset.target, ruleset.entry
+    n = len(banked)
+    turn_score = np.array(turn_score, dtype=np.int64)
+    dice_left = np.array(dice_left, dtype=np.int64)
+    outcome = np.full(n, STOPPED, dtype=np.int8)
+    rolls = np.zeros(n, dtype=np.int64)
+    live = np.ones(n, dtype=bool)
+
+    while live.any():
+        idx = np.flatnonzero(live)
+        b = banked[idx]
+        t = turn_score[idx]
+        d = dice_left[idx]
+
+        # Every die kept: they all come back, unless that already busts
+        hot = d == 0
+        over = hot & (b + t > target)
+        d = np.where(hot, ruleset.dice, d)
+
+        roll = roll_keys(rng, d, ruleset)
+        rolls[idx] += ~over
+        potential = score[roll]
+        farkle = ~over & (potential == 0)
+        bust = over | (~farkle & (b + t + potential > target))
+        ok = ~(farkle | bust)
+
+        keep = np.zeros(len(idx), dtype=np.int64)
+        if ok.any():
+            keep[ok] = _choose(strategies, players[idx[ok]], "keep", roll[ok], t[ok], b[ok], d[ok])
+            if not legal_keeps(roll[ok], keep[ok], ruleset).all():
+                raise ValueError("Strategy chose a keep that isn't a legal scoring keep")
+        kept_score = score[keep]
+        # Keeping can bust too, the same check as Engine.keep
+        keep_bust = ok & (b + t + kept_score > target)
+        bust |= keep_bust
+        ok &= ~keep_bust
+
+        t = np.where(ok, t + kept_score, 0)
+        d = np.where(ok, d - dice_in[keep], d)
+
+        # Banking is only allowed with the entry score banked or in this turn
+        stop = ok & ((b >= entry) | (t >= entry))
+        if stop.any():
+            stop[stop] = _choose(strategies, players[idx[stop]], "stop", t[stop], b[stop], d[stop])
+
+        turn_score[idx] = t
+        dice_left[idx] = d
+        outcome[idx[farkle]] = FARKLED
+        outcome[idx[bust]] = BUSTED
+        live[idx[~ok | stop]] = False
+
+    return turn_score, dice_left, outcome, rolls
+
+
+def simulate_turns(n, strategy, banked=0, rng=None, ruleset=CLASSIC):
+    """
+    Play n independent single turns
+    Args:
+        n (int): number of turns
+        strategy: strategy to play with
+        banked (int or ndarray): banked score at the start of each turn
+        rng: numpy Generator, a fresh one if not given
+        ruleset (RuleSet): rules to play by
+    Returns:
+        dict: score, dice_left, outcome and rolls arrays
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    banked = np.broadcast_to(np.asarray(banked, dtype=np.int64), (n,))
+    players = np.zeros(n, dtype=np.int64)
+    score, dice_left, outcome, rolls = play_turns(
+        rng, [strategy], players, banked, np.zeros(n, dtype=np.int64),
+        np.full(n, ruleset.dice, dtype=np.int64), ruleset)
+    return {"score": score, "dice_left": dice_left, "outcome": outcome, "rolls": rolls}
+
+
+def simulate_games(n, strategies, rng=None, max_turns=100000, ruleset=CLASSIC):
+    """
+    Play n independent games to the end
+    Args:
+        n (int): number of games
+        strategies (list): strategy of each player, in turn order
+        rng: numpy Generator, a fresh one if not given
+        max_turns (int): stop games that run longer than this
+        ruleset (RuleSet): rules to play by, the strategies should be made for the same
+    Returns:
+        dict: winner (-1 if unfinished), turns and final scores arrays
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    player_count = len(strategies)
+    scores = np.zeros((n, player_count), dtype=np.int64)
+    current = np.zeros(n, dtype=np.int64)
+    previous_score = np.zeros(n, dtype=np.int64)
+    previous_dice = np.zeros(n, dtype=np.int64)
+    winner = np.full(n, -1, dtype=np.int64)
+    turns = np.zeros(n, dtype=np.int64)
+    live = np.ones(n, dtype=bool)
+
+    while live.any() and turns.max() < max_turns:
+        idx = np.flatnonzero(live)
+        players = current[idx]
+        banked = scores[idx, players]
+        offer = previous_score[idx]
+        offer_dice = previous_dice[idx]
+
+        # Players with the entry score banked may start with the previous player's score
+        take = (banked >= ruleset.entry) & (offer > 0) & (banked + offer < ruleset.target)
+        if take.any():
+            take[take] = _choose(strategies, players[take], "take_previous",
+                                 offer[take], offer_dice[take], banked[take])
+        turn_score = np.where(take, offer, 0)
+        dice_left = np.where(take, offer_dice, ruleset.dice)
+
+        score, dice_left, _, _ = play_turns(rng, strategies, players, banked, turn_score, dice_left, ruleset)
+
+        # The next player is offered whatever this turn ended with
+        previous_score[idx] = score
+        previous_dice[idx] = dice_left
+        banked = banked + score
+        scores[idx, players] = banked
+        turns[idx] += 1
+
+        won = banked >= ruleset.target
+        winner[idx[won]] = players[won]
+        live[idx[won]] = False
+        current[idx] = (players + 1) % player_count
+
+    return {"winner": winner, "turns": turns, "scores": scores}
+
+
+def main():
+    """Run a batch of simulated games from the command line and print win rates"""
+    parser = argparse.ArgumentParser(description="Simulate games of dice")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--stop-at", type=int, nargs="+", default=[300, 300],
+                        help="bank threshold of each player's strategy")
+    parser.add_argument("--keep", choices=["all", "fewest"], default="all")
+    parser.add_argument("--batch", type=int, default=250000, help="games simulated at once")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rules", metavar="FILE", help="play by rules saved as JSON, see ruleset.py")
+    args = parser.parse_args()
+
+    ruleset = RuleSet.load(args.rules) if args.rules else CLASSIC
+    strategies = [ThresholdStrategy(stop_at, args.keep, ruleset=ruleset) for stop_at in args.stop_at]
+    rng = np.random.default_rng(args.seed)
+    wins = np.zeros(len(strategies), dtype=np.int64)
+    total_turns = 0
+    start = time.perf_counter()
+    for first in range(0, args.games, args.batch):
+        results = simulate_games(min(args.batch, args.games - first), strategies, rng, ruleset=ruleset)
+        finished = results["winner"][results["winner"] >= 0]
+        wins += np.bincount(finished, minlength=len(strategies))
+        total_turns += results["turns"].sum()
+    elapsed = time.perf_counter() - start
+
+    for strategy, win_count in zip(strategies, wins):
+        print(f"{strategy.name}: {win_count / args.games:.4f} win rate")
+    print(f"Mean game length: {total_turns / args.games:.1f} turns")
+    print(f"{args.games / elapsed:.0f} games/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import math
+import os
+import struct
+import time
+import numpy as np
+import scoring
+from engine import DICE_COUNT, ENTRY_SCORE, WIN_SCORE
+
+# Every score in the game is a multiple of 50, so scores are stored as steps
+STEP = 50
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "optimal.bin")
+
+# File layout: header, then the roll values, then the best keep indices
+MAGIC = b"DICEOPT1"
+HEADER = struct.Struct("<8s6I")
+
+# Index of each distinct roll in the keep table
+ROLL_INDEX = {key: i for i, key in enumerate(scoring.ROLLS)}
+
+
+def roll_probability(key):
+    """
+    Chance of rolling exactly this multiset
+    Args:
+        key (int): packed histogram key of the roll
+    Returns:
+        float: probability of the roll with that many dice
+    """
+    counts = scoring.unpack(key)
+    dice = sum(counts)
+    ways = math.factorial(dice)
+    for count in counts:
+        ways //= math.factorial(count)
+    return ways / 6 ** dice
+
+
+def solve(target=WIN_SCORE, entry=ENTRY_SCORE):
+    """
+    Find the turn play that maximises expected banked score
+
+    The state is (banked score, turn score, dice left to roll). Keeps always
+    add score, so every state only depends on states with a higher turn
+    score and the table is filled from the top turn score down, for every
+    banked score at once.
+    Args:
+        target (int): score that must be hit exactly
+        entry (int): score needed before points can be banked
+    Returns:
+        tuple: (values, keeps) arrays. values[b, t, d] is the expected score
+            banked by rolling d dice (0 meaning all six came back), keeps[b, t, r]
+            is the index into scoring.LEGAL_KEEPS of the best keep for roll r.
+    """
+    size = target // STEP + 1
+    banked = np.arange(size)[:, None]
+    values = np.zeros((size, size, DICE_COUNT + 1))
+    keeps = np.zeros((size, size, len(scoring.ROLLS)), dtype=np.uint8)
+    # Value after keeping: the better of banking and rolling on
+    after_keep = np.zeros((size, size + 1, DICE_COUNT + 1))
+    # Keeps that land past the target never happen, they bust on the roll first
+    stop_value = np.arange(size)[None, :] * STEP * 1.0
+    can_stop = (banked * STEP >= entry) | (np.arange(size)[None, :] * STEP >= entry)
+
+    # Per dice count: dense (rolls, keeps) layout of every legal keep
+    layouts = {}
+    for dice in range(1, DICE_COUNT + 1):
+        rolls = [key for key in scoring.ROLLS if scoring.dice_count(key) == dice]
+        width = max(len(scoring.LEGAL_KEEPS[key]) for key in rolls)
+        keep_steps = np.zeros((len(rolls), width), dtype=np.int64)
+        keep_left = np.zeros((len(rolls), width), dtype=np.int64)
+        present = np.zeros((len(rolls), width), dtype=bool)
+        for r, key in enumerate(rolls):
+            for k, keep in enumerate(scoring.LEGAL_KEEPS[key]):
+                keep_steps[r, k] = scoring.SCORE[keep] // STEP
+                keep_left[r, k] = dice - scoring.dice_count(keep)
+                present[r, k] = True
+        layouts[dice] = (
+            np.array([ROLL_INDEX[key] for key in rolls]),
+            np.array([scoring.SCORE[key] // STEP for key in rolls]),
+            np.array([roll_probability(key) for key in rolls]),
+            keep_steps, keep_left, present,
+        )
+
+    for turn in range(size - 1, -1, -1):
+        for dice in range(1, DICE_COUNT + 1):
+            roll_ids, roll_steps, probability, keep_steps, keep_left, present = layouts[dice]
+            # Value of each keep for every banked score, shape (banked, rolls, keeps)
+            landing = np.minimum(turn + keep_steps, size)
+            options = after_keep[:, landing, keep_left]
+            options[:, ~present] = -1.0
+            best = options.argmax(axis=2)
+            best_value = np.take_along_axis(options, best[:, :, None], axis=2)[:, :, 0]
+            # Farkles score nothing and so does a roll that would go past the target
+            scores = (roll_steps > 0) & (banked + turn + roll_steps <= size - 1)
+            values[:, turn, dice] = (best_value * scores * probability).sum(axis=1)
+            keeps[:, turn, roll_ids] = best
+        values[:, turn, 0] = values[:, turn, DICE_COUNT]
+
+        # Column 0 is hot dice, where all six come back to roll again
+        rolling = values[:, turn, :].copy()
+        banking = np.where(can_stop[:, turn], stop_value[0, turn], -1.0)
+        after_keep[:, turn, :] = np.maximum(rolling, banking[:, None])
+
+    # States past the target can't be reached
+    unreachable = banked + np.arange(size)[None, :] > size - 1
+    values[unreachable] = 0
+    keeps[unreachable] = 0
+    return values, keeps
+
+
+def save(path, values, keeps, target=WIN_SCORE, entry=ENTRY_SCORE):
+    """
+    Write solved tables to a binary file
+    Args:
+        path (str): file to write
+        values (ndarray): roll values from solve
+        keeps (ndarray): best keep indices from solve
+        target (int): target score the tables were solved for
+        entry (int): entry score the tables were solved for
+    """
+    size = values.shape[0]
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, STEP, target, entry, size, DICE_COUNT + 1, len(scoring.ROLLS)))
+        f.write(values.astype(np.float32).tobytes())
+        f.write(keeps.astype(np.uint8).tobytes())
+
+
+class OptimalTable:
+    """
+    Memory-mapped solved table answering optimal play questions
+
+    Lookups index straight into the mapped file, so loading is instant and
+    the pages are shared between processes using the same file.
+    """
+    def __init__(self, path=TABLE_FILE):
+        """
+        Map a solved table file
+        Args:
+            path (str): file written by save
+        """
+        with open(path, "rb") as f:
+            magic, step, target, entry, size, dice, rolls = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or step != STEP or rolls != len(scoring.ROLLS):
+            raise ValueError(f"{path} is not a solved table for these rules")
+        self.path = path
+        self.target = target
+        self.entry = entry
+        self.values = np.memmap(path, dtype=np.float32, mode="r", offset=HEADER.size,
+                                shape=(size, size, dice))
+        self.keeps = np.memmap(path, dtype=np.uint8, mode="r",
+                               offset=HEADER.size + self.values.nbytes,
+                               shape=(size, size, rolls))
+
+    @classmethod
+    def load(cls, path=TABLE_FILE):
+        """Map the table at path, solving and writing it first if it doesn't exist"""
+        if not os.path.exists(path):
+            values, keeps = solve()
+            save(path, values, keeps)
+        return cls(path)
+
+    def roll_value(self, banked, turn_score, dice):
+        """Expected score banked this turn by rolling that many dice (0 for all six)"""
+        return float(self.values[banked // STEP, turn_score // STEP, dice])
+
+    def can_stop(self, banked, turn_score):
+        """Check if banking is allowed"""
+        return banked >= self.entry or turn_score >= self.entry
+
+    def should_stop(self, banked, turn_score, dice):
+        """Check if banking now beats rolling the remaining dice"""
+        return (self.can_stop(banked, turn_score) and
+                turn_score >= self.roll_value(banked, turn_score, dice))
+
+    def best_keep(self, banked, turn_score, roll):
+        """
+        Best keep out of a roll
+        Args:
+            banked (int): current player's banked score
+            turn_score (int): turn score before keeping
+            roll (int): packed histogram key of the roll
+        Returns:
+            int: packed key of the dice to keep
+        """
+        index = self.keeps[banked // STEP, turn_score // STEP, ROLL_INDEX[roll]]
+        return scoring.LEGAL_KEEPS[roll][index]
+
+    def should_take_previous(self, banked, offer, offer_dice):
+        """Check if starting with the previous player's score beats a fresh turn"""
+        return self.roll_value(banked, offer, offer_dice) > self.roll_value(banked, 0, DICE_COUNT)
+
+
+class OptimalStrategy:
+    """Batch strategy for simulate.py that plays from a solved table"""
+    def __init__(self, table=None):
+        """
+        Initialize the strategy
+        Args:
+            table (OptimalTable): solved table, the default file if not given
+        """
+        self.table = table if table is not None else OptimalTable.load()
+        self.name = "optimal"
+        # Keep key for every (roll index, keep index) so batches never loop in Python
+        width = max(len(keeps) for keeps in scoring.LEGAL_KEEPS)
+        self.keep_keys = np.zeros((len(scoring.ROLLS), width), dtype=np.int64)
+        for r, key in enumerate(scoring.ROLLS):
+            for k, keep in enumerate(scoring.LEGAL_KEEPS[key]):
+                self.keep_keys[r, k] = keep
+        self.roll_index = np.zeros(scoring.TABLE_SIZE, dtype=np.int64)
+        self.roll_index[list(ROLL_INDEX)] = list(ROLL_INDEX.values())
+
+    def take_previous(self, offer, offer_dice, banked):
+        """Take the previous player's score when rolling on from it is worth more"""
+        values = self.table.values
+        return (values[banked // STEP, offer // STEP, offer_dice] >
+                values[banked // STEP, 0, DICE_COUNT])
+
+    def keep(self, roll, turn_score, banked, dice_left):
+        """Packed key of the best keep out of each roll"""
+        rolls = self.roll_index[roll]
+        return self.keep_keys[rolls, self.table.keeps[banked // STEP, turn_score // STEP, rolls]]
+
+    def stop(self, turn_score, banked, dice_left):
+        """Bank when that is worth at least as much as rolling on"""
+        return turn_score >= self.table.values[banked // STEP, turn_score // STEP, dice_left]
+
+
+def main():
+    """Solve the optimal strategy and write the table file"""
+    parser = argparse.ArgumentParser(description="Solve the optimal turn strategy")
+    parser.add_argument("--output", default=TABLE_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    values, keeps = solve()
+    save(args.output, values, keeps)
+    print(f"Solved in {time.perf_counter() - start:.1f}s, "
+          f"expected first turn score {values[0, 0, DICE_COUNT]:.1f} "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB written to {args.output})")
+
+
+if __name__ == "__main__":
+    main()
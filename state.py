@@ -0,0 +1,172 @@
+from engine import BUST, FARKLE, Engine
+from scoring import dice_count, pack, unpack
+
+# Every score in the game is a multiple of 50, so scores are packed as steps
+STEP = 50
+SCORE_BITS = 8  # Up to 12750, room past the target for a score about to bust
+PENDING = (None, FARKLE, BUST)
+
+# (name, width in bits) of each field, from the lowest bits up. Scores follow, one per player.
+FIELDS = (
+    ("dice", 18),  # Histogram key of the active dice, see scoring.pack
+    ("turn", SCORE_BITS),
+    ("kept", 3),  # Dice kept this turn
+    ("previous_turn", SCORE_BITS),
+    ("previous_dice", 3),
+    ("previous_kept", 3),
+    ("must_roll", 1),
+    ("has_rolled", 1),
+    ("can_keep", 1),
+    ("game_over", 1),
+    ("pending", 2),  # Index into PENDING
+    ("current_player", 3),
+    ("player_count", 3),
+)
+
+
+def _layout():
+    """Bit offset and mask of every field"""
+    layout = {}
+    offset = 0
+    for name, width in FIELDS:
+        layout[name] = (offset, (1 << width) - 1)
+        offset += width
+    return layout, offset
+
+
+LAYOUT, SCORES_OFFSET = _layout()
+SCORE_MASK = (1 << SCORE_BITS) - 1
+# Offsets of the fields, for packing without looking them up
+(TURN, KEPT, PREVIOUS_TURN, PREVIOUS_DICE, PREVIOUS_KEPT, MUST_ROLL, HAS_ROLLED, CAN_KEEP,
+ GAME_OVER, PENDING_BITS, CURRENT_PLAYER, PLAYER_COUNT) = (LAYOUT[name][0] for name, _ in FIELDS[1:])
+
+
+def _field(name):
+    """Read-only property decoding one packed field"""
+    offset, mask = LAYOUT[name]
+    return property(lambda self: int(self) >> offset & mask)
+
+
+def _flag(name):
+    """Read-only property decoding one packed true/false field"""
+    offset, _ = LAYOUT[name]
+    return property(lambda self: bool(int(self) >> offset & 1))
+
+
+class State(int):
+    """
+    Rules state of a game packed into one immutable integer
+
+    Holds the scores, the turn score, the active dice as a histogram, how
+    many dice are kept, the previous player's offer and whose turn it is:
+    everything the rules look at, in a few bytes instead of a live Engine or
+    Game. Being an int, hashing and comparing are as cheap as they get and
+    copying is free, so solvers, transposition tables and replays can keep
+    millions of them.
+
+    Which faces were kept never matters to the rules, only how many, so
+    kept dice are stored as a count. The order of the active dice isn't
+    stored either, since any order of the same faces plays the same.
+    """
+    __slots__ = ()
+
+    dice = _field("dice")
+    kept_count = _field("kept")
+    previous_dice_count = _field("previous_dice")
+    previous_kept_count = _field("previous_kept")
+    must_roll = _flag("must_roll")
+    has_rolled = _flag("has_rolled")
+    can_keep = _flag("can_keep")
+    game_over = _flag("game_over")
+    current_player = _field("current_player")
+    player_count = _field("player_count")
+
+    @classmethod
+    def of(cls, game):
+        """
+        Pack the rules state of an engine
+        Args:
+            game: engine.Engine, or anything with the same state
+        Returns:
+            State
+        """
+        number = (pack(game.dice) |
+                  game.turn_score // STEP << TURN |
+                  len(game.kept) << KEPT |
+                  game.previous_turn_score // STEP << PREVIOUS_TURN |
+                  game.previous_dice_count << PREVIOUS_DICE |
+                  len(game.previous_kept) << PREVIOUS_KEPT |
+                  game.must_roll << MUST_ROLL |
+                  game.has_rolled << HAS_ROLLED |
+                  game.can_keep << CAN_KEEP |
+                  game.game_over << GAME_OVER |
+                  PENDING.index(game.pending) << PENDING_BITS |
+                  game.current_player << CURRENT_PLAYER |
+                  game.player_count << PLAYER_COUNT)
+        shift = SCORES_OFFSET
+        for score in game.scores:
+            number |= score // STEP << shift
+            shift += SCORE_BITS
+        return cls(number)
+
+    @property
+    def scores(self):
+        number = int(self) >> SCORES_OFFSET
+        return tuple((number >> (player * SCORE_BITS) & SCORE_MASK) * STEP
+                     for player in range(self.player_count))
+
+    @property
+    def turn_score(self):
+        offset, mask = LAYOUT["turn"]
+        return (int(self) >> offset & mask) * STEP
+
+    @property
+    def previous_turn_score(self):
+        offset, mask = LAYOUT["previous_turn"]
+        return (int(self) >> offset & mask) * STEP
+
+    @property
+    def pending(self):
+        offset, mask = LAYOUT["pending"]
+        return PENDING[int(self) >> offset & mask]
+
+    @property
+    def dice_count(self):
+        return dice_count(self.dice)
+
+    @property
+    def winner(self):
+        return self.current_player if self.game_over else None
+
+    def engine(self, rng=None, log=None, ruleset=None):
+        """
+        Engine to play on from this state
+        Args:
+            rng: random.Random for the engine's rolls
+            log: replay.EventLog for the engine to record into
+            ruleset (RuleSet): rules the state was played under, classic if not given
+        Returns:
+            Engine: active dice in face order, kept dice as ones
+        """
+        game = Engine(self.player_count, rng, log, ruleset)
+        game.scores = list(self.scores)
+        game.current_player = self.current_player
+        game.turn_score = self.turn_score
+        counts = unpack(self.dice)
+        game.dice = tuple(face for face in range(1, 7) for _ in range(counts[face]))
+        game.kept = (1,) * self.kept_count
+        game.must_roll = self.must_roll
+        game.has_rolled = self.has_rolled
+        game.can_keep = self.can_keep
+        game.pending = self.pending
+        game.previous_turn_score = self.previous_turn_score
+        game.previous_dice_count = self.previous_dice_count
+        game.previous_kept = (1,) * self.previous_kept_count
+        game.game_over = self.game_over
+        game.winner = self.winner
+        return game
+
+    def __repr__(self):
+        return (f"State(scores={self.scores}, player={self.current_player}, turn={self.turn_score}, "
+                f"dice={self.dice_count}, kept={self.kept_count})")
+
@@ -0,0 +1,46 @@
+import os
+import sys
+import pytest
+
+# The modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import ROLLED  # noqa: E402
+from state import State  # noqa: E402
+
+
+def play_out(game, stop_at=300, states=None):
+    """
+    Play an engine to the end, keeping every scoring die, banking at stop_at
+    and taking any offer of at least stop_at
+    Args:
+        game (Engine): engine to play on
+        stop_at (int): turn score to bank at
+        states (list): if given, the State after every action is appended to it
+    Returns:
+        Engine: the finished game
+    """
+    def record():
+        if states is not None:
+            states.append(State.of(game))
+
+    target = game.ruleset.target
+    while not game.game_over:
+        if game.can_take_previous() and game.previous_turn_score >= stop_at:
+            game.take_previous()
+            record()
+        if game.roll() == ROLLED:
+            record()
+            game.keep(game.scoring_mask())
+        record()
+        banked = game.scores[game.current_player]
+        if (game.turn_score >= stop_at or banked + game.turn_score == target) and game.can_end_turn():
+            game.end_turn()
+            record()
+    return game
+
+
+@pytest.fixture
+def play():
+    """play_out, for tests that need whole games"""
+    return play_out
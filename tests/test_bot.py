@@ -0,0 +1,53 @@
+import random
+import time
+from bot import ExpectimaxBot
+from engine import KEPT, ROLLED, Engine
+from jobs import Worker
+from replay import EventLog
+from state import State
+
+
+def rolled_game(tmp_path):
+    """Two player game with a log, part way into a turn and waiting for a keep"""
+    game = Engine(2, random.Random(5), EventLog(str(tmp_path / "games.log")))
+    game.scores[0] = 2000
+    assert game.roll(values=[1, 5, 2, 3, 4, 6]) == ROLLED
+    return game
+
+
+def test_playing_on_doesnt_reach_a_snapshot(tmp_path, play):
+    game = rolled_game(tmp_path)
+    snapshot = game.snapshot()
+    before = (State.of(snapshot), list(snapshot.scores), snapshot.dice, snapshot.kept)
+    assert snapshot.log is None and snapshot.scores is not game.scores
+    assert game.keep(0b000011) == KEPT
+    play(game)
+    game.log.close()
+    assert game.game_over
+    assert (State.of(snapshot), snapshot.scores, snapshot.dice, snapshot.kept) == before
+
+
+def test_playing_on_a_snapshot_doesnt_reach_the_game(tmp_path):
+    game = rolled_game(tmp_path)
+    before = State.of(game)
+    snapshot = game.snapshot()
+    assert snapshot.keep(0b111111) == KEPT
+    snapshot.end_turn()
+    assert snapshot.scores[0] == 3500
+    assert State.of(game) == before and game.scores == [2000, 0]
+    game.log.close()
+
+
+def test_bot_thinks_about_the_snapshot_while_the_game_moves_on(tmp_path, play):
+    game = rolled_game(tmp_path)
+    snapshot = game.snapshot()
+    job = Worker("test").submit(ExpectimaxBot().act, snapshot)
+    game.keep(0b000001)
+    play(game)  # Changes the live engine while the bot may still be searching
+    game.log.close()
+    deadline = time.monotonic() + 10
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    action, mask = job.result
+    assert action == "keep" and snapshot.is_valid_selection(mask)
+    assert snapshot.dice == (1, 5, 2, 3, 4, 6)
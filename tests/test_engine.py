@@ -0,0 +1,128 @@
+import random
+import pytest
+from engine import BUST, ENDED, FARKLE, KEPT, ROLLED, TOOK_PREVIOUS, WON, Engine, selection_score
+from ruleset import CLASSIC
+
+
+def test_turn_below_entry_score_cannot_be_banked():
+    game = Engine(2)
+    assert game.roll(values=[1, 2, 3, 3, 4, 6]) == ROLLED
+    assert game.keep(0b000001) == KEPT
+    assert game.turn_score == 100
+    assert not game.can_end_turn()
+    assert game.end_turn() is None
+
+    assert game.roll(values=[1, 1, 1, 2, 3]) == ROLLED
+    assert game.keep(0b00111) == KEPT
+    assert game.turn_score == CLASSIC.entry + 100
+    assert game.end_turn() == ENDED
+    assert game.scores == [CLASSIC.entry + 100, 0]
+    assert game.current_player == 1
+
+
+def test_entered_player_banks_any_score():
+    game = Engine(2)
+    game.scores[0] = CLASSIC.entry
+    game.roll(values=[5, 2, 3, 3, 4, 6])
+    game.keep(0b000001)
+    assert game.end_turn() == ENDED
+    assert game.scores[0] == CLASSIC.entry + 50
+
+
+def test_farkle_ends_the_turn_with_nothing():
+    game = Engine(2)
+    assert game.roll(values=[2, 3, 4, 6, 2, 3]) == FARKLE
+    assert game.scores == [0, 0]
+    assert game.current_player == 1
+    assert len(game.dice) == CLASSIC.dice
+
+
+def test_roll_that_could_overshoot_the_target_busts():
+    game = Engine(2)
+    game.scores[0] = CLASSIC.target - 100
+    assert game.roll(values=[1, 1, 1, 2, 3, 4]) == BUST
+    assert game.scores == [CLASSIC.target - 100, 0]
+    assert game.current_player == 1
+
+
+def test_hitting_the_target_exactly_wins():
+    game = Engine(2)
+    game.scores[0] = CLASSIC.target - 150
+    assert game.roll(values=[1, 5, 2, 2, 3, 4]) == ROLLED
+    assert game.keep(0b000011) == KEPT
+    assert game.end_turn() == WON
+    assert game.game_over and game.winner == 0
+    assert game.scores[0] == CLASSIC.target
+    assert game.roll() is None
+
+
+def test_keeping_every_die_gives_them_all_back():
+    game = Engine(2, random.Random(1))
+    game.roll(values=[1, 1, 1, 5, 5, 5])
+    assert game.keep(0b111111) == KEPT
+    assert game.dice == () and len(game.kept) == 6
+    assert game.roll(values=[1, 2, 3, 3, 4, 6]) == ROLLED
+    assert len(game.dice) == 6 and game.kept == ()
+    assert game.turn_score == 1500
+
+
+def test_hot_dice_that_could_overshoot_bust():
+    game = Engine(2)
+    game.scores[0] = CLASSIC.target - 1500
+    game.roll(values=[1, 1, 1, 5, 5, 5])
+    game.keep(0b111111)
+    assert game.roll() == BUST
+    assert game.scores[0] == CLASSIC.target - 1500
+
+
+def bank_three_ones(game):
+    """Have the current player keep three ones and bank them, leaving three dice"""
+    game.roll(values=[1, 1, 1, 2, 3, 4])
+    game.keep(0b000111)
+    assert game.end_turn() == ENDED
+
+
+def test_take_previous_carries_on_the_last_turn():
+    game = Engine(2)
+    game.scores[1] = CLASSIC.entry
+    bank_three_ones(game)
+    assert game.previous_turn_score == 1000 and game.previous_dice_count == 3
+    assert game.can_take_previous()
+    assert game.take_previous() == TOOK_PREVIOUS
+    assert game.turn_score == 1000
+    assert len(game.dice) == 3 and len(game.kept) == 3
+    assert not game.can_take_previous()
+    assert game.roll(values=[2, 3, 4]) == FARKLE
+    assert game.scores == [1000, CLASSIC.entry]
+    assert game.previous_turn_score == 0
+
+
+def test_take_previous_needs_the_entry_score():
+    game = Engine(2)
+    bank_three_ones(game)
+    assert not game.can_take_previous()
+    assert game.take_previous() is None
+
+
+def test_take_previous_needs_room_below_the_target():
+    game = Engine(2)
+    game.scores[1] = CLASSIC.target - 1000
+    bank_three_ones(game)
+    assert not game.can_take_previous()
+
+
+@pytest.mark.parametrize("mask", [0, -1, 0b1000000, 0b1000001, 0b000010, 0b000110])
+def test_keep_refuses_bad_masks(mask):
+    game = Engine(2)
+    game.roll(values=[1, 2, 3, 3, 4, 6])
+    assert game.keep(mask) is None
+    game.keep_masks()  # The cached masks have to agree
+    assert game.keep(mask) is None
+    assert selection_score(game.dice, mask) is None
+    assert game.can_keep and game.turn_score == 0
+
+
+def test_seeded_games_are_repeatable(play):
+    first = play(Engine(3, random.Random(7)))
+    second = play(Engine(3, random.Random(7)))
+    assert first.scores == second.scores and first.winner == second.winner
@@ -0,0 +1,87 @@
+import random
+import sqlite3
+import threading
+from engine import Engine
+from history import GameRecorder, HistoryStore, leaderboard, player_stats, recompute_ratings
+from ruleset import CLASSIC, RuleSet
+
+SHORT = RuleSet("Short Game", target=5000, entry=500)
+
+
+def record_games(path, ruleset, names, games, play):
+    """Record games between the named players, seeded 0 up"""
+    store = HistoryStore(path)
+    for seed in range(games):
+        recorder = GameRecorder(store, names)
+        recorder.start_game(len(names), seed)
+        game = Engine(len(names), random.Random(seed), recorder, ruleset)
+        recorder.attach(game)
+        play(game)
+    store.close()
+
+
+def test_stats_and_ratings_are_kept_per_rule_set(tmp_path, play):
+    path = str(tmp_path / "history.db")
+    record_games(path, CLASSIC, ["Ann", "Bob"], 3, play)
+    record_games(path, SHORT, ["Ann", "Cy"], 2, play)
+
+    classic = player_stats(path, ["Ann", "Bob", "Cy"])
+    short = player_stats(path, ["Ann", "Bob", "Cy"], SHORT.name)
+    assert {name: row["games"] for name, row in classic.items()} == {"Ann": 3, "Bob": 3}
+    assert {name: row["games"] for name, row in short.items()} == {"Ann": 2, "Cy": 2}
+    assert sum(row["wins"] for row in short.values()) == 2
+
+    assert sorted(name for name, _, _ in leaderboard(path)) == ["Ann", "Bob"]
+    board = leaderboard(path, SHORT.name)
+    assert sorted((name, games) for name, _, games in board) == [("Ann", 2), ("Cy", 2)]
+
+    # Rating everything again from scratch gives what was rated as games finished
+    assert recompute_ratings(path) == 5
+    assert leaderboard(path, SHORT.name) == board
+
+
+def test_missing_database_has_no_stats(tmp_path):
+    path = str(tmp_path / "missing.db")
+    assert player_stats(path, ["Ann"]) == {}
+    assert leaderboard(path) == []
+
+
+def finishes(call, timeout=5.0):
+    """Run call on a thread, the exception it raised if it finished in time, raising if it hangs"""
+    outcome = []
+
+    def run():
+        try:
+            call()
+            outcome.append(None)
+        except Exception as error:
+            outcome.append(error)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert outcome, f"{call} hung"
+    return outcome[0]
+
+
+def test_failed_batch_is_reported_and_the_writer_carries_on(tmp_path, play):
+    path = str(tmp_path / "history.db")
+    store = HistoryStore(path, flush_interval=0.01)
+    store.write("games", (1, 2))  # Too few columns
+    assert isinstance(finishes(store.flush), sqlite3.Error)
+    assert finishes(store.flush) is None  # Reported once
+
+    recorder = GameRecorder(store, ["Ann", "Bob"])
+    recorder.start_game(2, 0)
+    game = Engine(2, random.Random(0), recorder)
+    recorder.attach(game)
+    play(game)
+    assert finishes(store.close) is None
+    assert player_stats(path, ["Ann", "Bob"])["Ann"]["games"] == 1
+
+
+def test_unopenable_database_does_not_hang(tmp_path):
+    store = HistoryStore(str(tmp_path))  # A directory, not a database file
+    store.write("games", (1, 2, 2, "Ann", 0.0, CLASSIC.name))
+    assert isinstance(finishes(store.flush), sqlite3.Error)
+    store.write("games", (2, 2, 2, "Ann", 0.0, CLASSIC.name))
+    assert isinstance(finishes(store.close), sqlite3.Error)
@@ -0,0 +1,49 @@
+import json
+from fractions import Fraction
+import pytest
+import odds
+from ruleset import CLASSIC, RuleSet
+
+NO_STRAIGHT = RuleSet("No Straight", straight=0).compile()
+
+
+def test_six_dice_farkle_odds():
+    assert odds.farkle_probability(6) == Fraction(5, 216)  # 1 in 43.2
+    assert sum(odds.score_distribution(6).values()) == 1
+
+
+def test_saved_odds_load_back_exactly(tmp_path):
+    path = str(tmp_path / "odds.json")
+    odds.save(path)
+    expected = {dice: dict(odds.score_distribution(dice)) for dice in range(1, CLASSIC.dice + 1)}
+    odds._DISTRIBUTIONS.clear()
+    odds.load(path)
+    assert {dice: odds.score_distribution(dice) for dice in expected} == expected
+
+
+def test_odds_for_other_rules_are_refused(tmp_path):
+    path = str(tmp_path / "odds.json")
+    odds.save(path, NO_STRAIGHT)
+    with pytest.raises(ValueError):
+        odds.load(path)
+    with open(path) as f:
+        data = json.load(f)
+    del data["rules"]  # Files from before the rules were recorded
+    with open(path, "w") as f:
+        json.dump(data, f)
+    with pytest.raises(ValueError):
+        odds.load(path, NO_STRAIGHT)
+
+
+def test_loading_leaves_other_rules_alone(tmp_path):
+    path = str(tmp_path / "odds.json")
+    odds.save(path, NO_STRAIGHT)
+    classic = odds.score_distribution(6)
+    classic_bust = odds.bust_probability(6, CLASSIC.target - 300, 0)
+    odds.bust_probability(6, NO_STRAIGHT.target - 300, 0, NO_STRAIGHT)
+    odds.load(path, NO_STRAIGHT)
+    assert odds.score_distribution(6) is classic
+    assert (CLASSIC.tables_key, 6, 300) in odds._BUSTS
+    assert odds.bust_probability(6, CLASSIC.target - 300, 0) == classic_bust
+    assert not any(key[0] == NO_STRAIGHT.tables_key for key in odds._BUSTS)
+    assert odds.score_distribution(6, NO_STRAIGHT) != classic  # A straight scores 1500 only classically
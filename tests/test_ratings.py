@@ -0,0 +1,43 @@
+import pytest
+from ratings import K_FACTOR, START_RATING, Ratings, placements, random_games, recompute
+
+
+def test_placements():
+    assert placements([10000, 4000]) == [1.0, 0.0]
+    assert placements([3000, 10000, 3000]) == [0.25, 1.0, 0.25]
+
+
+def test_even_game_moves_ratings_by_half_k():
+    ratings = Ratings()
+    changed = ratings.update(["a", "b"], [10000, 2000])
+    assert changed == [("a", START_RATING + K_FACTOR / 2, 1), ("b", START_RATING - K_FACTOR / 2, 1)]
+
+
+def test_upset_moves_ratings_more():
+    ratings = Ratings()
+    ratings.ratings.update(strong=1700.0, weak=1300.0)
+    ratings.update(["strong", "weak"], [3000, 10000])
+    gain = ratings.rating("weak") - 1300.0
+    assert gain == pytest.approx(K_FACTOR * (1 - 1 / 11))
+    assert ratings.rating("strong") == pytest.approx(1700.0 - gain)
+
+
+def test_rating_points_are_conserved():
+    ratings = Ratings()
+    for scores in ([10000, 500, 7000], [2000, 10000, 2000], [10000, 9000, 100]):
+        ratings.update(["a", "b", "c"], scores)
+    assert sum(ratings.rating(name) for name in "abc") == pytest.approx(3 * START_RATING)
+    assert [name for name, _, _ in ratings.leaderboard()][0] == "a"
+
+
+@pytest.mark.parametrize("players, games", [(8, 2000), (500, 5000)])  # Rated in order and in waves
+def test_recompute_matches_updating_game_by_game(players, games):
+    np = pytest.importorskip("numpy")
+    seats, scores = random_games(np.random.default_rng(2), games, players)
+    ratings, played = recompute(seats, scores, players)
+    one_by_one = Ratings()
+    for row, row_scores in zip(seats.tolist(), scores.tolist()):
+        one_by_one.update([p for p in row if p >= 0], [s for p, s in zip(row, row_scores) if p >= 0])
+    for player in range(players):
+        assert ratings[player] == pytest.approx(one_by_one.rating(player))
+        assert played[player] == one_by_one.games.get(player, 0)
@@ -0,0 +1,54 @@
+import random
+import pytest
+from engine import Engine
+from replay import (END_TURN, KEEP, ROLL, TAKE_PREVIOUS, EventLog, pack_faces, read_games, replay_game,
+                    unpack_faces)
+
+
+@pytest.mark.parametrize("values", [[], [1], [6, 6, 6, 6, 6, 6], [1, 2, 3, 4, 5, 6], [5, 3, 1]])
+def test_faces_round_trip(values):
+    number = pack_faces(values)
+    assert number < 1 << 16
+    assert unpack_faces(number, len(values)) == values
+
+
+def test_log_replays_every_game(tmp_path, play):
+    path = tmp_path / "games.log"
+    log = EventLog(str(path))
+    finished = []
+    for seed in range(3):
+        log.start_game(2 + seed, seed)
+        finished.append(play(Engine(2 + seed, random.Random(seed), log)))
+    log.close()
+
+    games = read_games(str(path))
+    assert [(players, seed) for players, seed, _ in games] == [(2, 0), (3, 1), (4, 2)]
+    for (players, _, actions), game in zip(games, finished):
+        assert {action for action, _ in actions} <= {ROLL, KEEP, END_TURN, TAKE_PREVIOUS}
+        again = replay_game(players, actions)
+        assert again.scores == game.scores and again.winner == game.winner
+
+
+def test_log_appends_to_an_existing_file(tmp_path):
+    path = str(tmp_path / "games.log")
+    for seed in (1, 2):
+        log = EventLog(path)
+        log.start_game(2, seed)
+        log.roll([1, 1, 1, 2, 3, 4])
+        log.keep(0b000111)
+        log.close()
+    games = read_games(path)
+    assert [seed for _, seed, _ in games] == [1, 2]
+    assert games[1][2] == [(ROLL, [1, 1, 1, 2, 3, 4]), (KEEP, 0b000111)]
+
+
+def test_foreign_file_is_refused(tmp_path):
+    path = tmp_path / "other.log"
+    path.write_bytes(b"not a game log")
+    with pytest.raises(ValueError):
+        read_games(str(path))
+
+
+def test_replay_refuses_illegal_actions():
+    with pytest.raises(ValueError):
+        replay_game(2, [(KEEP, 1)])
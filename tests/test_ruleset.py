@@ -0,0 +1,62 @@
+import os
+import random
+import subprocess
+import sys
+import pytest
+from engine import KEPT, ROLLED, Engine, potential_score
+from ruleset import CLASSIC, RuleSet, load_all
+
+SEVEN_DICE = RuleSet("Seven Dice", target=12000, dice=7)
+
+
+def test_variant_rules_score_by_their_own_tables():
+    game = Engine(2, ruleset=SEVEN_DICE)
+    assert len(game.dice) == 7
+    assert game.roll(values=[1, 2, 3, 4, 5, 6, 2]) == ROLLED
+    assert game.keep(0b0111111) == KEPT
+    assert game.turn_score == SEVEN_DICE.straight
+    assert game.dice == (2,)
+
+
+def test_scoring_rules_change_the_tables():
+    no_straight = RuleSet("No Straight", straight=0).compile()
+    assert potential_score([1, 2, 3, 4, 5, 6], no_straight) == 150
+    assert potential_score([1, 2, 3, 4, 5, 6], CLASSIC) == CLASSIC.straight
+
+
+def test_equal_rules_share_tables():
+    first = RuleSet("First", target=5000).compile()
+    second = RuleSet("Second", target=5000).compile()
+    assert first == second and hash(first) == hash(second)
+    assert first.score is second.score is CLASSIC.compile().score
+    assert first != CLASSIC
+
+
+@pytest.mark.parametrize("fields", [{"dice": 8}, {"dice": 0}, {"target": 10025}, {"straight": 1010},
+                                    {"pairs": 4}])
+def test_unplayable_rules_are_refused(fields):
+    with pytest.raises(ValueError):
+        RuleSet("Bad", **fields)
+
+
+def test_rules_round_trip_through_json(tmp_path):
+    rules = RuleSet("Custom", target=8000, entry=500, dice=7, pairs_score=2000)
+    path = str(tmp_path / "custom.json")
+    rules.save(path)
+    loaded = RuleSet.load(path)
+    assert loaded == rules and loaded.name == "Custom"
+    assert load_all(str(tmp_path)) == [rules]
+
+
+def test_bundled_variants_play_to_a_winner(play):
+    for rules in load_all():
+        game = play(Engine(3, random.Random(2), ruleset=rules))
+        assert game.scores[game.winner] == rules.target
+
+
+def test_compile_builds_the_tables_bigger_rolls_need():
+    # A fresh interpreter, so nothing has imported the engine or built its tables yet
+    code = ("import ruleset; ruleset.RuleSet('Seven', dice=7).compile(); import engine; "
+            "assert 7 - engine.LOW_DICE in engine._HALVES")
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   check=True, timeout=60)
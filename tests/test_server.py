@@ -0,0 +1,124 @@
+import asyncio
+import json
+import random
+import socket
+import threading
+import pytest
+from client import RemoteEngine
+from engine import ROLLED, Engine, scoring_mask
+from ruleset import CLASSIC
+from server import MAX_LINE, GameServer
+
+
+@pytest.fixture
+def port():
+    """Port of a GameServer running on a background thread for the test"""
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(GameServer().handle, "127.0.0.1", 0, limit=MAX_LINE))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server.sockets[0].getsockname()[1]
+
+    async def shut_down():
+        server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()  # Connections still open end here, closing their writers
+        await asyncio.gather(*tasks, return_exceptions=True)
+    asyncio.run_coroutine_threadsafe(shut_down(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture
+def connect(port):
+    """Open raw connections to the test server, closed after the test"""
+    clients = []
+
+    def open_client():
+        clients.append(Client(port))
+        return clients[-1]
+    yield open_client
+    for client in clients:
+        client.close()
+
+
+class Client:
+    """Raw line-delimited JSON connection"""
+    def __init__(self, port):
+        self.socket = socket.create_connection(("127.0.0.1", port), timeout=5)
+        self.stream = self.socket.makefile("rwb")
+
+    def send(self, data):
+        self.stream.write(data if isinstance(data, bytes) else json.dumps(data).encode() + b"\n")
+        self.stream.flush()
+
+    def reply(self):
+        return json.loads(self.stream.readline())
+
+    def request(self, data):
+        self.send(data)
+        return self.reply()
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+
+def test_table_is_created_played_and_shared(connect):
+    host, guest = connect(), connect()
+    created = host.request({"op": "create", "players": 2, "seats": 1, "seed": 3, "id": 1})
+    assert created["ok"] and created["id"] == 1 and created["seats"] == [0]
+    table = created["table"]
+    assert guest.request({"op": "join", "table": table})["seats"] == [1]
+    assert not guest.request({"op": "roll", "table": table})["ok"]  # Not their turn
+
+    rolled = host.request({"op": "roll", "table": table})
+    assert rolled["ok"] and len(rolled["state"]["dice"]) == 6
+    update = guest.reply()
+    assert update["event"] == "update" and update["op"] == "roll"
+    assert update["state"]["dice"] == rolled["state"]["dice"]
+
+
+@pytest.mark.parametrize("request_line", [
+    b"not json\n",
+    b"[" * 5000 + b"]" * 5000 + b"\n",  # Nested past the recursion limit
+    b'{"op": "create", "players": 1e999}\n',
+    b'{"op": "create", "players": "3"}\n',
+    b'{"op": "create", "players": 9}\n',
+    b'{"op": "fly", "table": 1}\n',
+    b'{"op": "state", "table": 12345}\n',
+])
+def test_bad_requests_get_an_error_and_keep_the_connection(connect, request_line):
+    client = connect()
+    client.send(request_line)
+    reply = client.reply()
+    assert reply["ok"] is False and reply["error"]
+    assert client.request({"op": "create", "players": 2})["ok"]
+
+
+@pytest.mark.parametrize("size", [MAX_LINE + 10, 5 * MAX_LINE])
+def test_overlong_line_is_skipped_with_an_error(connect, size):
+    client = connect()
+    client.send(b'{"op": "create", "pad": "' + b"x" * size + b'"}\n')
+    reply = client.reply()
+    assert reply["ok"] is False and str(MAX_LINE) in reply["error"]
+    assert client.request({"op": "create", "players": 2, "id": 7})["id"] == 7
+
+
+def test_remote_table_plays_like_a_local_engine(port):
+    remote = RemoteEngine(2, "127.0.0.1", port, seed=5)
+    local = Engine(2, random.Random(5))
+    try:
+        while not local.game_over:
+            for game in (remote, local):
+                if game.roll() == ROLLED:
+                    game.keep(scoring_mask(game.dice))
+                banked = game.scores[game.current_player]
+                if (game.turn_score >= 300 or banked + game.turn_score == CLASSIC.target) and game.can_end_turn():
+                    game.end_turn()
+            assert remote.scores == local.scores and list(remote.dice) == list(local.dice)
+        assert remote.game_over and remote.winner == local.winner
+    finally:
+        remote.close()
@@ -0,0 +1,56 @@
+import itertools
+import random
+import numpy as np
+import simulate
+from engine import ROLLED, Engine, potential_score, selection_score
+from ruleset import CLASSIC
+from scoring import pack
+
+
+def test_tables_score_every_roll_as_the_engine_does():
+    for dice in range(1, CLASSIC.dice + 1):
+        for values in itertools.combinations_with_replacement(range(1, 7), dice):
+            key = pack(values)
+            assert simulate.SCORE[key] == potential_score(values)
+            assert simulate.DICE[key] == dice
+
+
+def test_legal_keeps_match_the_engine():
+    rolls, keeps, scores = [], [], []
+    for values in itertools.combinations_with_replacement(range(1, 7), CLASSIC.dice):
+        for mask in range(1, 1 << len(values)):
+            rolls.append(pack(values))
+            keeps.append(pack([value for i, value in enumerate(values) if mask >> i & 1]))
+            scores.append(selection_score(values, mask) or 0)
+    legal = simulate.legal_keeps(np.array(rolls), np.array(keeps))
+    assert (legal == (np.array(scores) > 0)).all()
+    assert (simulate.SCORE[np.array(keeps)[legal]] == np.array(scores)[legal]).all()
+
+
+def engine_turn(game, stop_at):
+    """Play one turn keeping every scoring die, as ThresholdStrategy's "all" does, returning what it banked"""
+    player = game.current_player
+    banked = game.scores[player]
+    while game.current_player == player and not game.game_over:
+        if game.roll() != ROLLED:
+            break
+        game.keep(game.scoring_mask())
+        if game.must_roll and game.can_end_turn() and game.turn_score >= stop_at:
+            game.end_turn()
+    return game.scores[player] - banked
+
+
+def test_simulated_turns_average_what_engine_turns_do():
+    turns, banked = 20000, CLASSIC.entry
+    simulated = simulate.simulate_turns(turns, simulate.ThresholdStrategy(300), banked=banked,
+                                        rng=np.random.default_rng(3))
+    rng = random.Random(3)
+    played = []
+    for _ in range(turns):
+        game = Engine(2, rng)
+        game.scores[0] = banked
+        played.append(engine_turn(game, 300))
+    # Both means are within a few points of the true one with this many turns
+    assert abs(simulated["score"].mean() - np.mean(played)) < 20
+    farkles = np.mean([score == 0 for score in played])
+    assert abs((simulated["outcome"] == simulate.FARKLED).mean() - farkles) < 0.02
@@ -0,0 +1,63 @@
+import random
+import pytest
+from engine import FARKLE, Engine
+from ruleset import CLASSIC, RuleSet
+from state import State
+
+SEVEN_DICE = RuleSet("Seven Dice", target=12000, dice=7)
+SHORT = RuleSet("Short Game", target=5000, entry=500)
+
+
+def same_position(state, game):
+    """Check a State holds everything the rules look at in an engine"""
+    assert state.scores == tuple(game.scores)
+    assert state.current_player == game.current_player
+    assert state.turn_score == game.turn_score
+    assert state.dice_count == len(game.dice)
+    assert state.kept_count == len(game.kept)
+    assert state.previous_turn_score == game.previous_turn_score
+    assert state.previous_dice_count == game.previous_dice_count
+    assert state.previous_kept_count == len(game.previous_kept)
+    assert (state.must_roll, state.has_rolled, state.can_keep) == (game.must_roll, game.has_rolled, game.can_keep)
+    assert state.pending == game.pending
+    assert state.game_over == game.game_over and state.winner == game.winner
+
+
+@pytest.mark.parametrize("ruleset", [CLASSIC, SEVEN_DICE, SHORT], ids=lambda rules: rules.name)
+def test_every_position_of_a_game_round_trips(play, ruleset):
+    states = []
+    game = Engine(4, random.Random(3), ruleset=ruleset)
+    play(game, states=states)
+    assert game.game_over
+    for state in states:
+        again = State.of(state.engine(ruleset=ruleset))
+        assert again == state
+    same_position(states[-1], game)
+
+
+def test_unpacked_engine_plays_on_the_same():
+    game = Engine(3)
+    game.scores[:] = [2500, CLASSIC.target - 1000, 0]
+    game.current_player = 1
+    game.roll(values=[1, 2, 3, 3, 4, 6])
+    state = State.of(game)
+    same_position(state, game)
+    copy = state.engine()
+    assert sorted(copy.dice) == sorted(game.dice)
+    assert copy.can_keep and copy.is_valid_selection(1 << copy.dice.index(1))
+
+
+def test_pending_result_is_kept():
+    game = Engine(2)
+    game.roll(resolve=False, values=[2, 3, 4, 6, 2, 3])
+    state = State.of(game)
+    assert state.pending == FARKLE
+    assert state.engine().resolve() == FARKLE
+
+
+def test_states_compare_and_hash_as_ints():
+    game = Engine(2)
+    first, second = State.of(game), State.of(Engine(2))
+    assert first == second and hash(first) == hash(second)
+    game.roll(values=[1, 2, 3, 3, 4, 6])
+    assert State.of(game) != first
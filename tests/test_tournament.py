@@ -0,0 +1,53 @@
+import itertools
+import pytest
+from tournament import Tournament
+
+SPECS = ["threshold:200", "threshold:300", "threshold:400", "threshold:500", "threshold:600"]
+
+
+def tournament(entrants, players=2):
+    return Tournament(SPECS[:entrants], players, games=20, workers=1, seed=1)
+
+
+def meet(tournament, *tables):
+    """Record earlier rounds without playing them"""
+    for table in tables:
+        for a, b in itertools.permutations(table, 2):
+            tournament.standings[a].opponents.add(b)
+
+
+def test_tables_avoid_rematches():
+    t = tournament(4)
+    meet(t, (0, 1), (2, 3))
+    tables = t.swiss_tables([0, 1, 2, 3])
+    assert tables == [(0, 2), (1, 3)]  # The best placed still meet the best placed they can
+
+
+def test_tables_back_up_when_the_best_table_strands_the_rest():
+    t = tournament(4)
+    meet(t, (0, 1), (2, 3), (1, 3))
+    assert t.swiss_tables([0, 1, 2, 3]) == [(0, 3), (1, 2)]  # 0 with 2 would leave 1 and 3 to meet again
+
+
+def test_tables_fall_back_to_order_once_everyone_has_met():
+    t = tournament(4)
+    meet(t, *itertools.combinations(range(4), 2))
+    assert t.swiss_tables([3, 1, 0, 2]) == [(3, 1), (0, 2)]
+
+
+def test_byes_go_to_the_lowest_placed_who_have_had_fewest():
+    t = tournament(5)
+    t.swiss(1)
+    assert [s.byes for s in t.standings] == [0, 0, 0, 0, 1]  # Everyone level, so the last entrant sits out
+    assert t.standings[4].games == 0 and t.standings[4].points == 1
+    t.swiss(2)
+    byes = [s.byes for s in t.standings]
+    assert sum(byes) == 3 and max(byes) == 1  # Nobody sits out twice while others haven't
+    for standing in t.standings:
+        # Every match was against someone new
+        assert len(standing.opponents) == 3 - standing.byes
+
+
+def test_swiss_needs_a_full_table():
+    with pytest.raises(ValueError):
+        tournament(2, players=3).swiss(1)
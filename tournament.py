@@ -0,0 +1,292 @@
+import argparse
+import importlib
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import simulate
+from engine import WIN_SCORE
+
+MIN_PLAYERS = 2
+MAX_PLAYERS = 6  # Same range the menu allows
+SCORE_BINS = WIN_SCORE // 50 + 1  # Final scores are histogrammed in steps of 50
+SEARCH_LIMIT = 100000  # Most tables tried when looking for Swiss pairings without rematches
+
+# Strategies already built in this process, keyed by spec
+_strategies = {}
+
+
+def make_strategy(spec):
+    """
+    Build a strategy from its spec string
+    Args:
+        spec (str): "threshold:<stop_at>[:all|fewest]", "optimal", or
+            "<module>:<factory>" for any callable returning a batch strategy
+    Returns:
+        strategy object usable by simulate.play_turns
+    """
+    name, _, args = spec.partition(":")
+    if name == "threshold":
+        stop_at, _, keep = args.partition(":")
+        return simulate.ThresholdStrategy(int(stop_at or 300), keep or "all")
+    if name == "optimal":
+        import solver
+        return solver.OptimalStrategy()
+    if not args:
+        raise ValueError(f"Unknown strategy {spec!r}")
+    return getattr(importlib.import_module(name), args)()
+
+
+def get_strategy(spec):
+    """Strategy for spec, built once per process"""
+    if spec not in _strategies:
+        _strategies[spec] = make_strategy(spec)
+    return _strategies[spec]
+
+
+def play_unit(unit):
+    """
+    Play one chunk of games in a worker process
+    Args:
+        unit (tuple): (seat specs, number of games, SeedSequence for this chunk)
+    Returns:
+        dict: per-seat wins and final score histograms, total turns and games
+    """
+    specs, games, seed = unit
+    strategies = [get_strategy(spec) for spec in specs]
+    results = simulate.simulate_games(games, strategies, np.random.default_rng(seed))
+    winner = results["winner"]
+    histograms = np.zeros((len(specs), SCORE_BINS), dtype=np.int64)
+    for seat in range(len(specs)):
+        histograms[seat] = np.bincount(results["scores"][:, seat] // 50, minlength=SCORE_BINS)
+    return {
+        "wins": np.bincount(winner[winner >= 0], minlength=len(specs)),
+        "histograms": histograms,
+        "turns": int(results["turns"].sum()),
+        "games": games,
+    }
+
+
+class Standing:
+    """Merged results for one entrant across every game it played"""
+    def __init__(self, spec):
+        self.spec = spec
+        self.games = 0
+        self.wins = 0
+        self.turns = 0
+        self.points = 0  # Match points, one per entrant beaten at a table
+        self.opponents = set()  # Entrants it has sat at a table with
+        self.byes = 0  # Swiss rounds it sat out
+        self.histogram = np.zeros(SCORE_BINS, dtype=np.int64)
+
+    @property
+    def win_rate(self):
+        return self.wins / self.games if self.games else 0.0
+
+    @property
+    def mean_game_length(self):
+        return self.turns / self.games if self.games else 0.0
+
+    def score_percentile(self, q):
+        """Final score at percentile q (0-100) of this entrant's games"""
+        if not self.games:
+            return 0
+        cumulative = np.cumsum(self.histogram)
+        return int(np.searchsorted(cumulative, q / 100 * cumulative[-1])) * 50
+
+
+class Tournament:
+    """
+    Matches between strategies spread over every core
+
+    A match seats a table of strategies and plays its games in every seat
+    rotation, so no entrant keeps the first-player advantage. Games are split
+    into chunks that each get their own RNG stream from one SeedSequence,
+    so results don't depend on how chunks land on workers.
+    """
+    def __init__(self, specs, players, games, chunk=20000, workers=None, seed=None):
+        """
+        Initialize the tournament
+        Args:
+            specs (list): strategy spec of each entrant
+            players (int): seats per table, 2 to 6
+            games (int): games per match
+            chunk (int): games per work unit
+            workers (int): worker processes, one per core if not given
+            seed (int): seed for every RNG stream in the tournament
+        """
+        if not MIN_PLAYERS <= players <= MAX_PLAYERS:
+            raise ValueError(f"Player count must be {MIN_PLAYERS}-{MAX_PLAYERS}")
+        if len(set(specs)) < 2:
+            raise ValueError("A tournament needs at least two different strategies")
+        for spec in specs:
+            get_strategy(spec)  # Fail early, and make sure solved tables exist before forking
+        self.standings = [Standing(spec) for spec in specs]
+        self.players = players
+        self.games = games
+        self.chunk = chunk
+        self.workers = workers or os.cpu_count()
+        self.seeds = np.random.SeedSequence(seed)
+
+    def match_units(self, table):
+        """Work units for one match between the entrants at table"""
+        rotations = [table[i:] + table[:i] for i in range(len(table))]
+        per_rotation = max(1, self.games // len(rotations))
+        units = []
+        for seats in rotations:
+            for first in range(0, per_rotation, self.chunk):
+                games = min(self.chunk, per_rotation - first)
+                units.append((seats, games, self.seeds.spawn(1)[0]))
+        return units
+
+    def play_matches(self, executor, tables):
+        """
+        Play a list of matches and merge their results into the standings
+        Args:
+            executor: ProcessPoolExecutor running the games
+            tables (list): tuples of entrant indices, one per match
+        Returns:
+            list: dicts of wins by entrant, one per match
+        """
+        units = []
+        owners = []
+        for m, table in enumerate(tables):
+            for seats, games, seed in self.match_units(table):
+                units.append(([self.standings[i].spec for i in seats], games, seed))
+                owners.append((m, seats))
+
+        for table in tables:
+            for entrant in table:
+                self.standings[entrant].opponents.update(table)
+                self.standings[entrant].opponents.discard(entrant)
+
+        match_wins = [dict.fromkeys(table, 0) for table in tables]
+        for (m, seats), result in zip(owners, executor.map(play_unit, units)):
+            for seat, entrant in enumerate(seats):
+                standing = self.standings[entrant]
+                standing.games += result["games"]
+                standing.wins += int(result["wins"][seat])
+                standing.turns += result["turns"]
+                standing.histogram += result["histograms"][seat]
+                match_wins[m][entrant] += int(result["wins"][seat])
+
+        # One match point for every entrant at the table beaten on wins
+        for wins in match_wins:
+            for entrant, count in wins.items():
+                self.standings[entrant].points += sum(count > other for other in wins.values())
+        return match_wins
+
+    def round_robin(self):
+        """Play every table of entrants once"""
+        entrants = range(len(self.standings))
+        if len(entrants) >= self.players:
+            tables = list(itertools.combinations(entrants, self.players))
+        else:
+            # Fewer entrants than seats, so some sit more than once at a table
+            tables = [t for t in itertools.combinations_with_replacement(entrants, self.players)
+                      if len(set(t)) > 1]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            self.play_matches(executor, tables)
+        return self.ranking()
+
+    def swiss(self, rounds):
+        """
+        Play rounds of matches between entrants on similar points
+
+        Every table is full. Entrants left over when the field doesn't
+        divide into tables sit the round out with a bye, worth as much as
+        beating everyone at a table, going to the lowest placed entrants
+        who have had the fewest byes.
+        Args:
+            rounds (int): number of rounds
+        """
+        if len(self.standings) < self.players:
+            raise ValueError("Swiss rounds need at least as many entrants as seats")
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for _ in range(rounds):
+                order = sorted(range(len(self.standings)),
+                               key=lambda i: (-self.standings[i].points, -self.standings[i].win_rate))
+                # Sorting is stable, so among equal byes the lowest placed come first
+                byes = sorted(reversed(order), key=lambda i: self.standings[i].byes)[:len(order) % self.players]
+                for entrant in byes:
+                    self.standings[entrant].points += self.players - 1
+                    self.standings[entrant].byes += 1
+                self.play_matches(executor, self.swiss_tables([i for i in order if i not in byes]))
+        return self.ranking()
+
+    def swiss_tables(self, order):
+        """
+        Seat entrants at tables of similar placing, avoiding rematches
+
+        Each table is headed by the best placed entrant still standing and
+        filled with the best placed others who haven't met anyone at it,
+        backing up when that leaves the rest with no way to sit. If no
+        seating without rematches turns up within SEARCH_LIMIT tables tried,
+        entrants are seated in order and meet again.
+        Args:
+            order (list): entrant indices best first, a whole number of tables
+        Returns:
+            list: tuples of entrant indices, one per table
+        """
+        tried = 0
+
+        def seat(left):
+            nonlocal tried
+            if not left:
+                return []
+            first, rest = left[0], left[1:]
+            for others in itertools.combinations(rest, self.players - 1):
+                tried += 1
+                if tried > SEARCH_LIMIT:
+                    return None
+                table = (first,) + others
+                if any(b in self.standings[a].opponents for a, b in itertools.combinations(table, 2)):
+                    continue
+                tables = seat([i for i in rest if i not in others])
+                if tables is not None:
+                    return [table] + tables
+            return None
+
+        tables = seat(order)
+        if tables is None:
+            tables = [tuple(order[i:i + self.players]) for i in range(0, len(order), self.players)]
+        return tables
+
+    def ranking(self):
+        """Standings from best to worst"""
+        return sorted(self.standings, key=lambda s: (-s.points, -s.win_rate))
+
+
+def main():
+    """Run a tournament from the command line and print the ranking"""
+    parser = argparse.ArgumentParser(description="Rank strategies against each other")
+    parser.add_argument("strategies", nargs="+", help="strategy specs, e.g. threshold:300 optimal")
+    parser.add_argument("--players", type=int, default=2, choices=range(MIN_PLAYERS, MAX_PLAYERS + 1))
+    parser.add_argument("--format", choices=["round-robin", "swiss"], default="round-robin")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds for swiss")
+    parser.add_argument("--games", type=int, default=100000, help="games per match")
+    parser.add_argument("--chunk", type=int, default=20000, help="games per work unit")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    tournament = Tournament(args.strategies, args.players, args.games, args.chunk,
+                            args.workers, args.seed)
+    start = time.perf_counter()
+    if args.format == "swiss":
+        ranking = tournament.swiss(args.rounds)
+    else:
+        ranking = tournament.round_robin()
+    elapsed = time.perf_counter() - start
+
+    total_games = sum(s.games for s in ranking) // args.players
+    print(f"{'strategy':<24}{'points':>8}{'win rate':>10}{'length':>8}{'p10':>7}{'p50':>7}{'p90':>7}")
+    for s in ranking:
+        print(f"{s.spec:<24}{s.points:>8}{s.win_rate:>10.4f}{s.mean_game_length:>8.1f}"
+              f"{s.score_percentile(10):>7}{s.score_percentile(50):>7}{s.score_percentile(90):>7}")
+    print(f"{total_games} games in {elapsed:.1f}s ({total_games / elapsed:.0f} games/sec)")
+
+
+if __name__ == "__main__":
+    main()